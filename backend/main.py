@@ -1,10 +1,26 @@
-from flask import Flask, request, jsonify, session
+from flask import Flask, Response, request, jsonify, session
 from flask_cors import CORS
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from flask_bcrypt import Bcrypt
-from flask_sqlalchemy import SQLAlchemy
 from datetime import timedelta
+import atexit
+import click
+import json
 import os
+import threading
+
+from models import User, db
+from services.auth import MAX_PASSWORD_BYTES, HashingBusyError, PasswordHasher, UserCache
+from services.backtest import SWEEP_POOL_SIZE, STRATEGIES, BacktestEngine, parameter_grid
+from services.database import configure_engine, migration_lock, pending_changes, upgrade
+from services.job_queue import JobCancelled, JobQueue, QueueFullError, UserLimitError
+from services.likes import LIKE_TARGETS, LikeBuffer
+from services.market_data import MarketDataService
+from services.monte_carlo import MonteCarloSimulator, SimulationCancelled
+from services.path_encoding import BINARY_MIMETYPE, encode_paths
+from services.rankings import Rankings, rebuild_tag_counts
+from services.return_models import RETURN_MODELS
+from services.sandbox import ENTRY_POINTS, SandboxBusyError, StrategySandbox
+from services.social import explore_page, feed_page, page_size
 
 # Create Flask app
 app = Flask(__name__)
@@ -15,9 +31,19 @@ app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:/
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)
 
+# Connection pool per process - Postgres connections are health-checked on
+# checkout and replaced before server-side idle timeouts close them
+if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgres'):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True
+    }
+
 # Initialize extensions
-db = SQLAlchemy(app)
-bcrypt = Bcrypt(app)
+db.init_app(app)
 login_manager = LoginManager(app)
 
 # CORS - Works locally AND in production
@@ -29,34 +55,69 @@ CORS(app,
      expose_headers=['Content-Type'],
      methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
 
-# Define models
-from flask_login import UserMixin
-from datetime import datetime
-
-class User(UserMixin, db.Model):
-    __tablename__ = 'users'
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(80), unique=True, nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(200), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-class Strategy(db.Model):
-    __tablename__ = 'strategies'
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(200), nullable=False)
-    ticker = db.Column(db.String(10), nullable=False)
-    roi = db.Column(db.Float)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+# Simulation services - streaming chunks keep large runs within worker memory
+market_data = MarketDataService()
+simulator = MonteCarloSimulator(chunk_size=10000)
+MAX_SIMULATIONS = 1000000
+JSON_PATH_FORMATS = ('records', 'columnar')  # Finished jobs keep "arrays" and format per request
+
+# Strategy backtests - large parameter sweeps split into SWEEP_WORKERS chunks
+# for the shared pool of SWEEP_POOL_SIZE processes
+backtester = BacktestEngine(cost_bps=float(os.environ.get('BACKTEST_COST_BPS', 5)))
+MAX_SWEEP_COMBINATIONS = int(os.environ.get('MAX_SWEEP_COMBINATIONS', 5000))
+SWEEP_WORKERS = int(os.environ.get('SWEEP_WORKERS', SWEEP_POOL_SIZE))
+
+# User strategy code - warm worker processes, confined to an unprivileged
+# user, hard resource limits and a system call filter
+strategy_sandbox = StrategySandbox(
+    num_workers=int(os.environ.get('STRATEGY_WORKERS', 2)),
+    timeout=float(os.environ.get('STRATEGY_TIMEOUT', 10)),
+    cpu_seconds=float(os.environ.get('STRATEGY_CPU_SECONDS', 5)),
+    memory_mb=int(os.environ.get('STRATEGY_MEMORY_MB', 512)),
+    cost_bps=backtester.cost_bps,
+    user=os.environ.get('STRATEGY_USER', 'nobody')
+)
+
+# Leaderboards and trending tags, served from memory; writes invalidate them
+rankings = Rankings(max_staleness=float(os.environ.get('RANKINGS_MAX_STALENESS', 30)))
+rankings.install(db.session)
+
+# Likes are buffered in memory and written in batches by a background thread
+like_buffer = LikeBuffer(
+    app,
+    interval=float(os.environ.get('LIKE_FLUSH_SECONDS', 1)),
+    on_flush=rankings.likes_changed
+)
+atexit.register(like_buffer.flush)
+
+# Authenticated requests load their user from memory; bcrypt runs on a
+# small pool so login bursts can't take every request thread
+user_cache = UserCache(ttl=float(os.environ.get('USER_CACHE_TTL', 60)))
+user_cache.install(db.session)
+password_hasher = PasswordHasher(
+    rounds=int(os.environ.get('BCRYPT_LOG_ROUNDS', 12)),
+    num_workers=int(os.environ.get('PASSWORD_HASH_WORKERS', 2)),
+    max_pending=int(os.environ.get('PASSWORD_HASH_QUEUE', 16))
+)
 
 # User loader
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return user_cache.load(int(user_id))
 
-# Create tables
+# Create tables; existing databases are upgraded with `flask upgrade-db`
+# before deploying (automatically for a local SQLite file, by whichever
+# process starts first; completed backfills aren't checked again)
 with app.app_context():
-    db.create_all()
+    configure_engine(db.engine)
+    if db.engine.dialect.name == 'sqlite':
+        with migration_lock(db.engine):
+            db.create_all()
+            upgrade(db.engine)
+    else:
+        db.create_all()
+        if pending_changes(db.engine):
+            print("⚠️ Database schema is behind the models, run `flask --app main upgrade-db`")
     print("✅ Database created successfully!")
 
 # ========== AUTH ROUTES ==========
@@ -75,13 +136,16 @@ def signup():
         if not username or not email or not password:
             return jsonify({'error': 'All fields required'}), 400
         
+        if len(password.encode('utf-8')) > MAX_PASSWORD_BYTES:
+            return jsonify({'error': f'Password must be at most {MAX_PASSWORD_BYTES} bytes'}), 400
+        
         if User.query.filter_by(username=username).first():
             return jsonify({'error': 'Username exists'}), 400
         
         if User.query.filter_by(email=email).first():
             return jsonify({'error': 'Email exists'}), 400
         
-        password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        password_hash = password_hasher.hash(password)
         new_user = User(username=username, email=email, password_hash=password_hash)
         
         db.session.add(new_user)
@@ -93,6 +157,8 @@ def signup():
             'message': 'Success',
             'user': {'id': new_user.id, 'username': new_user.username, 'email': new_user.email}
         }), 201
+    except HashingBusyError as e:
+        return jsonify({'error': str(e)}), 429
     except Exception as e:
         print(f"Signup error: {e}")
         db.session.rollback()
@@ -110,15 +176,25 @@ def login():
         
         user = User.query.filter_by(email=email).first()
         
-        if not user or not bcrypt.check_password_hash(user.password_hash, password):
+        if not user:
             return jsonify({'error': 'Invalid credentials'}), 401
         
+        valid, new_hash = password_hasher.verify(password, user.password_hash)
+        if not valid:
+            return jsonify({'error': 'Invalid credentials'}), 401
+        if new_hash:
+            # BCRYPT_LOG_ROUNDS changed since this hash was made
+            user.password_hash = new_hash
+            db.session.commit()
+        
         login_user(user, remember=True)
         
         return jsonify({
             'message': 'Success',
             'user': {'id': user.id, 'username': user.username, 'email': user.email}
         }), 200
+    except HashingBusyError as e:
+        return jsonify({'error': str(e)}), 429
     except Exception as e:
         print(f"Login error: {e}")
         return jsonify({'error': str(e)}), 500
@@ -143,28 +219,383 @@ def check_auth():
         }), 200
     return jsonify({'authenticated': False}), 200
 
+# ========== SIMULATION ROUTES ==========
+
+def parse_simulation_request(data):
+    """Validate a simulation request body; raises ValueError on bad input"""
+    ticker = str(data.get('ticker') or 'SPY').upper()
+    years = int(data.get('years', 5))
+    initial_investment = float(data.get('initial_investment', 10000))
+    num_simulations = int(data.get('num_simulations', 1000))
+    max_points = data.get('max_points')
+    seed = data.get('seed')
+    strategy = data.get('strategy') or 'buy_hold'
+    model = data.get('model') or 'gbm'
+    
+    if strategy not in STRATEGIES:
+        raise ValueError(f'Unknown strategy, expected one of {", ".join(STRATEGIES)}')
+    if model not in RETURN_MODELS:
+        raise ValueError(f'Unknown model, expected one of {", ".join(RETURN_MODELS)}')
+    if not 1 <= years <= 30:
+        raise ValueError('years must be between 1 and 30')
+    if not 2 <= num_simulations <= MAX_SIMULATIONS:
+        raise ValueError(f'num_simulations must be between 2 and {MAX_SIMULATIONS}')
+    if initial_investment <= 0:
+        raise ValueError('initial_investment must be positive')
+    
+    path_format = data.get('format') or 'records'
+    if path_format not in JSON_PATH_FORMATS:
+        raise ValueError(f'Unknown format, expected one of {", ".join(JSON_PATH_FORMATS)}')
+    
+    return {
+        'ticker': ticker,
+        'years': years,
+        'initial_investment': initial_investment,
+        'num_simulations': num_simulations,
+        'strategy': strategy,
+        'model': model,
+        'seed': int(seed) if seed is not None else None,
+        'path_format': path_format,
+        'max_points': int(max_points) if max_points else None
+    }
+
+def run_simulation_job(job):
+    """Job runner: fetch history and simulate on a queue worker thread"""
+    params = job.params
+    historical_data = market_data.get_historical_data(params['ticker'], years=params['years'])
+    if job.cancel_event.is_set():
+        raise JobCancelled()
+    
+    try:
+        result = simulator.run_simulation(
+            historical_data,
+            initial_investment=params['initial_investment'],
+            num_simulations=params['num_simulations'],
+            years=params['years'],
+            strategy=params['strategy'],
+            model=params['model'],
+            seed=params['seed'],
+            path_format='arrays',
+            max_points=params['max_points'],
+            cancel_event=job.cancel_event
+        )
+    except SimulationCancelled:
+        raise JobCancelled()
+    
+    # Raw paths: each poll picks binary or JSON by its own Accept header
+    paths = result['sample_paths']
+    return {
+        'ticker': params['ticker'],
+        'statistics': result['statistics'],
+        'num_simulations': result['num_simulations'],
+        'parameters': result['parameters'],
+        'paths': {'days': paths['days'].tolist(), 'values': paths['values'].tolist()}
+    }
+
+# Jobs are stored in the database, so any server process can run or poll them
+simulation_jobs = JobQueue(
+    app,
+    run_simulation_job,
+    num_workers=int(os.environ.get('SIMULATION_WORKERS', 2)),
+    max_depth=int(os.environ.get('SIMULATION_QUEUE_DEPTH', 100)),
+    max_per_user=int(os.environ.get('SIMULATIONS_PER_USER', 2))
+)
+MAX_POLL_WAIT = 30  # Seconds a long-poll may block
+
+# Streams simulate on the request thread, so they get their own bound
+simulation_streams = threading.BoundedSemaphore(int(os.environ.get('SIMULATION_STREAMS', 2)))
+
+def user_job(job_id):
+    """Job with this id if it belongs to the current user"""
+    job = simulation_jobs.get(job_id)
+    if job is None or job.user_id != current_user.id:
+        return None
+    return job
+
 @app.route('/api/simulate', methods=['POST', 'OPTIONS'])
 @login_required
 def simulate():
     if request.method == 'OPTIONS':
         return '', 200
     
-    return jsonify({
-        'paths': [{'month': i, 'path1': 10000 + i * 100} for i in range(60)],
-        'statistics': {
-            'median': 15000,
-            'median_roi': 50.0,
-            'probability_of_profit': 75.0,
-            'sharpe_ratio': 1.5,
-            'min': 8000,
-            'max': 25000
-        }
-    }), 200
+    try:
+        params = parse_simulation_request(request.json or {})
+        job = simulation_jobs.submit(current_user.id, params)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    except (QueueFullError, UserLimitError) as e:
+        return jsonify({'error': str(e)}), 429
+    
+    return jsonify(dict(job.to_dict(), status_url=f'/api/simulate/{job.id}')), 202
+
+def sse_event(event, data):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+@app.route('/api/simulate/stream', methods=['GET'])
+@login_required
+def simulate_stream():
+    """
+    Server-Sent Events: a `progress` event after every chunk of paths
+    (running percentile bands, probability of profit, paths done), then one
+    `result` event with the same body as a finished /api/simulate job.
+    Parameters come from the query string so EventSource can connect;
+    closing the connection stops the simulation.
+    """
+    try:
+        params = parse_simulation_request(request.args)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if not simulation_streams.acquire(blocking=False):
+        return jsonify({'error': 'Too many simulations streaming, try again shortly'}), 429
+    
+    def generate():
+        try:
+            historical_data = market_data.get_historical_data(params['ticker'], years=params['years'])
+            events = simulator.iter_simulation(
+                historical_data,
+                initial_investment=params['initial_investment'],
+                num_simulations=params['num_simulations'],
+                years=params['years'],
+                strategy=params['strategy'],
+                model=params['model'],
+                seed=params['seed'],
+                path_format=params['path_format'],
+                max_points=params['max_points']
+            )
+            for event in events:
+                if event['type'] == 'progress':
+                    yield sse_event('progress', event)
+                else:
+                    yield sse_event('result', {
+                        'ticker': params['ticker'],
+                        'statistics': event['statistics'],
+                        'num_simulations': event['num_simulations'],
+                        'parameters': event['parameters'],
+                        'paths': event['sample_paths']
+                    })
+        except Exception as e:
+            print(f"Simulation stream error: {e}")
+            yield sse_event('error', {'error': str(e)})
+    
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Let proxies pass events through
+    response.call_on_close(simulation_streams.release)
+    return response
+
+@app.route('/api/simulate/<job_id>', methods=['GET', 'DELETE', 'OPTIONS'])
+@login_required
+def simulation_job(job_id):
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    if user_job(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if request.method == 'DELETE':
+        job = simulation_jobs.cancel(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404  # Expired meanwhile
+        return jsonify(job.to_dict()), 200
+    
+    # Long poll: ?wait=<seconds> blocks until the job finishes or time runs out
+    try:
+        wait = min(max(float(request.args.get('wait', 0)), 0), MAX_POLL_WAIT)
+    except ValueError:
+        return jsonify({'error': 'wait must be a number of seconds'}), 400
+    job = simulation_jobs.wait(job_id, wait)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404  # Expired meanwhile
+    
+    if job.status != job.DONE:
+        return jsonify(job.to_dict()), 200 if job.finished else 202
+    
+    # Content negotiation: binary float32 paths, or JSON records / columns
+    result = dict(job.result)
+    paths = result.pop('paths')
+    if request.accept_mimetypes.best_match(['application/json', BINARY_MIMETYPE]) == BINARY_MIMETYPE:
+        response = Response(encode_paths(paths['days'], paths['values'], result), mimetype=BINARY_MIMETYPE)
+    else:
+        result['paths'] = MonteCarloSimulator.format_paths(
+            paths['days'], paths['values'], job.params.get('path_format', 'records')
+        )
+        response = jsonify(dict(result, **job.to_dict()))
+    response.headers['Vary'] = 'Accept'
+    return response, 200
+
+# ========== STRATEGY ROUTES ==========
+
+@app.route('/api/strategies/sweep', methods=['POST', 'OPTIONS'])
+@login_required
+def sweep_strategy():
+    """Rank every parameter combination of a strategy template on one ticker"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    data = request.json or {}
+    try:
+        ticker = str(data.get('ticker') or 'SPY').upper()
+        years = int(data.get('years', 5))
+        strategy = data.get('strategy', 'golden_cross')
+        grid = data.get('grid') or {}
+        top = data.get('top')
+        
+        if not 1 <= years <= 30:
+            raise ValueError('years must be between 1 and 30')
+        if not isinstance(grid, dict):
+            raise ValueError('grid must map parameter names to lists of values')
+        param_sets = parameter_grid(strategy, grid)
+        if len(param_sets) > MAX_SWEEP_COMBINATIONS:
+            raise ValueError(f'grid has {len(param_sets)} combinations, the maximum is {MAX_SWEEP_COMBINATIONS}')
+        
+        historical_data = market_data.get_historical_data(ticker, years=years)
+        result = backtester.sweep(
+            historical_data,
+            strategy,
+            grid,
+            sort_by=data.get('sort_by', 'sharpe_ratio'),
+            top=None if top is None else int(top),
+            workers=SWEEP_WORKERS
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(dict(result, ticker=ticker, years=years)), 200
+
+@app.route('/api/strategies/run', methods=['POST', 'OPTIONS'])
+@login_required
+def run_strategy_code():
+    """
+    Backtest user strategy code (e.g. from the Pro page) in the sandbox.
+    With entry=strategy the engine trades the signals strategy(df)
+    returns; with entry=backtest the result of backtest(df) is returned.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    data = request.json or {}
+    try:
+        ticker = str(data.get('ticker') or 'SPY').upper()
+        years = int(data.get('years', 5))
+        code = data.get('code')
+        entry = data.get('entry') or 'strategy'
+        
+        if not isinstance(code, str) or not code.strip():
+            raise ValueError('code is required')
+        if entry not in ENTRY_POINTS:
+            raise ValueError(f'Unknown entry, expected one of {", ".join(ENTRY_POINTS)}')
+        if not 1 <= years <= 30:
+            raise ValueError('years must be between 1 and 30')
+        
+        historical_data = market_data.get_historical_data(ticker, years=years)
+        result = strategy_sandbox.run(code, historical_data, entry=entry)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    except SandboxBusyError as e:
+        return jsonify({'error': str(e)}), 429
+    
+    return jsonify({'ticker': ticker, 'years': years, 'entry': entry, 'result': result}), 200
+
+@app.route('/api/strategies', methods=['GET'])
+@login_required
+def explore_strategies():
+    """Strategy explorer: ?sort=roi|recent&limit=20&cursor=<next_cursor>"""
+    try:
+        page = explore_page(
+            sort=request.args.get('sort', 'roi'),
+            limit=page_size(request.args.get('limit')),
+            cursor=request.args.get('cursor')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(page), 200
+
+@app.route('/api/leaderboards/<metric>', methods=['GET'])
+@login_required
+def leaderboard(metric):
+    """Top strategies by roi, sharpe_ratio or likes: ?limit=10"""
+    try:
+        board = rankings.leaderboard(metric, limit=int(request.args.get('limit', 10)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(board), 200
+
+# ========== SOCIAL ROUTES ==========
+
+@app.route('/api/feed', methods=['GET'])
+@login_required
+def feed():
+    """Newest posts first: ?limit=20&cursor=<next_cursor>"""
+    try:
+        page = feed_page(limit=page_size(request.args.get('limit')), cursor=request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(page), 200
+
+@app.route('/api/trending', methods=['GET'])
+@login_required
+def trending():
+    """Most used hashtags: ?limit=10&hours=24"""
+    try:
+        tags = rankings.trending(
+            limit=int(request.args.get('limit', 10)),
+            hours=int(request.args.get('hours', 24))
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(tags), 200
+
+def record_like(target_type, target_id):
+    """Buffer a like (POST) or unlike (DELETE); answers before the database write"""
+    model = LIKE_TARGETS[target_type]
+    if db.session.query(model.id).filter_by(id=target_id).first() is None:
+        return jsonify({'error': f'{target_type.capitalize()} not found'}), 404
+    
+    if request.method == 'DELETE':
+        like_buffer.unlike(target_type, target_id, current_user.id)
+    else:
+        like_buffer.like(target_type, target_id, current_user.id)
+    return jsonify({'liked': request.method != 'DELETE'}), 202
+
+@app.route('/api/posts/<int:post_id>/like', methods=['POST', 'DELETE', 'OPTIONS'])
+@login_required
+def like_post(post_id):
+    if request.method == 'OPTIONS':
+        return '', 200
+    return record_like('post', post_id)
+
+@app.route('/api/strategies/<int:strategy_id>/like', methods=['POST', 'DELETE', 'OPTIONS'])
+@login_required
+def like_strategy(strategy_id):
+    if request.method == 'OPTIONS':
+        return '', 200
+    return record_like('strategy', strategy_id)
+
+# ========== COMMANDS ==========
+
+@app.cli.command('rebuild-rankings')
+def rebuild_rankings():
+    """Recompute trending tag counts from the posts (flask --app main rebuild-rankings)"""
+    rows = rebuild_tag_counts()
+    rankings.invalidate()
+    print(f"✅ Rebuilt {rows} hourly tag counts")
+
+@app.cli.command('upgrade-db')
+@click.option('--dry-run', is_flag=True, help='Print the statements without running them')
+def upgrade_db(dry_run):
+    """Add missing tables, columns and indexes online (flask --app main upgrade-db)"""
+    with migration_lock(db.engine):
+        statements = upgrade(db.engine, dry_run=dry_run)
+    for statement in statements:
+        print(f"{statement};")
+    print(f"✅ {len(statements)} schema changes {'pending' if dry_run else 'applied'}")
 
 # Health check for Railway
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({'status': 'healthy'}), 200
+    return jsonify({'status': 'healthy', 'strategy_workers': strategy_sandbox.stats()}), 200
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8000))
@@ -19,6 +19,17 @@ class User(UserMixin, db.Model):
 
 class Strategy(db.Model):
     __tablename__ = 'strategies'
+    __table_args__ = (
+        # Keyset pagination of the explorer, newest / best first (ties by id)
+        db.Index('ix_strategies_roi_id', 'roi', 'id'),
+        db.Index('ix_strategies_created_at_id', 'created_at', 'id'),
+        # Leaderboards (services/rankings.py) read the top rows of these
+        db.Index('ix_strategies_sharpe_ratio_id', 'sharpe_ratio', 'id'),
+        db.Index('ix_strategies_likes_id', 'likes', 'id'),
+        # A user's strategies, and strategies by ticker
+        db.Index('ix_strategies_user_id', 'user_id'),
+        db.Index('ix_strategies_ticker', 'ticker'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
@@ -37,10 +48,92 @@ class Strategy(db.Model):
 
 class Post(db.Model):
     __tablename__ = 'posts'
+    __table_args__ = (
+        # Keyset pagination of the feed, newest first (ties by id)
+        db.Index('ix_posts_created_at_id', 'created_at', 'id'),
+        db.Index('ix_posts_user_id', 'user_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    content = db.Column(db.Text, nullable=False)
+    # The old value is loaded before a change, even on an expired post, so
+    # tag counts can take back its old hashtags (services/rankings.py)
+    content = db.column_property(db.Column(db.Text, nullable=False), active_history=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     strategy_id = db.Column(db.Integer, db.ForeignKey('strategies.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    likes = db.Column(db.Integer, default=0)
\ No newline at end of file
+    likes = db.Column(db.Integer, default=0)
+    
+    strategy = db.relationship('Strategy', lazy=True)
+
+
+class Like(db.Model):
+    """
+    One user's like of a post or strategy
+    
+    The primary key makes likes unique per user; the likes counters on
+    Post and Strategy are only ever changed by the number of rows a batch
+    actually inserted or deleted here (see services/likes.py).
+    """
+    __tablename__ = 'likes'
+    
+    target_type = db.Column(db.String(20), primary_key=True)
+    target_id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class TagCount(db.Model):
+    """
+    Posts per hashtag per hour, for trending tags
+    
+    Kept up to date as posts are written (see services/rankings.py);
+    rebuilt from the posts by `flask rebuild-rankings`.
+    """
+    __tablename__ = 'tag_counts'
+    
+    bucket = db.Column(db.DateTime, primary_key=True)  # Start of the hour (UTC)
+    tag = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class SchemaMigration(db.Model):
+    """
+    One-off data migrations `flask upgrade-db` has completed, by name
+    
+    Lets upgrade() skip the checks behind them (e.g. scanning a table for
+    NULL timestamps to backfill) on every later run (see services/database.py).
+    """
+    __tablename__ = 'schema_migrations'
+    
+    name = db.Column(db.String(200), primary_key=True)
+    applied_at = db.Column(db.DateTime, server_default=db.func.current_timestamp())
+
+
+class SimulationJob(db.Model):
+    """
+    A queued /api/simulate run
+    
+    Kept in the database so that every server process shares one queue:
+    any process's workers may claim a queued job, and status polls and
+    cancellations work from whichever process receives them (see
+    services/job_queue.py). Times are unix seconds, as the API reports them.
+    """
+    __tablename__ = 'simulation_jobs'
+    __table_args__ = (
+        # Workers claim the oldest queued job; submit() counts active jobs
+        db.Index('ix_simulation_jobs_status_created_at', 'status', 'created_at'),
+        db.Index('ix_simulation_jobs_user_id_status', 'user_id', 'status'),
+    )
+    
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    params = db.Column(db.Text, nullable=False)  # JSON
+    status = db.Column(db.String(20), nullable=False)
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    result = db.Column(db.Text)  # JSON
+    data = db.Column(db.LargeBinary)  # Optional binary body of the result
+    error = db.Column(db.Text)
+    created_at = db.Column(db.Float, nullable=False)
+    started_at = db.Column(db.Float)
+    finished_at = db.Column(db.Float)
+    heartbeat_at = db.Column(db.Float)  # Last sign of life of the running worker
\ No newline at end of file
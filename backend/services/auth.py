@@ -0,0 +1,200 @@
+"""
+Auth
+Cached user loading for authenticated requests, and password hashing on a
+bounded thread pool
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Dict, Optional, Tuple
+
+import bcrypt
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from models import User, db
+from services.cache import LRUCache
+
+
+MAX_PASSWORD_BYTES = 72  # bcrypt ignores anything longer
+
+# Columns kept per cached user; password_hash stays out of memory and is
+# lazy-loaded on the rare request that reads it
+CACHED_COLUMNS = tuple(
+    column.key for column in inspect(User).column_attrs if column.key != "password_hash"
+)
+
+
+class HashingBusyError(Exception):
+    """Too many password hashes are queued; the caller should retry later"""
+
+
+class UserCache:
+    """
+    Short-lived cache in front of flask_login's user_loader
+    
+    Every authenticated request loads its user; this keeps a snapshot of
+    each user's columns for `ttl` seconds, so repeat requests skip the
+    query. Each request gets its own User instance, attached to its
+    session without SQL, so relationships still lazy-load normally.
+    
+    User updates and deletes committed through a session passed to
+    install() drop the user's entry; writes by other processes (e.g.
+    gunicorn workers) show up within `ttl` seconds.
+    """
+    
+    def __init__(self, ttl: float = 60.0, max_size: int = 10000):
+        """
+        Args:
+            ttl: Seconds a user is served from memory
+            max_size: Most users kept
+        """
+        self._cache = LRUCache(max_size=max_size, ttl=ttl)
+        self._generation = 0  # Bumped by every invalidation
+        self._lock = threading.Lock()
+    
+    def install(self, session):
+        """Invalidate users updated or deleted through a (scoped) session"""
+        event.listen(session, "after_flush", self._after_flush)
+        event.listen(session, "after_commit", self._after_commit)
+        event.listen(session, "after_soft_rollback", self._after_rollback)
+    
+    def load(self, user_id: int) -> Optional[User]:
+        """User by id, attached to the current session (None if missing)"""
+        snapshot = self._cache.get(user_id)
+        if snapshot is None:
+            generation = self._generation
+            user = db.session.get(User, user_id)
+            if user is None:
+                return None
+            snapshot = {key: getattr(user, key) for key in CACHED_COLUMNS}
+            with self._lock:
+                # An invalidation during the query may have missed this copy
+                if generation == self._generation:
+                    self._cache.set(user_id, snapshot)
+            return user
+        
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+    
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._generation += 1
+            self._cache.invalidate(user_id)
+    
+    def info(self) -> Dict:
+        return self._cache.info()
+    
+    # ========== SESSION EVENTS ==========
+    
+    def _after_flush(self, session, flush_context):
+        changed = {
+            user.id for user in (*session.dirty, *session.deleted)
+            if isinstance(user, User) and user.id is not None
+        }
+        if changed:
+            session.info.setdefault("auth_users_changed", set()).update(changed)
+    
+    def _after_commit(self, session):
+        for user_id in session.info.pop("auth_users_changed", ()):
+            self.invalidate(user_id)
+    
+    def _after_rollback(self, session, previous_transaction):
+        session.info.pop("auth_users_changed", None)
+
+
+class PasswordHasher:
+    """
+    bcrypt hashing and checking on a small thread pool
+    
+    bcrypt releases the GIL, so at most `num_workers` hashes burn CPU at
+    once however many logins arrive together, leaving the rest of the
+    process (e.g. simulation streams) its share. At most `max_pending`
+    hashes may be queued or running; beyond that, and for hashes not done
+    within `timeout` seconds, HashingBusyError is raised instead of
+    piling up waiting requests.
+    
+    Stored hashes carry their cost, so changing `rounds` takes effect for
+    new hashes immediately and for existing users on their next login
+    (see verify()).
+    """
+    
+    def __init__(self, rounds: int = 12, num_workers: int = 2, max_pending: int = 16, timeout: float = 10.0):
+        """
+        Args:
+            rounds: bcrypt cost (log2 of the key expansion rounds), 4-31
+            num_workers: Hashing threads
+            max_pending: Hashes queued or running before callers are refused
+            timeout: Seconds a caller waits for its hash
+        """
+        if not 4 <= rounds <= 31:
+            raise ValueError("rounds must be between 4 and 31")
+        
+        self.rounds = rounds
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(max_pending)
+    
+    def hash(self, password: str) -> str:
+        """
+        bcrypt hash of a password at the configured cost
+        
+        Raises:
+            ValueError: Password longer than MAX_PASSWORD_BYTES
+            HashingBusyError: Pool full or timed out
+        """
+        secret = password.encode("utf-8")
+        if len(secret) > MAX_PASSWORD_BYTES:
+            raise ValueError(f"Password must be at most {MAX_PASSWORD_BYTES} bytes")
+        hashed = self._run(bcrypt.hashpw, secret, bcrypt.gensalt(self.rounds))
+        return hashed.decode("utf-8")
+    
+    def verify(self, password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+        """
+        Check a password against a stored hash
+        
+        Returns:
+            (matches, new_hash): new_hash is a replacement at the configured
+            cost when the password matches a hash of another cost (None
+            otherwise, or if the pool is too busy to rehash now)
+        
+        Raises:
+            HashingBusyError: Pool full or timed out
+        """
+        
+        # Older hashes were made by bcrypt versions that truncated silently
+        secret = password.encode("utf-8")[:MAX_PASSWORD_BYTES]
+        try:
+            matches = self._run(bcrypt.checkpw, secret, password_hash.encode("utf-8"))
+        except ValueError:
+            return False, None  # Malformed stored hash
+        
+        if not matches or self.cost(password_hash) == self.rounds:
+            return matches, None
+        try:
+            return True, self._run(bcrypt.hashpw, secret, bcrypt.gensalt(self.rounds)).decode("utf-8")
+        except HashingBusyError:
+            return True, None  # Rehashed on a later login
+    
+    @staticmethod
+    def cost(password_hash: str) -> int:
+        """Cost a bcrypt hash ("$2b$<cost>$...") was made with"""
+        return int(password_hash.split("$")[2])
+    
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusyError("Too many sign-ins in progress, try again shortly")
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # The hash finishes in the background and frees its slot then
+            raise HashingBusyError("Sign-in timed out, try again shortly")
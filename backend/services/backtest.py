@@ -0,0 +1,576 @@
+"""
+Backtest Engine
+Vectorized backtests of the built-in strategy templates
+"""
+
+import inspect
+import itertools
+import multiprocessing
+import os
+import threading
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Hashable, List, Optional, Union
+
+from services.indicators import ema, rolling_max, rolling_mean, rolling_min, rolling_std, rsi
+
+
+TRADING_DAYS = 252
+
+# Series per kernel call in BacktestEngine.run
+BLOCK_COLUMNS = 16
+
+# Metrics reported by sweeps; rankings are descending except for these
+SWEEP_METRICS = ("total_return", "annual_return", "sharpe_ratio", "max_drawdown", "annual_volatility", "trades", "exposure")
+ASCENDING_METRICS = ("annual_volatility", "turnover")
+
+# Grid size from which sweeps spread over a process pool
+PARALLEL_SWEEP_MIN = 512
+
+# Processes shared by every sweep in this process (default: CPU count)
+SWEEP_POOL_SIZE = int(os.environ.get("SWEEP_POOL_SIZE", os.cpu_count() or 1))
+
+
+# ========== SIGNAL FUNCTIONS ==========
+# Each maps a Features batch (closes of shape (days, series)) to target
+# weights of the same shape: the fraction of equity to hold in the asset
+# after trading at that day's close (0 = cash, 1 = fully invested). NaN
+# means "don't trade" - the position is left to drift with the price.
+# Signals only use data up to and including their own day, and positions
+# earn from the next day on.
+
+class Features:
+    """
+    Closes of a batch plus memoized indicators
+    
+    Signals get their indicators from here, so parameter sets run on the
+    same batch share them: a grid over MA windows computes each window
+    once, an RSI threshold grid computes the RSI once.
+    
+    The first `start` rows may be warm-up history (e.g. before simulated
+    paths): indicators see them, but schedules such as DCA tranches and
+    rebalancing dates count from `start`, and only rows from `start` on
+    are traded.
+    """
+    
+    def __init__(self, close: np.ndarray, start: int = 0):
+        self.close = close
+        self.start = start
+        self._memo: Dict[Hashable, np.ndarray] = {}
+    
+    def memo(self, key: Hashable, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        """compute() once per key (results are shared - don't modify them)"""
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+    
+    def rolling_mean(self, window: int) -> np.ndarray:
+        return self.memo(("mean", window), lambda: rolling_mean(self.close, window))
+    
+    def rolling_std(self, window: int) -> np.ndarray:
+        return self.memo(("std", window), lambda: rolling_std(self.close, window))
+    
+    def previous_max(self, window: int) -> np.ndarray:
+        """Highest close of the window days before each day"""
+        return self.memo(("max", window), lambda: _shift(rolling_max(self.close, window), 1))
+    
+    def previous_min(self, window: int) -> np.ndarray:
+        """Lowest close of the window days before each day"""
+        return self.memo(("min", window), lambda: _shift(rolling_min(self.close, window), 1))
+    
+    def ema(self, span: int) -> np.ndarray:
+        return self.memo(("ema", span), lambda: ema(self.close, 2 / (span + 1)))
+    
+    def rsi(self, period: int) -> np.ndarray:
+        return self.memo(("rsi", period), lambda: rsi(self.close, period))
+
+
+def _shift(values: np.ndarray, periods: int) -> np.ndarray:
+    """values moved down by periods rows, NaN-filled"""
+    out = np.full(values.shape, np.nan)
+    out[periods:] = values[:len(values) - periods]
+    return out
+
+
+def _hold_between(entries: np.ndarray, exits: np.ndarray) -> np.ndarray:
+    """1 from an entry day until the next exit day, else 0 (exits win ties)"""
+    events = np.where(exits, 0.0, np.where(entries, 1.0, np.nan))
+    rows = np.arange(len(events))[:, None]
+    last_event = np.maximum.accumulate(np.where(np.isnan(events), 0, rows), axis=0)
+    state = np.take_along_axis(events, last_event, axis=0)
+    return np.nan_to_num(state, nan=0.0)
+
+
+def buy_hold(data: Features) -> np.ndarray:
+    """Fully invested from the first day"""
+    return np.ones_like(data.close)
+
+
+def ma_50(data: Features, window: int = 250) -> np.ndarray:
+    """Invested while the close is above its 50-week (250-day) moving average"""
+    return (data.close > data.rolling_mean(window)).astype(np.float64)
+
+
+def dca(data: Features, tranches: int = 12, interval: int = 21) -> np.ndarray:
+    """Dollar cost averaging: raise the exposure in equal steps every interval days"""
+    targets = np.full(data.close.shape, np.nan)
+    steps = np.arange(tranches)
+    days = data.start + steps * interval
+    days, steps = days[days < len(targets)], steps[days < len(targets)]
+    targets[days] = ((steps + 1) / tranches)[:, None]
+    return targets
+
+
+def momentum(data: Features, lookback: int = 126) -> np.ndarray:
+    """Invested while the trailing lookback-day return is positive"""
+    return (data.close > _shift(data.close, lookback)).astype(np.float64)
+
+
+def bollinger(data: Features, window: int = 20, width: float = 2.0) -> np.ndarray:
+    """Mean reversion: buy below the lower band, sell back at the middle band"""
+    middle = data.rolling_mean(window)
+    lower = middle - width * data.rolling_std(window)
+    return _hold_between(data.close < lower, data.close > middle)
+
+
+def rsi_strategy(data: Features, period: int = 14, oversold: float = 30, overbought: float = 70) -> np.ndarray:
+    """Buy when RSI is oversold, sell when it is overbought"""
+    values = data.rsi(period)
+    return _hold_between(values < oversold, values > overbought)
+
+
+def breakout(data: Features, entry: int = 55, exit: int = 20) -> np.ndarray:
+    """Donchian breakout: buy at a new entry-day high, sell at a new exit-day low"""
+    return _hold_between(data.close > data.previous_max(entry), data.close < data.previous_min(exit))
+
+
+def macd(data: Features, fast: int = 12, slow: int = 26, signal: int = 9) -> np.ndarray:
+    """Invested while the MACD line is above its signal line"""
+    line = data.ema(fast) - data.ema(slow)
+    targets = (line > ema(line, 2 / (signal + 1))).astype(np.float64)
+    targets[:slow] = 0  # Let the slow average settle first
+    return targets
+
+
+def golden_cross(data: Features, fast: int = 50, slow: int = 200) -> np.ndarray:
+    """Invested while the fast moving average is above the slow one"""
+    return (data.rolling_mean(fast) > data.rolling_mean(slow)).astype(np.float64)
+
+
+def rebalance(data: Features, weight: float = 0.6, interval: int = 21) -> np.ndarray:
+    """Hold a fixed stock/cash allocation, rebalanced every interval days"""
+    targets = np.full(data.close.shape, np.nan)
+    targets[data.start::interval] = weight
+    return targets
+
+
+STRATEGIES: Dict[str, Callable[..., np.ndarray]] = {
+    "buy_hold": buy_hold,
+    "ma_50": ma_50,
+    "dca": dca,
+    "momentum": momentum,
+    "bollinger": bollinger,
+    "rsi": rsi_strategy,
+    "breakout": breakout,
+    "macd": macd,
+    "golden_cross": golden_cross,
+    "rebalance": rebalance
+}
+
+
+# ========== KERNEL ==========
+
+def run_targets(
+    close: np.ndarray,
+    targets: np.ndarray,
+    cost: float = 0.0,
+    initial_capital: float = 10000.0
+) -> Dict[str, np.ndarray]:
+    """
+    Equity curves of target-weight positions, vectorized over days and series
+    
+    Trading at a day's close resets the weight to the target; in between,
+    shares and cash are held, so the weight drifts with the price. Between
+    two trades the equity therefore grows by 1 - w + w * P[t] / P[anchor],
+    and the equity at each trade is a cumulative product of those segment
+    growths and the trading costs - no loop over days.
+    
+    Args:
+        close: Closes, shape (days, series)
+        targets: Target weights, same shape; NaN = no trade
+        cost: Cost per unit of equity traded (e.g. 0.0005 for 5 bps)
+        initial_capital: Starting equity of every series
+    
+    Returns:
+        Dictionary with "equity", "weights" (held after each close) and
+        "turnover" arrays of shape (days, series)
+    """
+    
+    days, num_series = close.shape
+    trade = ~np.isnan(targets)
+    
+    # Day of the latest trade (the segment anchor) on or before each day, as
+    # a row of the padded arrays below: row 0 stands for "no trade yet"
+    rows = np.arange(1, days + 1)[:, None]
+    anchor = np.maximum.accumulate(np.where(trade, rows, 0), axis=0)
+    previous = np.vstack([np.zeros((1, num_series), dtype=anchor.dtype), anchor[:-1]])
+    
+    padded_targets = np.vstack([np.zeros((1, num_series)), targets])
+    padded_close = np.vstack([np.ones((1, num_series)), close])
+    weight = np.take_along_axis(padded_targets, anchor, axis=0)
+    previous_weight = np.take_along_axis(padded_targets, previous, axis=0)
+    
+    # Growth of the previous segment up to today, and the weight it drifted to
+    relative = close / np.take_along_axis(padded_close, previous, axis=0)
+    previous_growth = 1 - previous_weight + previous_weight * relative
+    drifted = previous_weight * relative / previous_growth
+    
+    turnover = np.where(trade, np.abs(targets - drifted), 0.0)
+    factor = np.where(trade, previous_growth * (1 - cost * turnover), 1.0)
+    
+    # Equity right after the latest trade, times the growth since then
+    level = np.cumprod(factor, axis=0)
+    held = weight * (close / np.take_along_axis(padded_close, anchor, axis=0))
+    growth = 1 - weight + held
+    
+    return {
+        "equity": initial_capital * level * growth,
+        "weights": held / growth,
+        "turnover": turnover
+    }
+
+
+def performance_metrics(
+    equity: np.ndarray,
+    weights: np.ndarray,
+    turnover: np.ndarray,
+    initial_capital: float = 10000.0
+) -> Dict[str, np.ndarray]:
+    """
+    Summary metrics of equity curves, one value per series
+    
+    Returns:
+        Dictionary of arrays of shape (series,): final_value, total_return
+        and annual_return (percent), annual_volatility, sharpe_ratio,
+        max_drawdown (negative fraction), trades, exposure and turnover
+    """
+    
+    days = len(equity)
+    returns = equity[1:] / equity[:-1] - 1
+    
+    mean = returns.mean(axis=0)
+    std = returns.std(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(std > 0, mean / std * np.sqrt(TRADING_DAYS), 0.0)
+    
+    growth = equity[-1] / initial_capital
+    years = max(days - 1, 1) / TRADING_DAYS
+    peaks = np.maximum.accumulate(equity, axis=0)
+    
+    return {
+        "final_value": equity[-1],
+        "total_return": (growth - 1) * 100,
+        "annual_return": (growth ** (1 / years) - 1) * 100,
+        "annual_volatility": std * np.sqrt(TRADING_DAYS),
+        "sharpe_ratio": sharpe,
+        "max_drawdown": (equity / peaks - 1).min(axis=0),
+        "trades": (turnover > 1e-9).sum(axis=0),
+        "exposure": weights.mean(axis=0),
+        "turnover": turnover.sum(axis=0)
+    }
+
+
+# ========== ENGINE ==========
+
+def parameter_grid(strategy: str, grid: Dict[str, Any]) -> List[Dict]:
+    """
+    Every combination of a template's parameter values
+    
+    Args:
+        strategy: Template name
+        grid: Parameter -> list of values (or a single value); parameters
+            left out keep their defaults
+    
+    Returns:
+        Parameter dictionaries, the last parameter varying fastest
+    """
+    
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy '{strategy}', expected one of {tuple(STRATEGIES)}")
+    
+    names = list(inspect.signature(STRATEGIES[strategy]).parameters)[1:]
+    unknown = set(grid) - set(names)
+    if unknown:
+        raise ValueError(f"Unknown parameters {sorted(unknown)} for '{strategy}', expected some of {names}")
+    
+    values = [v if isinstance(v, (list, tuple)) else [v] for v in grid.values()]
+    if any(len(v) == 0 for v in values):
+        raise ValueError("Every swept parameter needs at least one value")
+    
+    return [dict(zip(grid, combination)) for combination in itertools.product(*values)]
+
+
+_sweep_pool = None
+_sweep_pool_lock = threading.Lock()
+
+
+def _get_sweep_pool() -> ProcessPoolExecutor:
+    """
+    Lazily start the process pool shared by all sweeps
+    
+    One pool of SWEEP_POOL_SIZE processes, however many requests sweep at
+    once: their chunks queue for it. Workers come from a fork server (or
+    are spawned), never forked from the server process, whose other
+    threads may hold locks a forked child would inherit held.
+    """
+    global _sweep_pool
+    with _sweep_pool_lock:
+        if _sweep_pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _sweep_pool = ProcessPoolExecutor(
+                max_workers=SWEEP_POOL_SIZE, mp_context=multiprocessing.get_context(method)
+            )
+        return _sweep_pool
+
+
+def _discard_sweep_pool(pool: ProcessPoolExecutor):
+    global _sweep_pool
+    with _sweep_pool_lock:
+        if _sweep_pool is pool:
+            _sweep_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _sweep_chunk(cost_bps: float, initial_capital: float, close: np.ndarray, strategy: str, param_sets: List[Dict]) -> Dict:
+    """Process pool task: metrics of one slice of a grid"""
+    engine = BacktestEngine(cost_bps=cost_bps, initial_capital=initial_capital)
+    return {name: values[:, 0] for name, values in engine.run(close, strategy, param_sets)["metrics"].items()}
+
+
+class BacktestEngine:
+    """
+    Runs the strategy templates over price histories
+    
+    Every template is a vectorized signal function (see STRATEGIES); all
+    of them share run_targets() for positions, returns and costs and
+    performance_metrics() for the summary. Many tickers and parameter sets
+    run as columns of (days, series) batches, and parameter sets share
+    their indicators through Features.
+    """
+    
+    def __init__(self, cost_bps: float = 5.0, initial_capital: float = 10000.0):
+        """
+        Args:
+            cost_bps: Transaction cost, in basis points of the traded value
+            initial_capital: Starting equity of every backtest
+        """
+        self.cost_bps = cost_bps
+        self.initial_capital = initial_capital
+    
+    def backtest(
+        self,
+        df: pd.DataFrame,
+        strategy: str = "buy_hold",
+        include_equity: bool = False,
+        **params
+    ) -> Dict:
+        """
+        Backtest one strategy on one price history
+        
+        Args:
+            df: DataFrame with a Close column (e.g. from MarketDataService)
+            strategy: Template name, one of STRATEGIES
+            include_equity: Also return the daily equity curve
+            **params: Template parameters, overriding its defaults
+        
+        Returns:
+            Dictionary of metrics (plus "equity" as a Series if requested)
+        """
+        
+        close = df["Close"].to_numpy(dtype=np.float64)[:, None]
+        result = self.run(close, strategy, [params], include_equity=include_equity)
+        
+        metrics = {name: values[0, 0].item() for name, values in result["metrics"].items()}
+        metrics["strategy"] = strategy
+        if include_equity:
+            metrics["equity"] = pd.Series(result["equity"][:, 0], index=df.index)
+        return metrics
+    
+    def backtest_many(
+        self,
+        frames: Dict[str, pd.DataFrame],
+        strategy: str = "buy_hold",
+        param_sets: Optional[List[Dict]] = None
+    ) -> List[Dict]:
+        """
+        Backtest one strategy over several tickers and parameter sets at once
+        
+        The histories are aligned on their common dates.
+        
+        Args:
+            frames: Ticker -> DataFrame with a Close column
+            strategy: Template name
+            param_sets: Parameter dictionaries (default: the template defaults)
+        
+        Returns:
+            One metrics dictionary per (parameter set, ticker), with
+            "ticker" and "params" keys
+        """
+        
+        closes = pd.concat({ticker: df["Close"] for ticker, df in frames.items()}, axis=1, join="inner")
+        param_sets = param_sets or [{}]
+        result = self.run(closes.to_numpy(dtype=np.float64), strategy, param_sets)
+        
+        rows = []
+        for i, params in enumerate(param_sets):
+            for j, ticker in enumerate(closes.columns):
+                row = {name: values[i, j].item() for name, values in result["metrics"].items()}
+                row.update(ticker=ticker, strategy=strategy, params=params)
+                rows.append(row)
+        return rows
+    
+    def run(
+        self,
+        close: np.ndarray,
+        strategy: Union[str, Callable[..., np.ndarray]],
+        param_sets: Optional[List[Dict]] = None,
+        include_equity: bool = False
+    ) -> Dict:
+        """
+        Array-level batch backtest
+        
+        Args:
+            close: Closes of shape (days, tickers)
+            strategy: Template name or signal function (Features -> targets)
+            param_sets: Parameter dictionaries; each is applied to every ticker
+            include_equity: Also return the (days, sets * tickers) equity
+        
+        Returns:
+            Dictionary with "metrics": name -> array of shape (sets, tickers)
+        """
+        
+        if isinstance(strategy, str) and strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy '{strategy}', expected one of {tuple(STRATEGIES)}")
+        signal = STRATEGIES[strategy] if isinstance(strategy, str) else strategy
+        
+        close = np.asarray(close, dtype=np.float64)
+        if close.ndim == 1:
+            close = close[:, None]
+        param_sets = param_sets or [{}]
+        num_sets, num_tickers = len(param_sets), close.shape[1]
+        
+        metrics = {}
+        equity = np.empty((len(close), num_sets * num_tickers)) if include_equity else None
+        cost = self.cost_bps / 10000
+        
+        # Kernel calls of about BLOCK_COLUMNS (parameter set, ticker)
+        # columns: one wide batch is memory-bound and slower per series
+        # than a few cache-sized ones
+        for first in range(0, num_tickers, BLOCK_COLUMNS):
+            tickers = slice(first, first + BLOCK_COLUMNS)
+            data = Features(np.ascontiguousarray(close[:, tickers]))
+            width = data.close.shape[1]
+            group_size = max(1, BLOCK_COLUMNS // width)
+            
+            for group in range(0, num_sets, group_size):
+                sets = range(group, min(group + group_size, num_sets))
+                targets = np.hstack([signal(data, **param_sets[i]) for i in sets])
+                prices = np.tile(data.close, (1, len(sets)))
+                
+                curves = run_targets(prices, targets, cost, self.initial_capital)
+                block_metrics = performance_metrics(
+                    curves["equity"], curves["weights"], curves["turnover"], self.initial_capital
+                )
+                for name, values in block_metrics.items():
+                    if name not in metrics:
+                        metrics[name] = np.empty((num_sets, num_tickers), dtype=values.dtype)
+                    metrics[name][sets.start:sets.stop, tickers] = values.reshape(len(sets), width)
+                
+                if include_equity:
+                    for k, i in enumerate(sets):
+                        column = i * num_tickers + first
+                        equity[:, column:column + width] = curves["equity"][:, k * width:(k + 1) * width]
+        
+        result = {"metrics": metrics}
+        if include_equity:
+            result["equity"] = equity
+        return result
+    
+    def sweep(
+        self,
+        close: Union[pd.DataFrame, np.ndarray],
+        strategy: str,
+        grid: Dict[str, Any],
+        sort_by: str = "sharpe_ratio",
+        top: Optional[int] = None,
+        workers: Optional[int] = None
+    ) -> Dict:
+        """
+        Backtest every parameter combination of a template on one series
+        
+        The grid runs as batches of parameter sets over shared indicators
+        (each rolling window is computed once per batch), and grids of at
+        least PARALLEL_SWEEP_MIN combinations are split over the shared
+        process pool (see _get_sweep_pool).
+        
+        Args:
+            close: DataFrame with a Close column, or the closes
+            strategy: Template name
+            grid: Parameter -> values (see parameter_grid)
+            sort_by: Metric to rank by, one of SWEEP_METRICS
+            top: Number of ranked rows to return, at least 1 (default: all)
+            workers: Chunks large grids are split into (default: SWEEP_POOL_SIZE; 1 = in process)
+        
+        Returns:
+            Dictionary with strategy, sort_by, combinations and results:
+            ranked rows of rank, params and SWEEP_METRICS
+        """
+        
+        if sort_by not in SWEEP_METRICS:
+            raise ValueError(f"Unknown sort_by '{sort_by}', expected one of {SWEEP_METRICS}")
+        if top is not None and top < 1:
+            raise ValueError("top must be at least 1")
+        
+        param_sets = parameter_grid(strategy, grid)
+        if isinstance(close, pd.DataFrame):
+            close = close["Close"]
+        close = np.asarray(close, dtype=np.float64).reshape(-1, 1)
+        
+        workers = workers or SWEEP_POOL_SIZE
+        if workers > 1 and len(param_sets) >= PARALLEL_SWEEP_MIN:
+            # Contiguous slices, so neighbouring combinations still share indicators
+            bounds = np.linspace(0, len(param_sets), workers + 1).astype(int)
+            slices = [param_sets[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+            pool = _get_sweep_pool()
+            try:
+                parts = list(pool.map(
+                    _sweep_chunk,
+                    itertools.repeat(self.cost_bps), itertools.repeat(self.initial_capital),
+                    itertools.repeat(close), itertools.repeat(strategy), slices
+                ))
+            except BrokenProcessPool:
+                _discard_sweep_pool(pool)  # e.g. a worker was OOM-killed; the next sweep starts a new pool
+                raise
+            metrics = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+        else:
+            metrics = {name: values[:, 0] for name, values in self.run(close, strategy, param_sets)["metrics"].items()}
+        
+        # Best first, NaN (e.g. no variance) last
+        values = metrics[sort_by].astype(np.float64)
+        keys = values if sort_by in ASCENDING_METRICS else -values
+        order = np.argsort(np.where(np.isnan(keys), np.inf, keys), kind="stable")[:top]
+        
+        results = []
+        for rank, i in enumerate(order, start=1):
+            row = {"rank": rank, "params": param_sets[i]}
+            row.update({name: metrics[name][i].item() for name in SWEEP_METRICS})
+            results.append(row)
+        
+        return {
+            "strategy": strategy,
+            "sort_by": sort_by,
+            "combinations": len(param_sets),
+            "results": results
+        }
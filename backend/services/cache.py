@@ -0,0 +1,164 @@
+"""
+Caching Utilities
+Thread-safe, size-bounded LRU cache with expiry and hit/miss counters,
+and single-flight coalescing of concurrent identical calls
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+# How long market data stays fresh; results derived from it expire with it
+MARKET_DATA_TTL_SECONDS = 3600
+
+
+class LRUCache:
+    """
+    Least-recently-used cache with optional time-to-live
+    
+    Values are stored as-is (no copies), so callers must treat them as
+    read-only. All operations take a lock and are O(1).
+    """
+    
+    def __init__(
+        self,
+        max_size: int = 128,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            max_size: Maximum number of entries (0 disables the cache)
+            ttl: Seconds an entry stays valid (None = until evicted)
+            clock: Time source, in seconds
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        
+        self._entries = OrderedDict()  # key -> (value, stored_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value, or default if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if self.ttl is None or self.clock() - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            
+            self.misses += 1
+            return default
+    
+    def set(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entries if full"""
+        if self.max_size <= 0:
+            return
+        
+        with self._lock:
+            self._entries[key] = (value, self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate(self, key: Hashable):
+        """Drop one entry if present"""
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def info(self) -> Dict:
+        """Size and hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one execution
+    
+    The first caller for a key (the leader) runs the work; callers arriving
+    while it is in flight wait and receive the leader's result or exception.
+    Nothing is kept once the flight lands - pair it with a cache.
+    """
+    
+    class Flight:
+        """One in-flight call"""
+        
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+        
+        def wait(self) -> Any:
+            """Block until the leader finishes; return or raise its outcome"""
+            self.done.wait()
+            if self.error is not None:
+                raise self.error
+            return self.result
+    
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+    
+    def begin(self, key: Hashable) -> Tuple["SingleFlight.Flight", bool]:
+        """
+        Join or start the flight for key
+        
+        Returns:
+            (flight, leader) - a leader must call finish() for the key
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[key] = self.Flight()
+            return flight, True
+    
+    def finish(self, key: Hashable, result: Any = None, error: Optional[BaseException] = None):
+        """Land the flight for key, releasing its waiters"""
+        with self._lock:
+            flight = self._flights.pop(key)
+        flight.result = result
+        flight.error = error
+        flight.done.set()
+    
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run fn() unless a call for key is already in flight, then share its outcome"""
+        flight, leader = self.begin(key)
+        if not leader:
+            return flight.wait()
+        
+        try:
+            result = fn()
+        except BaseException as e:
+            self.finish(key, error=e)
+            raise
+        self.finish(key, result=result)
+        return result
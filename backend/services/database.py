@@ -0,0 +1,191 @@
+"""
+Database
+Engine setup and additive, online schema migrations
+"""
+
+import fcntl
+from contextlib import contextmanager
+from typing import Iterator, List, Set
+
+from sqlalchemy import DateTime, event, inspect, select
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from models import SchemaMigration, db
+
+
+def configure_engine(engine):
+    """
+    Per-connection settings, registered before the engine's first connection
+    
+    SQLite files use write-ahead logging: readers no longer block the
+    writer (like flushes, tag count upserts) or each other, and
+    synchronous=NORMAL only syncs at checkpoints, which WAL keeps safe.
+    """
+    if engine.dialect.name != "sqlite" or engine.url.database in (None, "", ":memory:"):
+        return
+    
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+
+@contextmanager
+def migration_lock(engine) -> Iterator[None]:
+    """
+    Exclusive lock for creating and upgrading a SQLite file's schema
+    
+    Every server process starts by migrating a local SQLite database; the
+    first one does the work while the others wait, then find nothing left
+    to do. Other databases are migrated once by `flask upgrade-db`, so
+    this doesn't lock them.
+    """
+    if engine.dialect.name != "sqlite" or engine.url.database in (None, "", ":memory:"):
+        yield
+        return
+    # flock() locks belong to the open file, so each holder opens its own
+    with open(f"{engine.url.database}.migrate.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _create_index(index, dialect) -> str:
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect))
+    if dialect.name == "postgresql":
+        # Builds without locking out writes; must run outside a transaction
+        ddl = ddl.replace("INDEX", "INDEX CONCURRENTLY", 1)
+    return ddl
+
+
+def _stamped_on_insert(column) -> bool:
+    """DateTime columns the models set when a row is created (default=datetime.utcnow)"""
+    return isinstance(column.type, DateTime) and column.default is not None and column.default.is_callable
+
+
+def _backfill(table, column, dialect) -> str:
+    """Give rows with no timestamp the table's earliest one (or the current UTC time)"""
+    preparer = dialect.identifier_preparer
+    name, table_name = preparer.format_column(column), preparer.format_table(table)
+    now = "(now() AT TIME ZONE 'utc')" if dialect.name == "postgresql" else "CURRENT_TIMESTAMP"
+    return (
+        f"UPDATE {table_name} SET {name} = COALESCE((SELECT MIN({name}) FROM {table_name}), {now}) "
+        f"WHERE {name} IS NULL"
+    )
+
+
+def _backfill_name(column) -> str:
+    return f"backfill {column.table.name}.{column.name}"
+
+
+def _record(name: str, dialect) -> str:
+    """Mark a data migration completed (see SchemaMigration)"""
+    table = SchemaMigration.__table__
+    preparer = dialect.identifier_preparer
+    return (
+        f"INSERT INTO {preparer.format_table(table)} ({preparer.format_column(table.c.name)}) "
+        f"VALUES ('{name}') ON CONFLICT DO NOTHING"
+    )
+
+
+def _completed(engine, existing: Set[str]) -> Set[str]:
+    """Names of the data migrations already recorded"""
+    if SchemaMigration.__tablename__ not in existing:
+        return set()
+    with engine.connect() as conn:
+        return set(conn.execute(select(SchemaMigration.name)).scalars())
+
+
+def pending_changes(engine) -> List[str]:
+    """
+    DDL that brings an existing database up to the models, in order
+    
+    Only expands the schema - missing tables, columns and indexes - so code
+    still running against the old schema keeps working while this runs
+    and until it is replaced (expand, then deploy). Nothing is dropped
+    or altered in place.
+    
+    - Tables are created with their indexes, parents before children.
+    - Columns are added nullable and without defaults, which is a
+      metadata-only change in PostgreSQL and SQLite; existing rows read
+      NULL, which the serializers and counters already handle.
+    - Creation timestamps (see _stamped_on_insert) that are NULL, e.g.
+      on rows written before their column existed, are backfilled with
+      the table's earliest one: keyset pages and "newest first" lists
+      then show those rows as the oldest, in id order. Each column is
+      checked once; the check is then recorded in schema_migrations,
+      since the models stamp every new row.
+    - Indexes on existing tables are built CONCURRENTLY in PostgreSQL.
+      A concurrent build that fails leaves an INVALID index that this
+      won't replace; drop it and run again.
+    """
+    
+    dialect = engine.dialect
+    inspector = inspect(engine)
+    existing = set(inspector.get_table_names())
+    completed = _completed(engine, existing)
+    statements = []
+    records = []  # Last, once schema_migrations surely exists
+    
+    for table in db.metadata.sorted_tables:
+        backfills = {
+            column.name for column in table.columns
+            if _stamped_on_insert(column) and _backfill_name(column) not in completed
+        }
+        records.extend(_record(_backfill_name(table.c[name]), dialect) for name in sorted(backfills))
+        
+        if table.name not in existing:
+            statements.append(str(CreateTable(table).compile(dialect=dialect)).strip())
+            statements.extend(_create_index(index, dialect) for index in sorted(table.indexes, key=lambda i: i.name))
+            continue
+        
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns:
+                statements.append(
+                    f"ALTER TABLE {dialect.identifier_preparer.format_table(table)} "
+                    f"ADD COLUMN {dialect.identifier_preparer.format_column(column)} "
+                    f"{column.type.compile(dialect=dialect)}"
+                )
+                if column.name in backfills:
+                    statements.append(_backfill(table, column, dialect))
+            elif column.name in backfills and _has_nulls(engine, column):
+                statements.append(_backfill(table, column, dialect))
+        
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            if index.name not in indexes:
+                statements.append(_create_index(index, dialect))
+    
+    return statements + records
+
+
+def _has_nulls(engine, column) -> bool:
+    with engine.connect() as conn:
+        return conn.execute(select(1).where(column.is_(None)).limit(1)).first() is not None
+
+
+def upgrade(engine, dry_run: bool = False) -> List[str]:
+    """
+    Apply pending_changes(), each statement in its own transaction
+    
+    Safe to run again (or after a partial run); concurrent runs may fail
+    on a column another run added first and should simply be repeated,
+    or be serialized with migration_lock().
+    
+    Returns:
+        Statements applied (or that would be, with dry_run)
+    """
+    
+    statements = pending_changes(engine)
+    if dry_run or not statements:
+        return statements
+    
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for statement in statements:
+            conn.exec_driver_sql(statement)
+    return statements
@@ -0,0 +1,337 @@
+"""
+Technical Indicators
+Vectorized indicator primitives and an incremental indicator engine
+"""
+
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, Hashable, Optional, Tuple
+
+from services.cache import LRUCache
+
+
+# ========== PRIMITIVES ==========
+# All take float64 arrays of shape (rows,) or (rows, series) and work along
+# axis 0, returning the same shape; rows without enough history are NaN,
+# like pandas rolling(window) with min_periods=window.
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Simple moving average"""
+    out = np.full(values.shape, np.nan)
+    if len(values) >= window:
+        sums = np.cumsum(values, axis=0)
+        out[window - 1] = sums[window - 1]
+        out[window:] = sums[window:] - sums[:-window]
+        out[window - 1:] /= window
+    return out
+
+
+def _rolling(values: np.ndarray, window: int):
+    """pandas rolling window over axis 0 (O(n) max / min / std, unlike strided views)"""
+    frame = pd.DataFrame(values) if values.ndim == 2 else pd.Series(values)
+    return frame.rolling(window)
+
+
+def rolling_std(values: np.ndarray, window: int, ddof: int = 1) -> np.ndarray:
+    """Moving standard deviation"""
+    return _rolling(values, window).std(ddof=ddof).to_numpy()
+
+
+def rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    """Highest value of the last window rows"""
+    return _rolling(values, window).max().to_numpy()
+
+
+def rolling_min(values: np.ndarray, window: int) -> np.ndarray:
+    """Lowest value of the last window rows"""
+    return _rolling(values, window).min().to_numpy()
+
+
+def ema(values: np.ndarray, alpha: float, initial: Optional[float] = None) -> np.ndarray:
+    """
+    Exponential moving average, y[t] = alpha * x[t] + (1 - alpha) * y[t-1]
+    
+    Args:
+        values: Input series
+        alpha: Smoothing factor (2 / (span + 1) for a span)
+        initial: y[-1] of a 1-D series, to continue a previous run; by
+            default y[0] = x[0]
+    """
+    if values.ndim == 2:
+        return pd.DataFrame(values).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    if initial is None or np.isnan(initial):
+        return pd.Series(values).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    # Seeding the recursion with the previous value continues it exactly
+    seeded = pd.Series(np.concatenate([[initial], values]))
+    return seeded.ewm(alpha=alpha, adjust=False).mean().to_numpy()[1:]
+
+
+def rsi(close: np.ndarray, period: int = 14) -> np.ndarray:
+    """Relative strength index with Wilder smoothing (NaN for the first period rows)"""
+    out = np.full(close.shape, np.nan)
+    if len(close) <= period:
+        return out
+    
+    moves = np.diff(close, axis=0)
+    gains = ema(np.maximum(moves, 0), 1 / period)
+    losses = ema(np.maximum(-moves, 0), 1 / period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[1:] = 100 - 100 / (1 + gains / losses)
+    out[:period] = np.nan
+    return out
+
+
+def simple_returns(close: np.ndarray) -> np.ndarray:
+    """Close-to-close returns; the first row is NaN"""
+    out = np.full(close.shape, np.nan)
+    np.divide(close[1:], close[:-1], out=out[1:])
+    out[1:] -= 1
+    return out
+
+
+def drawdown(close: np.ndarray, peak: float = -np.inf) -> Tuple[np.ndarray, float]:
+    """
+    Running drawdown from the highest close so far
+    
+    Args:
+        close: Closes
+        peak: Highest close before this segment, to continue a previous run
+    
+    Returns:
+        (close / running peak - 1, new peak)
+    """
+    peaks = np.maximum.accumulate(np.concatenate([[peak], close]))[1:]
+    return close / peaks - 1, float(peaks[-1]) if len(peaks) else peak
+
+
+def max_drawdown(close: np.ndarray) -> float:
+    """Largest peak-to-trough decline of a series, as a negative fraction"""
+    if len(close) == 0:
+        return 0.0
+    return float(np.min(drawdown(close)[0]))
+
+
+# ========== INCREMENTAL ENGINE ==========
+
+class IndicatorSet:
+    """
+    Indicators of one growing price series
+    
+    Values live in preallocated, geometrically grown column buffers, so
+    extend() with m new closes costs O(m + longest window): windowed
+    indicators are recomputed over just the new rows plus their lookback,
+    and recursive ones (EMA, RSI, MACD, drawdown) carry their last state.
+    """
+    
+    def __init__(self, engine: "IndicatorEngine", capacity: int = 1024):
+        self.engine = engine
+        self.length = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.lock = threading.Lock()
+        
+        self._capacity = capacity
+        self._close = np.empty(capacity)
+        self._columns = {name: np.empty(capacity) for name in engine.column_names()}
+        self._state = {}  # Last value of every recursive quantity
+    
+    def matches(self, index: pd.DatetimeIndex, close: np.ndarray) -> bool:
+        """Whether (index, close) starts with the series this set has seen"""
+        n = self.length
+        return (
+            n > 0 and len(index) >= n
+            and index[0] == self.first_timestamp
+            and index[n - 1] == self.last_timestamp
+            and close[n - 1] == self._close[n - 1]
+        )
+    
+    def extend(self, index: pd.DatetimeIndex, close: np.ndarray):
+        """Compute the indicators of the rows of (index, close) not seen yet"""
+        
+        start, end = self.length, len(close)
+        if end <= start:
+            return
+        self._reserve(end)
+        self._close[start:end] = close[start:]
+        
+        engine = self.engine
+        lookback = max(start - engine.max_window(), 0)
+        window_close = self._close[lookback:end]
+        new = slice(start - lookback, None)
+        columns = self._columns
+        
+        for window in engine.ma_windows:
+            columns[f"MA_{window}"][start:end] = rolling_mean(window_close, window)[new]
+        
+        for span in engine.ema_spans:
+            name = f"EMA_{span}"
+            values = ema(close[start:], 2 / (span + 1), self._state.get(name))
+            columns[name][start:end] = values
+            self._state[name] = values[-1]
+        
+        # RSI: Wilder-smoothed average gain / loss of close-to-close moves
+        period = engine.rsi_period
+        first = max(start, 1)  # The first day has no move
+        moves = self._close[first:end] - self._close[first - 1:end - 1]
+        rsi = np.full(end - start, np.nan)
+        if len(moves):
+            gains = ema(np.maximum(moves, 0), 1 / period, self._state.get("avg_gain"))
+            losses = ema(np.maximum(-moves, 0), 1 / period, self._state.get("avg_loss"))
+            self._state["avg_gain"], self._state["avg_loss"] = gains[-1], losses[-1]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                rsi[first - start:] = 100 - 100 / (1 + gains / losses)
+        rsi[np.arange(start, end) < period] = np.nan
+        columns[f"RSI_{period}"][start:end] = rsi
+        
+        window, width = engine.bollinger
+        middle = rolling_mean(window_close, window)[new]
+        spread = width * rolling_std(window_close, window)[new]
+        columns["BB_Middle"][start:end] = middle
+        columns["BB_Upper"][start:end] = middle + spread
+        columns["BB_Lower"][start:end] = middle - spread
+        
+        fast, slow, signal = engine.macd
+        fast_ema = ema(close[start:], 2 / (fast + 1), self._state.get("macd_fast"))
+        slow_ema = ema(close[start:], 2 / (slow + 1), self._state.get("macd_slow"))
+        macd = fast_ema - slow_ema
+        macd_signal = ema(macd, 2 / (signal + 1), self._state.get("macd_signal"))
+        self._state.update(macd_fast=fast_ema[-1], macd_slow=slow_ema[-1], macd_signal=macd_signal[-1])
+        columns["MACD"][start:end] = macd
+        columns["MACD_Signal"][start:end] = macd_signal
+        columns["MACD_Hist"][start:end] = macd - macd_signal
+        
+        window = engine.volatility_window
+        returns = simple_returns(window_close)
+        columns[f"Volatility_{window}"][start:end] = rolling_std(returns, window)[new] * np.sqrt(252)
+        
+        columns["Drawdown"][start:end], self._state["peak"] = drawdown(
+            close[start:], self._state.get("peak", -np.inf)
+        )
+        
+        self.length = end
+        if start == 0:
+            self.first_timestamp = index[0]
+        self.last_timestamp = index[end - 1]
+    
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Read-only views of every indicator column"""
+        views = {}
+        for name, buffer in self._columns.items():
+            view = buffer[:self.length]
+            view.flags.writeable = False
+            views[name] = view
+        return views
+    
+    def _reserve(self, size: int):
+        """Grow the buffers (doubling) to hold at least size rows"""
+        if size <= self._capacity:
+            return
+        capacity = max(size, 2 * self._capacity)
+        self._close = self._grow(self._close, capacity)
+        self._columns = {name: self._grow(buffer, capacity) for name, buffer in self._columns.items()}
+        self._capacity = capacity
+    
+    def _grow(self, buffer: np.ndarray, capacity: int) -> np.ndarray:
+        # Views handed out earlier keep pointing at the old buffer, which stays valid
+        grown = np.empty(capacity)
+        grown[:self.length] = buffer[:self.length]
+        return grown
+
+
+class IndicatorEngine:
+    """
+    Computes a fixed set of indicators over price series, caching them
+    per series and updating them incrementally as bars are appended
+    
+    Columns:
+        MA_<w>: Simple moving averages of the close, for each w in ma_windows
+        EMA_<s>: Exponential moving averages, for each span s in ema_spans
+        RSI_<p>: Relative strength index with Wilder smoothing
+        BB_Middle / BB_Upper / BB_Lower: Bollinger bands
+        MACD / MACD_Signal / MACD_Hist: MACD line, signal line, histogram
+        Volatility_<w>: Annualized rolling volatility of daily returns
+        Drawdown: Decline from the running peak close, as a fraction
+    """
+    
+    def __init__(
+        self,
+        ma_windows: Tuple[int, ...] = (20, 50, 200),
+        ema_spans: Tuple[int, ...] = (12, 26),
+        rsi_period: int = 14,
+        bollinger: Tuple[int, float] = (20, 2.0),
+        macd: Tuple[int, int, int] = (12, 26, 9),
+        volatility_window: int = 21,
+        cache_size: int = 64
+    ):
+        """
+        Args:
+            ma_windows: Simple moving average windows
+            ema_spans: Exponential moving average spans
+            rsi_period: RSI smoothing period
+            bollinger: (window, number of standard deviations)
+            macd: (fast span, slow span, signal span)
+            volatility_window: Rolling volatility window
+            cache_size: Number of series whose indicators are kept
+        """
+        self.ma_windows = tuple(ma_windows)
+        self.ema_spans = tuple(ema_spans)
+        self.rsi_period = rsi_period
+        self.bollinger = bollinger
+        self.macd = macd
+        self.volatility_window = volatility_window
+        self._sets = LRUCache(max_size=cache_size)
+    
+    def column_names(self) -> Tuple[str, ...]:
+        """Names of the computed columns, in order"""
+        return (
+            *(f"MA_{window}" for window in self.ma_windows),
+            *(f"EMA_{span}" for span in self.ema_spans),
+            f"RSI_{self.rsi_period}",
+            "BB_Middle", "BB_Upper", "BB_Lower",
+            "MACD", "MACD_Signal", "MACD_Hist",
+            f"Volatility_{self.volatility_window}",
+            "Drawdown"
+        )
+    
+    def max_window(self) -> int:
+        """Longest lookback any windowed indicator needs"""
+        return max(*self.ma_windows, self.bollinger[0], self.volatility_window + 1)
+    
+    def compute(
+        self,
+        index: pd.DatetimeIndex,
+        close: np.ndarray,
+        key: Optional[Hashable] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Indicators of a price series
+        
+        With a key, the results are cached under it: if the series only
+        gained rows at the end since the last call, just those rows are
+        computed; any other change recomputes from scratch.
+        
+        Args:
+            index: Timestamps of the series
+            close: Closing prices
+            key: Identity of the series, e.g. (ticker, interval)
+        
+        Returns:
+            Dictionary of column name -> read-only array aligned with close
+        """
+        close = np.ascontiguousarray(close, dtype=np.float64)
+        
+        indicator_set = self._sets.get(key) if key is not None else None
+        if indicator_set is None or not indicator_set.matches(index, close):
+            indicator_set = IndicatorSet(self, capacity=max(1024, len(close)))
+            if key is not None:
+                self._sets.set(key, indicator_set)
+        
+        with indicator_set.lock:
+            if not indicator_set.length or indicator_set.matches(index, close):
+                indicator_set.extend(index, close)
+            return indicator_set.columns()
+    
+    def info(self) -> Dict:
+        """Size and hit/miss counters of the per-series cache"""
+        return self._sets.info()
@@ -0,0 +1,391 @@
+"""
+Job Queue
+Background job queue for long-running simulations, shared by every server
+process through the database
+"""
+
+import json
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from sqlalchemy import delete, func, insert, select, update
+
+from models import SimulationJob, db
+
+
+class QueueFullError(Exception):
+    """The queue is at its maximum depth"""
+
+
+class UserLimitError(Exception):
+    """The user already has the maximum number of active jobs"""
+
+
+class JobCancelled(Exception):
+    """Raised inside a runner that noticed its job was cancelled"""
+
+
+class Job:
+    """One queued unit of work and its outcome"""
+    
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    FINISHED = (DONE, FAILED, CANCELLED)
+    ACTIVE = (QUEUED, RUNNING)
+    
+    def __init__(self, user_id: Hashable, params: Dict, job_id: Optional[str] = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.user_id = user_id
+        self.params = params
+        self.status = self.QUEUED
+        self.result = None
+        self.data = None  # Optional binary body, set by the runner
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        
+        # Set when a cancellation reaches the process running the job;
+        # runners poll it between units of work
+        self.cancel_event = threading.Event()
+    
+    @classmethod
+    def from_row(cls, row) -> "Job":
+        """Job from a simulation_jobs row (result columns if selected)"""
+        job = cls(row.user_id, json.loads(row.params), job_id=row.id)
+        job.status = row.status
+        job.error = row.error
+        job.created_at = row.created_at
+        job.started_at = row.started_at
+        job.finished_at = row.finished_at
+        if "result" in row._fields:
+            job.result = json.loads(row.result) if row.result is not None else None
+            job.data = row.data
+        return job
+    
+    @property
+    def finished(self) -> bool:
+        return self.status in self.FINISHED
+    
+    def to_dict(self) -> Dict:
+        """JSON-friendly status (without the result)"""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+class JobQueue:
+    """
+    Bounded FIFO of jobs, stored in the simulation_jobs table and served by
+    worker threads in every server process
+    
+    - submit() refuses work beyond `max_depth` queued jobs or
+      `max_per_user` active (queued or running) jobs per user; concurrent
+      submits from several processes may overshoot a limit by a job each
+    - workers claim the oldest queued job with one conditional UPDATE, so
+      each job runs exactly once whichever process claims it
+    - cancel() drops queued jobs and flags running ones; the process
+      running a job checks its flags every `poll_interval` seconds
+    - wait() blocks until a job finishes, for long polling, from any process
+    - running jobs send a heartbeat every `heartbeat_interval` seconds; a
+      job whose process died is failed after `stale_after` seconds
+    - finished jobs (and their results) are kept for `result_ttl` seconds
+    
+    The runner's return value is stored as JSON; a runner may also attach
+    a binary body as job.data.
+    """
+    
+    def __init__(
+        self,
+        app,
+        runner: Callable[[Job], Any],
+        num_workers: int = 2,
+        max_depth: int = 100,
+        max_per_user: int = 2,
+        result_ttl: float = 600,
+        poll_interval: float = 0.5,
+        heartbeat_interval: float = 5.0,
+        stale_after: float = 60.0
+    ):
+        """
+        Args:
+            app: Flask app, for the database context of the worker threads
+            runner: Called with each job on a worker thread; its return value
+                becomes job.result. It should check job.cancel_event and
+                raise JobCancelled to stop early
+            num_workers: Number of worker threads per process
+            max_depth: Maximum number of queued (not yet running) jobs
+            max_per_user: Maximum number of active jobs per user
+            result_ttl: Seconds finished jobs stay retrievable
+            poll_interval: Seconds between checks for new jobs, cancellations
+                and (while waiting) finished jobs of other processes
+            heartbeat_interval: Seconds between heartbeats of running jobs
+            stale_after: Seconds without a heartbeat after which a running
+                job is failed (its process is gone)
+        """
+        self.app = app
+        self.runner = runner
+        self.num_workers = num_workers
+        self.max_depth = max_depth
+        self.max_per_user = max_per_user
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        
+        self._table = SimulationJob.__table__
+        self._running: Dict[str, Job] = {}  # Jobs running in this process
+        self._lock = threading.Lock()
+        self._work_ready = threading.Condition(self._lock)  # A job was submitted here
+        self._job_done = threading.Condition(self._lock)  # A job finished here
+        self._threads = None
+    
+    def submit(self, user_id: Hashable, params: Dict) -> Job:
+        """
+        Enqueue a job
+        
+        Raises:
+            QueueFullError: Too many queued jobs overall
+            UserLimitError: Too many active jobs for this user
+        """
+        self._start()
+        table = self._table
+        job = Job(user_id, params)
+        
+        with self.app.app_context(), db.engine.begin() as conn:
+            self._reap(conn)
+            
+            queued = conn.execute(select(func.count()).where(table.c.status == Job.QUEUED)).scalar()
+            if queued >= self.max_depth:
+                raise QueueFullError("Simulation queue is full, try again shortly")
+            active = conn.execute(
+                select(func.count()).where(table.c.user_id == user_id, table.c.status.in_(Job.ACTIVE))
+            ).scalar()
+            if active >= self.max_per_user:
+                raise UserLimitError(
+                    f"At most {self.max_per_user} simulations can run at once per user"
+                )
+            
+            conn.execute(insert(table).values(
+                id=job.id,
+                user_id=user_id,
+                params=json.dumps(params),
+                status=Job.QUEUED,
+                cancel_requested=False,
+                created_at=job.created_at
+            ))
+        
+        with self._work_ready:
+            self._work_ready.notify()
+        return job
+    
+    def get(self, job_id: str, with_result: bool = False) -> Optional[Job]:
+        """Look up a job by id (with its result and data if requested)"""
+        self._start()
+        table = self._table
+        columns = [
+            table.c.id, table.c.user_id, table.c.params, table.c.status, table.c.error,
+            table.c.created_at, table.c.started_at, table.c.finished_at
+        ]
+        if with_result:
+            columns += [table.c.result, table.c.data]
+        
+        with self.app.app_context(), db.engine.connect() as conn:
+            row = conn.execute(select(*columns).where(table.c.id == job_id)).first()
+        return Job.from_row(row) if row is not None else None
+    
+    def wait(self, job_id: str, timeout: float) -> Optional[Job]:
+        """Block up to timeout seconds for a job to finish, then return it with its result"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job.finished or remaining <= 0:
+                break
+            # Woken early by jobs finishing in this process; others are polled
+            with self._job_done:
+                self._job_done.wait(min(self.poll_interval, remaining))
+        
+        if job is not None and job.finished:
+            return self.get(job_id, with_result=True)
+        return job
+    
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued job, or ask a running one to stop"""
+        table = self._table
+        with self.app.app_context(), db.engine.begin() as conn:
+            # The worker that would have claimed it won't see it as queued
+            conn.execute(
+                update(table)
+                .where(table.c.id == job_id, table.c.status == Job.QUEUED)
+                .values(status=Job.CANCELLED, cancel_requested=True, finished_at=time.time())
+            )
+            conn.execute(
+                update(table)
+                .where(table.c.id == job_id, table.c.status == Job.RUNNING)
+                .values(cancel_requested=True)
+            )
+        
+        with self._lock:
+            running = self._running.get(job_id)
+        if running is not None:
+            running.cancel_event.set()
+        return self.get(job_id)
+    
+    def stats(self) -> Dict:
+        """Counts of jobs by status"""
+        self._start()
+        table = self._table
+        with self.app.app_context(), db.engine.connect() as conn:
+            rows = conn.execute(select(table.c.status, func.count()).group_by(table.c.status))
+            return {status: count for status, count in rows}
+    
+    def _start(self):
+        """Start the worker and monitor threads on first use"""
+        with self._lock:
+            if self._threads is not None:
+                return
+            # Started lazily, so forked server workers each get their own and
+            # CLI commands importing the app don't claim jobs
+            self._threads = [
+                threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                for i in range(self.num_workers)
+            ]
+            self._threads.append(threading.Thread(target=self._monitor, name="job-monitor", daemon=True))
+            for thread in self._threads:
+                thread.start()
+    
+    def _work(self):
+        """Worker thread loop"""
+        while True:
+            try:
+                job = self._claim()
+            except Exception as e:
+                print(f"Job claim failed: {e}")
+                job = None
+            
+            if job is None:
+                with self._work_ready:
+                    self._work_ready.wait(self.poll_interval)
+                continue
+            
+            with self._lock:
+                self._running[job.id] = job
+            try:
+                result = self.runner(job)
+                status, error = Job.DONE, None
+                encoded = json.dumps(result)
+            except JobCancelled:
+                status, encoded, error = Job.CANCELLED, None, None
+            except Exception as e:
+                print(f"Job {job.id} failed: {e}")
+                status, encoded, error = Job.FAILED, None, str(e)
+            
+            try:
+                self._finish(job, status, encoded, error)
+            except Exception as e:
+                print(f"Job {job.id} could not be saved: {e}")
+            finally:
+                with self._job_done:
+                    del self._running[job.id]
+                    self._job_done.notify_all()
+    
+    def _claim(self) -> Optional[Job]:
+        """Mark the oldest queued job running and return it (None if there is none)"""
+        table = self._table
+        oldest = (
+            select(table.c.id)
+            .where(table.c.status == Job.QUEUED)
+            .order_by(table.c.created_at)
+            .limit(1)
+            .scalar_subquery()
+        )
+        now = time.time()
+        statement = (
+            update(table)
+            # Re-checking the status makes a race between processes claim once
+            .where(table.c.id == oldest, table.c.status == Job.QUEUED)
+            .values(status=Job.RUNNING, started_at=now, heartbeat_at=now)
+            .returning(table.c.id, table.c.user_id, table.c.params, table.c.created_at)
+        )
+        with self.app.app_context(), db.engine.begin() as conn:
+            row = conn.execute(statement).first()
+        if row is None:
+            return None
+        
+        job = Job(row.user_id, json.loads(row.params), job_id=row.id)
+        job.status = Job.RUNNING
+        job.created_at = row.created_at
+        job.started_at = now
+        return job
+    
+    def _finish(self, job: Job, status: str, result: Optional[str], error: Optional[str]):
+        """Store a job's outcome, unless it was failed as stale meanwhile"""
+        table = self._table
+        with self.app.app_context(), db.engine.begin() as conn:
+            conn.execute(
+                update(table)
+                .where(table.c.id == job.id, table.c.status == Job.RUNNING)
+                .values(
+                    status=status,
+                    result=result,
+                    data=job.data if status == Job.DONE else None,
+                    error=error,
+                    finished_at=time.time()
+                )
+            )
+    
+    def _monitor(self):
+        """Deliver cancellations to local jobs, send heartbeats, expire old jobs"""
+        table = self._table
+        last_heartbeat = 0.0
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                running = dict(self._running)
+            heartbeat = time.monotonic() - last_heartbeat >= self.heartbeat_interval
+            if not running and not heartbeat:
+                continue
+            
+            try:
+                with self.app.app_context(), db.engine.begin() as conn:
+                    if running:
+                        cancelled = conn.execute(
+                            select(table.c.id).where(table.c.id.in_(running), table.c.cancel_requested)
+                        ).scalars()
+                        for job_id in cancelled:
+                            running[job_id].cancel_event.set()
+                    if heartbeat:
+                        last_heartbeat = time.monotonic()
+                        if running:
+                            conn.execute(
+                                update(table)
+                                .where(table.c.id.in_(running), table.c.status == Job.RUNNING)
+                                .values(heartbeat_at=time.time())
+                            )
+                        self._reap(conn)
+            except Exception as e:
+                print(f"Job monitor failed: {e}")
+    
+    def _reap(self, conn):
+        """Fail jobs whose process stopped heartbeating; drop expired finished jobs"""
+        table = self._table
+        now = time.time()
+        conn.execute(
+            update(table)
+            .where(table.c.status == Job.RUNNING, table.c.heartbeat_at < now - self.stale_after)
+            .values(status=Job.FAILED, error="The server stopped while running this job", finished_at=now)
+        )
+        conn.execute(
+            delete(table).where(table.c.status.in_(Job.FINISHED), table.c.finished_at < now - self.result_ttl)
+        )
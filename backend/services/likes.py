@@ -0,0 +1,218 @@
+"""
+Likes
+Per-user likes of posts and strategies, with counters kept by batched,
+write-behind increments
+"""
+
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, func, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import Like, Post, Strategy, db
+
+
+# Likeable models by target type; each has a likes counter column
+LIKE_TARGETS = {
+    "post": Post,
+    "strategy": Strategy
+}
+
+DELETE_BATCH = 500  # (type, id, user) keys per DELETE ... IN statement
+
+# (target_type, target_id, user_id) -> liked (True) or unliked (False)
+LikeKey = Tuple[str, int, int]
+
+
+def dialect_insert(table):
+    """INSERT with ON CONFLICT support for the configured database"""
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table)
+    if dialect == "sqlite":
+        return sqlite.insert(table)
+    raise ValueError(f"Upserts need PostgreSQL or SQLite, not {dialect}")
+
+
+def apply_likes(batch: Dict[LikeKey, bool]) -> Dict[Tuple[str, int], int]:
+    """
+    Write a batch of like / unlike actions in one transaction
+    
+    Likes are inserted with ON CONFLICT DO NOTHING and unlikes deleted,
+    both RETURNING the rows they changed, so repeated or concurrent
+    actions (double clicks, other processes) change nothing twice. The
+    counters then move by exactly those changes with atomic
+    `likes = likes + delta` updates - no read-modify-write - in id order,
+    so concurrent flushes lock rows in the same order.
+    
+    Args:
+        batch: Final state per (target_type, target_id, user_id)
+    
+    Returns:
+        Counter change per (target_type, target_id)
+    """
+    
+    table = Like.__table__
+    likes = [
+        {"target_type": key[0], "target_id": key[1], "user_id": key[2]}
+        for key, liked in sorted(batch.items()) if liked
+    ]
+    unlikes = [key for key, liked in sorted(batch.items()) if not liked]
+    deltas = Counter()
+    
+    with db.engine.begin() as conn:
+        if likes:
+            statement = dialect_insert(table).on_conflict_do_nothing().returning(table.c.target_type, table.c.target_id)
+            for target_type, target_id in conn.execute(statement, likes):
+                deltas[(target_type, target_id)] += 1
+        
+        for start in range(0, len(unlikes), DELETE_BATCH):
+            statement = delete(table).where(
+                tuple_(table.c.target_type, table.c.target_id, table.c.user_id).in_(unlikes[start:start + DELETE_BATCH])
+            ).returning(table.c.target_type, table.c.target_id)
+            for target_type, target_id in conn.execute(statement):
+                deltas[(target_type, target_id)] -= 1
+        
+        for target_type, model in LIKE_TARGETS.items():
+            changes = [
+                {"target": target_id, "delta": delta}
+                for (kind, target_id), delta in sorted(deltas.items())
+                if kind == target_type and delta
+            ]
+            if changes:
+                column = model.__table__.c.likes
+                statement = (
+                    update(model.__table__)
+                    .where(model.__table__.c.id == bindparam("target"))
+                    .values(likes=func.coalesce(column, 0) + bindparam("delta"))
+                )
+                conn.execute(statement, changes)
+    
+    return dict(deltas)
+
+
+class LikeBuffer:
+    """
+    In-process write-behind buffer of like / unlike actions
+    
+    like() and unlike() only record the latest action per (target, user)
+    in memory and return; a background thread hands the buffer to
+    apply_likes() every `interval` seconds, or sooner once `max_pending`
+    actions are waiting. A like and an unlike within one interval cancel
+    out before reaching the database, and a popular post costs one
+    counter update per flush instead of one per click.
+    
+    Every process (e.g. gunicorn worker) has its own buffer; they stay
+    correct together because apply_likes() only counts rows the database
+    actually changed. Counters lag actions by up to `interval` seconds,
+    and actions buffered when a process dies without flushing are lost.
+    Failed flushes are retried with the next one.
+    """
+    
+    def __init__(
+        self,
+        app,
+        interval: float = 1.0,
+        max_pending: int = 1000,
+        on_flush: Optional[Callable[[Dict[Tuple[str, int], int]], None]] = None
+    ):
+        """
+        Args:
+            app: Flask app, for the database context of the flush thread
+            interval: Seconds between flushes
+            max_pending: Buffered actions that trigger an early flush
+            on_flush: Called with apply_likes()' counter changes after
+                each successful flush; its errors are logged and ignored
+        """
+        self.app = app
+        self.interval = interval
+        self.max_pending = max_pending
+        self.on_flush = on_flush
+        
+        self._pending: Dict[LikeKey, bool] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # One flush at a time
+        self._wake = threading.Event()
+        self._thread = None
+        
+        self.flushes = 0
+        self.failures = 0
+        self.last_flush_seconds = 0.0
+    
+    def like(self, target_type: str, target_id: int, user_id: int):
+        self._record((target_type, target_id, user_id), True)
+    
+    def unlike(self, target_type: str, target_id: int, user_id: int):
+        self._record((target_type, target_id, user_id), False)
+    
+    def flush(self) -> int:
+        """
+        Write all buffered actions now (also called at exit)
+        
+        Returns:
+            Number of actions written (0 if the flush failed)
+        """
+        
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            
+            started = time.perf_counter()
+            try:
+                with self.app.app_context():
+                    deltas = apply_likes(batch)
+            except Exception as e:
+                print(f"Like flush failed, retrying with the next one: {e}")
+                self.failures += 1
+                with self._lock:
+                    # Actions recorded since the batch was taken are newer
+                    for key, liked in batch.items():
+                        self._pending.setdefault(key, liked)
+                return 0
+            
+            self.flushes += 1
+            self.last_flush_seconds = time.perf_counter() - started
+            if self.on_flush is not None and deltas:
+                try:
+                    self.on_flush(deltas)
+                except Exception as e:
+                    # The likes are written; a failing hook mustn't stop the flush thread
+                    print(f"Like flush hook failed: {e}")
+            return len(batch)
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "last_flush_seconds": self.last_flush_seconds
+        }
+    
+    def _record(self, key: LikeKey, liked: bool):
+        if key[0] not in LIKE_TARGETS:
+            raise ValueError(f"Unknown like target '{key[0]}', expected one of {tuple(LIKE_TARGETS)}")
+        
+        with self._lock:
+            self._pending[key] = liked
+            full = len(self._pending) >= self.max_pending
+            if self._thread is None:
+                # Started on first use, so forked server workers each get their own
+                self._thread = threading.Thread(target=self._run, name="like-flusher", daemon=True)
+                self._thread.start()
+        if full:
+            self._wake.set()
+    
+    def _run(self):
+        """Flush thread loop"""
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
@@ -3,20 +3,57 @@ Market Data Service - BULLETPROOF VERSION
 Always works - uses mock data if real data fails
 """
 
-import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 import time
 
+from services.cache import LRUCache, MARKET_DATA_TTL_SECONDS, SingleFlight
+from services.indicators import IndicatorEngine, max_drawdown, rolling_mean
+from services.price_fetcher import PriceFetcher, YahooFetcher
+from services.price_store import PriceStore
+from services.synthetic_data import SyntheticMarketData
+
 
 class MarketDataService:
     """Service for fetching and processing market data"""
     
-    def __init__(self):
-        self.cache = {}
+    OVERLAP_BARS = 5  # Stored bars re-downloaded by a refresh to check they still match
+    OVERLAP_RTOL = 1e-4  # Relative Close difference treated as a changed history
+    
+    def __init__(
+        self,
+        store: Optional[PriceStore] = None,
+        fetcher: Optional[PriceFetcher] = None,
+        incremental: bool = True,
+        synthetic: Optional[SyntheticMarketData] = None,
+        indicators: Optional[IndicatorEngine] = None
+    ):
+        """
+        Args:
+            store: Persistent price store shared by every worker process
+                (default: PriceStore() under $PRICE_STORE_DIR)
+            fetcher: Source of raw OHLCV bars (default: YahooFetcher());
+                pass a stub PriceFetcher to run offline
+            incremental: Refresh expired series by downloading only the
+                bars after the last stored one
+            synthetic: Generator of the mock data used when every real
+                source fails
+            indicators: Engine computing (and caching) technical indicators
+        """
+        self.store = store if store is not None else PriceStore()
+        self.fetcher = fetcher if fetcher is not None else YahooFetcher()
+        self.incremental = incremental
+        self.synthetic = synthetic if synthetic is not None else SyntheticMarketData()
         self.use_mock_data = False  # Set to True to always use mock data
+        
+        # Concurrent misses for one (ticker, interval) share a single download
+        self._inflight = SingleFlight()
+        
+        # Indicators and statistics of stored series, kept across calls
+        self.indicators = indicators if indicators is not None else IndicatorEngine()
+        self._statistics_cache = LRUCache(max_size=256)
     
     def get_historical_data(
         self, 
@@ -27,160 +64,400 @@ class MarketDataService:
         """
         Fetch historical data - ALWAYS returns data (real or mock)
         """
+        ticker = ticker.upper()  # Fetchers and the store use upper case symbols
+        
         # If we've decided to use mock data, skip trying real data
         if self.use_mock_data:
             print(f"Using mock data mode for {ticker}")
             return self._generate_mock_data(ticker, years)
         
-        cache_key = f"{ticker}_{years}_{interval}"
+        start_date = datetime.now() - timedelta(days=years * 365)
+        
+        # Check the persistent store
+        stored = self._load_stored(ticker, interval, start_date)
+        if stored is not None:
+            print(f"Using stored data for {ticker}")
+            return stored
+        
+        key = (ticker, interval)
+        for _ in range(2):
+            series, lookback_start = self._inflight.do(
+                key, lambda: self._update_series(ticker, interval, start_date)
+            )
+            if series is None:
+                break
+            # A coalesced call may have fetched a shorter lookback; if so, go again
+            if pd.Timestamp(start_date).value >= lookback_start:
+                break
+        
+        if series is not None:
+            return series.iloc[series.index.searchsorted(pd.Timestamp(start_date)):]
+        
+        return self._fallback_data(ticker, years, interval, start_date)
+    
+    def get_historical_data_many(
+        self,
+        tickers: List[str],
+        years: int = 5,
+        interval: str = "1d"
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Fetch historical data for several tickers - ALWAYS returns data
         
-        # Check cache
-        if cache_key in self.cache:
-            cached_data, cached_time = self.cache[cache_key]
-            if datetime.now() - cached_time < timedelta(hours=1):
-                print(f"Using cached data for {ticker}")
-                return cached_data
+        Tickers missing from the store are fetched together: one bulk
+        download for expired series that only need their new bars, one for
+        the rest. Tickers another caller is already fetching are waited on
+        instead of downloaded again.
+        
+        Returns:
+            Dictionary of ticker (upper case) -> DataFrame
+        """
+        tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+        if self.use_mock_data:
+            return {ticker: self._generate_mock_data(ticker, years) for ticker in tickers}
+        
+        start_date = datetime.now() - timedelta(days=years * 365)
+        results = {}
+        flights = {}
+        led = []
+        
+        for ticker in tickers:
+            stored = self._load_stored(ticker, interval, start_date)
+            if stored is not None:
+                results[ticker] = stored
+                continue
+            
+            flight, leader = self._inflight.begin((ticker, interval))
+            flights[ticker] = flight
+            if leader:
+                led.append(ticker)
+        
+        if led:
+            print(f"Batch fetching {len(led)} tickers: {', '.join(led)}")
+            updated = {}
+            try:
+                updated = self._update_many(led, interval, start_date)
+            except Exception as e:
+                # Every ticker of the batch falls back to its stored or mock data
+                print(f"❌ Batch update failed: {str(e)}")
+            finally:
+                for ticker in led:
+                    self._inflight.finish((ticker, interval), result=updated.get(ticker, (None, None)))
+        
+        for ticker, flight in flights.items():
+            try:
+                series, lookback_start = flight.wait()
+            except Exception as e:
+                print(f"❌ Real data failed for {ticker}: {str(e)}")
+                series, lookback_start = None, None
+            
+            if series is not None and pd.Timestamp(start_date).value >= lookback_start:
+                results[ticker] = series.iloc[series.index.searchsorted(pd.Timestamp(start_date)):]
+            elif series is not None:
+                # Coalesced into another caller's shorter lookback
+                results[ticker] = self.get_historical_data(ticker, years, interval)
+            else:
+                results[ticker] = self._fallback_data(ticker, years, interval, start_date)
+        
+        return results
+    
+    def _update_series(self, ticker: str, interval: str, start_date: datetime) -> Tuple[Optional[pd.DataFrame], Optional[int]]:
+        """
+        Refresh or reload one stored series so it covers start_date
+        
+        Returns:
+            (whole series, lookback start in ns) - or (None, None) if no
+            real data could be fetched
+        """
+        
+        # Expired but long enough: download just the new bars
+        if self.incremental:
+            refreshed = self._refresh_tail(ticker, interval, start_date)
+            if refreshed is not None:
+                return refreshed
+        
+        start_date = self._reload_start(ticker, interval, start_date)
         
         # Try to get real data first
         try:
             print(f"Attempting to fetch real data for {ticker}...")
-            df = self._fetch_real_data(ticker, years, interval)
+            df = self._fetch_real_data(ticker, start_date, interval)
             
             if df is not None and not df.empty and len(df) >= 100:
                 print(f"✅ Successfully fetched {len(df)} real data points for {ticker}")
-                self.cache[cache_key] = (df, datetime.now())
-                return df
+                return self._store(ticker, interval, df, start_date)
             else:
                 print(f"⚠️ Real data insufficient for {ticker}")
                 raise Exception("Insufficient real data")
-                
+        
         except Exception as e:
             print(f"❌ Real data failed for {ticker}: {str(e)}")
-            print(f"🔄 Switching to mock data for {ticker}")
+        
+        return None, None
+    
+    def _update_many(
+        self,
+        tickers: List[str],
+        interval: str,
+        start_date: datetime
+    ) -> Dict[str, Tuple[Optional[pd.DataFrame], Optional[int]]]:
+        """_update_series for several tickers, with one bulk download per kind of update"""
+        
+        updated = {}
+        reload = list(tickers)
+        
+        if self.incremental:
+            # Expired series that reach back far enough only need their tails
+            tails = {}
+            for ticker in tickers:
+                stored = self.store.load(ticker, interval)
+                if stored is not None and self._covers(stored[1], start_date) and not stored[0].empty:
+                    tails[ticker] = stored
             
+            if tails:
+                overlap_start = min(self._overlap_start(df) for df, _ in tails.values())
+                try:
+                    frames = self.fetcher.fetch_many(list(tails), overlap_start, datetime.now(), interval)
+                except Exception as e:
+                    print(f"❌ Batch refresh failed: {str(e)}")
+                    frames = {}
+                
+                for ticker, (df, meta) in tails.items():
+                    try:
+                        refreshed = self._apply_tail(ticker, interval, df, meta, frames.get(ticker))
+                    except Exception as e:
+                        print(f"❌ Refresh failed for {ticker}: {str(e)}")
+                        refreshed = None
+                    if refreshed is not None:
+                        updated[ticker] = refreshed
+                        reload.remove(ticker)
+        
+        if reload:
+            reload_start = min(self._reload_start(ticker, interval, start_date) for ticker in reload)
+            try:
+                frames = self.fetcher.fetch_many(reload, reload_start, datetime.now(), interval)
+            except Exception as e:
+                print(f"❌ Batch fetch failed: {str(e)}")
+                frames = {}
+            
+            for ticker in reload:
+                try:
+                    df = self._prepare_bars(frames.get(ticker))
+                    if df is not None:
+                        print(f"✅ Successfully fetched {len(df)} real data points for {ticker}")
+                        updated[ticker] = self._store(ticker, interval, df, reload_start)
+                    else:
+                        print(f"⚠️ Real data insufficient for {ticker}")
+                except Exception as e:
+                    print(f"❌ Real data failed for {ticker}: {str(e)}")
+        
+        return updated
+    
+    def _fallback_data(self, ticker: str, years: int, interval: str, start_date: datetime) -> pd.DataFrame:
+        """Stale stored data if there is any, else mock data"""
+        
+        # Stale real data still beats mock data
+        stored = self._load_stored(ticker, interval, start_date, max_age=None)
+        if stored is not None:
+            print(f"Using stale stored data for {ticker}")
+            return stored
+        
         # If we get here, real data failed - use mock data
+        print(f"🔄 Switching to mock data for {ticker}")
         return self._generate_mock_data(ticker, years)
     
-    def _fetch_real_data(self, ticker: str, years: int, interval: str) -> Optional[pd.DataFrame]:
+    def _covers(self, meta: Dict, start_date: datetime) -> bool:
+        """Whether a stored series reaches back to start_date"""
+        # One series serves every lookback up to the longest one fetched
+        return pd.Timestamp(start_date).value >= meta.get("lookback_start", 0)
+    
+    def _reload_start(self, ticker: str, interval: str, start_date: datetime) -> datetime:
+        """Start of a full reload - never shrink the stored history"""
+        meta = self.store.read_meta(ticker, interval)
+        if meta and meta.get("lookback_start") is not None:
+            return min(start_date, pd.Timestamp(meta["lookback_start"]).to_pydatetime())
+        return start_date
+    
+    def _overlap_start(self, df: pd.DataFrame) -> datetime:
+        """First of the stored bars a refresh re-downloads"""
+        return df.index[max(len(df) - self.OVERLAP_BARS, 0)].to_pydatetime()
+    
+    def _load_stored(
+        self,
+        ticker: str,
+        interval: str,
+        start_date: datetime,
+        max_age: Optional[float] = MARKET_DATA_TTL_SECONDS
+    ) -> Optional[pd.DataFrame]:
         """
-        Try to fetch real data from Yahoo Finance
+        Stored history from start_date on, if it is fresh and reaches back far enough
+        
+        The slice is a view onto the memory-mapped store (no copy, read-only).
+        A max_age of None accepts data of any age.
         """
+        stored = self.store.load(ticker, interval)
+        if stored is None:
+            return None
+        
+        df, meta = stored
+        if max_age is not None and time.time() - meta.get("fetched_at", 0) >= max_age:
+            return None
+        if not self._covers(meta, start_date):
+            return None
+        
+        start = df.index.searchsorted(pd.Timestamp(start_date))
+        return df.iloc[start:]
+    
+    def _store(
+        self,
+        ticker: str,
+        interval: str,
+        df: pd.DataFrame,
+        start_date: datetime
+    ) -> Tuple[pd.DataFrame, int]:
+        """Persist a fetched series; returns it as read back from the store and its lookback start"""
+        lookback_start = pd.Timestamp(start_date).value
         try:
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=years * 365)
-            
-            # Try yfinance download (more reliable than .history())
-            df = yf.download(
-                ticker,
-                start=start_date,
-                end=end_date,
-                interval=interval,
-                progress=False,
-                auto_adjust=True,
-                timeout=10
-            )
-            
-            if df.empty:
-                return None
-            
-            # Ensure Close column exists
-            if 'Close' not in df.columns:
-                return None
-            
-            # Calculate returns
-            df['Returns'] = df['Close'].pct_change()
-            df['Log_Returns'] = np.log(df['Close'] / df['Close'].shift(1))
-            df = df.dropna()
-            
-            return df if len(df) >= 100 else None
-            
+            self.store.save(ticker, interval, df, fetched_at=time.time(), lookback_start=lookback_start)
+        except OSError as e:
+            print(f"⚠️ Could not persist {ticker} to the price store: {str(e)}")
+            return df, lookback_start
+        
+        stored = self.store.load(ticker, interval)
+        return (stored[0], lookback_start) if stored is not None else (df, lookback_start)
+    
+    def _refresh_tail(
+        self,
+        ticker: str,
+        interval: str,
+        start_date: datetime
+    ) -> Optional[Tuple[pd.DataFrame, int]]:
+        """
+        Bring an expired stored series up to date by appending the missing bars
+        
+        Returns:
+            (whole refreshed series, lookback start), or None if a full
+            reload is needed
+        """
+        stored = self.store.load(ticker, interval)
+        if stored is None:
+            return None
+        
+        df, meta = stored
+        if not self._covers(meta, start_date) or df.empty:
+            return None
+        
+        overlap_start = self._overlap_start(df)
+        try:
+            print(f"Refreshing {ticker} from {overlap_start.date()}...")
+            tail = self.fetcher.fetch(ticker, overlap_start, datetime.now(), interval)
         except Exception as e:
-            print(f"Fetch error: {str(e)}")
+            print(f"❌ Refresh failed for {ticker}: {str(e)}")
             return None
+        
+        return self._apply_tail(ticker, interval, df, meta, tail)
     
-    def _generate_mock_data(self, ticker: str, years: int) -> pd.DataFrame:
+    def _apply_tail(
+        self,
+        ticker: str,
+        interval: str,
+        df: pd.DataFrame,
+        meta: Dict,
+        tail: Optional[pd.DataFrame]
+    ) -> Optional[Tuple[pd.DataFrame, int]]:
         """
-        Generate realistic mock data - ALWAYS succeeds!
+        Append the bars of a freshly downloaded tail that follow the stored series
+        
+        The tail has to re-cover the last stored bars. If their closes moved
+        (a split or dividend re-adjusted the history) the stored series is
+        stale throughout, so this gives up and the caller reloads
+        everything. Returns are computed for the new rows only.
+        
+        Returns:
+            (whole refreshed series, lookback start), or None if a full
+            reload is needed
         """
-        print(f"📊 Generating realistic mock data for {ticker} ({years} years)")
-        
-        # Generate trading days (excluding weekends)
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=years * 365)
-        
-        # Create date range (daily)
-        all_dates = pd.date_range(start=start_date, end=end_date, freq='D')
-        
-        # Filter out weekends
-        trading_days = [d for d in all_dates if d.weekday() < 5]
-        dates = pd.DatetimeIndex(trading_days)
-        
-        num_points = len(dates)
-        
-        # Starting price based on ticker type
-        if ticker.upper() in ['BTC-USD', 'BTCUSD', 'BTC']:
-            initial_price = 30000.0
-            mu = 0.0005  # Higher growth for crypto
-            sigma = 0.03  # Higher volatility
-        elif ticker.upper() in ['AAPL', 'MSFT', 'GOOGL', 'TSLA', 'AMZN']:
-            initial_price = 150.0
-            mu = 0.0004  # Tech stocks
-            sigma = 0.02
-        elif ticker.upper() in ['SPY', 'QQQ', 'VOO', 'VTI']:
-            initial_price = 400.0
-            mu = 0.0003  # ETFs
-            sigma = 0.015
-        else:
-            initial_price = 100.0
-            mu = 0.0003
-            sigma = 0.018
-        
-        # Generate price path using geometric Brownian motion
-        returns = np.random.normal(mu, sigma, num_points)
-        
-        # Add some realistic trends and mean reversion
-        trend = np.linspace(0, mu * num_points, num_points)
-        returns = returns + trend / num_points
-        
-        # Calculate prices
-        log_returns = np.cumsum(returns)
-        prices = initial_price * np.exp(log_returns)
-        
-        # Add some realistic variation for OHLC
-        opens = prices * (1 + np.random.normal(0, 0.002, num_points))
-        highs = np.maximum(opens, prices) * (1 + np.abs(np.random.normal(0, 0.005, num_points)))
-        lows = np.minimum(opens, prices) * (1 - np.abs(np.random.normal(0, 0.005, num_points)))
-        
-        # Generate volume
-        base_volume = 50000000 if 'BTC' in ticker.upper() else 5000000
-        volumes = base_volume * (1 + np.random.normal(0, 0.3, num_points))
-        volumes = np.abs(volumes).astype(int)
-        
-        # Create DataFrame
-        df = pd.DataFrame({
-            'Open': opens,
-            'High': highs,
-            'Low': lows,
-            'Close': prices,
-            'Volume': volumes
-        }, index=dates)
+        if tail is None or tail.empty or 'Close' not in tail.columns:
+            return None
+        
+        overlap = tail.index.intersection(df.index)
+        if len(overlap) == 0:
+            print(f"⚠️ No overlap with stored {ticker} data, reloading")
+            return None
+        if not np.allclose(
+            tail.loc[overlap, 'Close'].to_numpy(dtype=np.float64),
+            df.loc[overlap, 'Close'].to_numpy(),
+            rtol=self.OVERLAP_RTOL
+        ):
+            print(f"⚠️ Stored {ticker} prices were re-adjusted upstream, reloading")
+            return None
+        
+        new_rows = tail.loc[tail.index > df.index[-1], ['Open', 'High', 'Low', 'Close', 'Volume']].dropna()
+        try:
+            if new_rows.empty:
+                self.store.update_meta(ticker, interval, fetched_at=time.time())
+            else:
+                closes = np.concatenate([[df['Close'].iloc[-1]], new_rows['Close'].to_numpy(dtype=np.float64)])
+                new_rows = new_rows.assign(
+                    Returns=closes[1:] / closes[:-1] - 1,
+                    Log_Returns=np.log(closes[1:] / closes[:-1])
+                )
+                self.store.append(ticker, interval, new_rows, fetched_at=time.time())
+        except OSError as e:
+            print(f"⚠️ Could not persist {ticker} to the price store: {str(e)}")
+            return None
+        
+        print(f"✅ Appended {len(new_rows)} new data points for {ticker}")
+        stored = self.store.load(ticker, interval)
+        return (stored[0], meta["lookback_start"]) if stored is not None else None
+    
+    def _fetch_real_data(self, ticker: str, start_date: datetime, interval: str) -> Optional[pd.DataFrame]:
+        """
+        Try to fetch real data from start_date until now
+        """
+        try:
+            df = self.fetcher.fetch(ticker, start_date, datetime.now(), interval)
+            return self._prepare_bars(df)
+        
+        except Exception as e:
+            print(f"Fetch error: {str(e)}")
+            return None
+    
+    def _prepare_bars(self, df: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+        """Add Returns / Log_Returns to raw bars; None if they are unusable"""
+        if df is None or df.empty:
+            return None
+        
+        # Ensure Close column exists
+        if 'Close' not in df.columns:
+            return None
         
         # Calculate returns
+        df = df.copy()
         df['Returns'] = df['Close'].pct_change()
         df['Log_Returns'] = np.log(df['Close'] / df['Close'].shift(1))
-        
-        # Remove any NaN
         df = df.dropna()
         
-        print(f"✅ Generated {len(df)} mock data points for {ticker}")
-        print(f"   Price range: ${df['Close'].min():.2f} - ${df['Close'].max():.2f}")
-        print(f"   Annualized return: {(df['Returns'].mean() * 252 * 100):.2f}%")
-        print(f"   Annualized volatility: {(df['Returns'].std() * np.sqrt(252) * 100):.2f}%")
+        return df if len(df) >= 100 else None
+    
+    def _generate_mock_data(self, ticker: str, years: int) -> pd.DataFrame:
+        """
+        Generate realistic mock data - ALWAYS succeeds!
         
+        Deterministic per ticker and day, and memoized by the generator.
+        """
+        df = self.synthetic.generate(ticker, years=years)
+        print(f"📊 Using {len(df)} mock data points for {ticker} ({years} years)")
         return df
     
     def calculate_statistics(self, df: pd.DataFrame) -> dict:
-        """Calculate key statistics from data"""
+        """Calculate key statistics from data (cached for slices of stored series)"""
+        key = self._slice_key(df)
+        if key is not None:
+            cached = self._statistics_cache.get(key)
+            if cached is not None:
+                return dict(cached)
+        
         try:
             returns = df['Returns'].dropna()
             
@@ -188,31 +465,81 @@ class MarketDataService:
             annual_volatility = returns.std() * np.sqrt(252)
             sharpe_ratio = annual_return / annual_volatility if annual_volatility > 0 else 0
             
-            cumulative = (1 + returns).cumprod()
-            running_max = cumulative.expanding().max()
-            drawdown = (cumulative - running_max) / running_max
-            max_drawdown = drawdown.min()
+            # Drawdown of the compounded returns = drawdown of the closes
+            close = df['Close'].to_numpy(dtype=np.float64)
             
-            return {
+            statistics = {
                 "mean_daily_return": float(returns.mean()),
                 "std_daily_return": float(returns.std()),
                 "annual_return": float(annual_return),
                 "annual_volatility": float(annual_volatility),
                 "sharpe_ratio": float(sharpe_ratio),
-                "max_drawdown": float(max_drawdown),
+                "max_drawdown": max_drawdown(close),
                 "total_return": float((df['Close'].iloc[-1] / df['Close'].iloc[0]) - 1),
                 "current_price": float(df['Close'].iloc[-1]),
                 "data_points": len(df)
             }
+            if key is not None:
+                self._statistics_cache.set(key, statistics)
+            return statistics
         except Exception as e:
             print(f"Error calculating statistics: {str(e)}")
             return {}
     
     def get_moving_averages(self, df: pd.DataFrame, windows: list = [20, 50, 200]) -> pd.DataFrame:
-        """Calculate moving averages"""
-        for window in windows:
-            df[f'MA_{window}'] = df['Close'].rolling(window=window).mean()
-        return df
+        """
+        Calculate moving averages
+        
+        Returns a new frame with MA_<window> columns; df is not modified.
+        For data from the price store the averages are taken over the
+        whole stored history, so they are defined from the first row.
+        """
+        names = [f'MA_{window}' for window in windows]
+        indicators = self._series_indicators(df) if set(names) <= set(self.indicators.column_names()) else {}
+        close = df['Close'].to_numpy(dtype=np.float64)
+        
+        return df.assign(**{
+            name: indicators[name] if name in indicators else rolling_mean(close, window)
+            for name, window in zip(names, windows)
+        })
+    
+    def get_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Every indicator of the IndicatorEngine (moving averages, EMA, RSI,
+        Bollinger bands, MACD, rolling volatility, drawdown) for the rows of df
+        
+        Data from the price store is computed over the whole stored series
+        and cached; after an incremental refresh only the appended bars
+        are computed.
+        """
+        return pd.DataFrame(self._series_indicators(df), index=df.index)
+    
+    def _series_indicators(self, df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """Indicator columns aligned with df, from the cached stored series when possible"""
+        
+        ticker, interval = df.attrs.get('ticker'), df.attrs.get('interval')
+        stored = self.store.load(ticker, interval) if ticker and len(df) else None
+        if stored is not None:
+            series = stored[0]
+            start = series.index.searchsorted(df.index[0])
+            end = start + len(df)
+            # df must be a contiguous run of the stored series
+            if end <= len(series) and series.index[start] == df.index[0] and series.index[end - 1] == df.index[-1]:
+                columns = self.indicators.compute(
+                    series.index, series['Close'].to_numpy(), key=(ticker, interval)
+                )
+                return {name: values[start:end] for name, values in columns.items()}
+        
+        return self.indicators.compute(df.index, df['Close'].to_numpy())
+    
+    def _slice_key(self, df: pd.DataFrame) -> Optional[tuple]:
+        """Cache key of a slice of a stored series, or None for other frames"""
+        if not df.attrs.get('ticker') or df.empty:
+            return None
+        return (
+            df.attrs['ticker'], df.attrs['interval'], df.attrs['generation'],
+            df.index[0].value, df.index[-1].value, len(df)
+        )
     
     def validate_ticker(self, ticker: str) -> bool:
         """Validate ticker - always returns True since we have fallback"""
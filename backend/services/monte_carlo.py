@@ -3,16 +3,307 @@ Monte Carlo Simulation Engine
 Runs thousands of simulations based on historical data statistics
 """
 
+import threading
 import numpy as np
 import pandas as pd
-from typing import List, Dict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterator, Optional, Tuple
+
+from services.backtest import STRATEGIES, Features, run_targets
+from services.cache import LRUCache, MARKET_DATA_TTL_SECONDS
+from services.path_encoding import lttb_indices
+from services.return_models import GBMModel, ReturnModel, build_return_model
+from services.sampling import ShockSampler
+
+
+SAMPLE_STRIDE = 21  # Trading days between plotted points (monthly)
+
+# Historical closes placed before every path so strategy indicators (up to
+# a 250-day MA) are warmed up on day 0, and paths per strategy evaluation
+STRATEGY_WARMUP_DAYS = 260
+STRATEGY_BLOCK_PATHS = 64
+
+
+class SimulationCancelled(Exception):
+    """The run's cancel_event was set before it finished"""
+
+
+class PathAccumulator:
+    """
+    Running, mergeable summary of simulated paths
+    
+    Folds chunks of paths into everything run_simulation reports, so the
+    full (days, num_simulations) matrix never has to exist: final values
+    (kept exactly, 8 bytes per path, for exact quantiles), per-path metrics
+    such as max drawdown, and a reservoir of display paths (every
+    `sample_stride`-th day). The reservoir gives every path a uniform random
+    key and keeps the smallest `num_samples` keys, which makes it order
+    independent and lets two accumulators merge.
+    """
+    
+    def __init__(
+        self,
+        num_samples: int = 10,
+        sample_stride: int = 1,
+        rng: Optional[np.random.Generator] = None
+    ):
+        self.num_samples = num_samples
+        self.sample_stride = sample_stride
+        self.rng = rng if rng is not None else np.random.default_rng()
+        
+        self.count = 0
+        self._final_values = []
+        self._path_metrics = {}
+        self._sample_keys = np.empty(0)
+        self._sample_values = None  # (points, kept samples)
+    
+    def update(self, paths: np.ndarray, path_metrics: Dict[str, np.ndarray]):
+        """
+        Fold a (days, n) chunk of paths into the running summary
+        
+        Args:
+            paths: Chunk of simulated paths; not referenced after the call
+            path_metrics: Per-path metric arrays of the chunk, by name
+        """
+        
+        num_paths = paths.shape[1]
+        if num_paths == 0:
+            return
+        
+        self._final_values.append(np.array(paths[-1], dtype=np.float64))
+        for name, values in path_metrics.items():
+            # Copy: metrics may be views into a chunk buffer that gets reused
+            self._path_metrics.setdefault(name, []).append(np.array(values, dtype=np.float64))
+        
+        # Pre-select this chunk's reservoir candidates before copying rows
+        keys = self.rng.random(num_paths)
+        if num_paths > self.num_samples:
+            candidates = np.argpartition(keys, self.num_samples - 1)[:self.num_samples]
+        else:
+            candidates = np.arange(num_paths)
+        
+        sampled = np.array(paths[::self.sample_stride][:, candidates], dtype=np.float64)
+        self._offer_samples(keys[candidates], sampled)
+        
+        self.count += num_paths
+    
+    def merge(self, other: "PathAccumulator"):
+        """Fold another accumulator (e.g. from a different shard) into this one"""
+        
+        self._final_values.extend(other._final_values)
+        for name, chunks in other._path_metrics.items():
+            self._path_metrics.setdefault(name, []).extend(chunks)
+        if other._sample_values is not None:
+            self._offer_samples(other._sample_keys, other._sample_values)
+        self.count += other.count
+    
+    def final_values(self) -> np.ndarray:
+        """Final value of every path folded in so far"""
+        self._final_values = [np.concatenate(self._final_values)] if self._final_values else []
+        return self._final_values[0] if self._final_values else np.empty(0)
+    
+    def path_metrics(self) -> Dict[str, np.ndarray]:
+        """Every per-path metric folded in so far, by name"""
+        self._path_metrics = {
+            name: [np.concatenate(chunks)] for name, chunks in self._path_metrics.items()
+        }
+        return {name: chunks[0] for name, chunks in self._path_metrics.items()}
+    
+    def sample_values(self) -> np.ndarray:
+        """Reservoir paths as a (points, num_samples) array, in key order"""
+        if self._sample_values is None:
+            return np.empty((0, 0))
+        return self._sample_values
+    
+    def _offer_samples(self, keys: np.ndarray, values: np.ndarray):
+        """Merge candidate samples into the reservoir, keeping the smallest keys"""
+        
+        if self._sample_values is None:
+            all_keys, all_values = keys, values
+        else:
+            all_keys = np.concatenate([self._sample_keys, keys])
+            all_values = np.concatenate([self._sample_values, values], axis=1)
+        
+        keep = np.argsort(all_keys, kind="stable")[:self.num_samples]
+        self._sample_keys = all_keys[keep]
+        self._sample_values = all_values[:, keep]
+
+
+class PercentileBands:
+    """
+    Running percentile bands of paths at fixed days, in bounded memory
+    
+    Each tracked day keeps a histogram of log(value / initial value) over
+    `num_buckets` equal-width buckets, so chunks of any size are folded in
+    with one bincount and the memory never grows with the number of paths.
+    Quantiles are read back from the cumulative counts with linear
+    interpolation inside the bucket; the relative error is about half a
+    bucket width (~0.5% with the defaults). Values outside the log range
+    are counted in the edge buckets.
+    """
+    
+    def __init__(
+        self,
+        days: np.ndarray,
+        initial_value: float,
+        percentiles: Tuple[float, ...] = (5, 25, 50, 75, 95),
+        num_buckets: int = 2048,
+        log_range: Tuple[float, float] = (-9.0, 9.0)
+    ):
+        """
+        Args:
+            days: Day indices (rows of a path chunk) to track
+            initial_value: Starting value of every path
+            percentiles: Percentiles to report, in 0..100
+            num_buckets: Histogram resolution per day
+            log_range: Bounds of log(value / initial_value) covered
+        """
+        self.days = np.asarray(days)
+        self.initial_value = initial_value
+        self.percentiles = tuple(percentiles)
+        self.num_buckets = num_buckets
+        self.low, high = log_range
+        self.width = (high - self.low) / num_buckets
+        
+        self.count = 0
+        self.counts = np.zeros((len(self.days), num_buckets), dtype=np.int64)
+    
+    def update(self, paths: np.ndarray):
+        """Fold a (days, n) chunk of paths into the histograms"""
+        
+        if paths.shape[1] == 0:
+            return
+        
+        buckets = np.log(paths[self.days] / self.initial_value)
+        buckets -= self.low
+        buckets /= self.width
+        np.clip(buckets, 0, self.num_buckets - 1, out=buckets)
+        
+        # One flat bincount: row r's buckets live at r * num_buckets + bucket
+        flat = buckets.astype(np.int64)
+        flat += (np.arange(len(self.days)) * self.num_buckets)[:, None]
+        self.counts += np.bincount(flat.ravel(), minlength=self.counts.size).reshape(self.counts.shape)
+        self.count += paths.shape[1]
+    
+    def bands(self) -> Dict[str, np.ndarray]:
+        """Current value of every percentile at every tracked day"""
+        
+        cumulative = np.cumsum(self.counts, axis=1)
+        bands = {}
+        for q in self.percentiles:
+            rank = q / 100 * self.count
+            # First bucket whose cumulative count reaches the rank, per day
+            bucket = np.minimum(np.sum(cumulative < rank, axis=1), self.num_buckets - 1)
+            
+            rows = np.arange(len(self.days))
+            below = np.where(bucket > 0, cumulative[rows, np.maximum(bucket - 1, 0)], 0)
+            inside = np.maximum(self.counts[rows, bucket], 1)
+            fraction = np.clip((rank - below) / inside, 0, 1)
+            
+            log_value = self.low + (bucket + fraction) * self.width
+            bands[f"p{q:g}"] = self.initial_value * np.exp(log_value)
+        
+        return bands
+
+
+def _simulate_shard(config: Dict, seed_sequence: np.random.SeedSequence, kwargs: Dict) -> PathAccumulator:
+    """
+    Run one shard of a parallel simulation (module level so it pickles)
+    
+    Args:
+        config: Constructor arguments of the parent simulator
+        seed_sequence: Independent child seed for this shard
+        kwargs: Arguments for MonteCarloSimulator._simulate_streaming
+            (replicate_offset keeps each shard's replicate groups distinct)
+    
+    Returns:
+        PathAccumulator for the shard's paths
+    """
+    simulator = MonteCarloSimulator(**config)
+    rng = np.random.default_rng(seed_sequence)
+    return simulator._simulate_streaming(rng=rng, **kwargs)
 
 
 class MonteCarloSimulator:
     """Monte Carlo simulation engine for portfolio projections"""
     
-    def __init__(self):
-        self.results_cache = {}
+    ENGINES = ("vectorized", "loop")
+    PARALLEL_BACKENDS = ("thread", "process")
+    PATH_FORMATS = ("records", "columnar", "arrays")
+    SE_REPLICATES = 16  # Independent path groups per shard for standard errors
+    STREAM_CHUNK_SIZE = 10000  # Paths per progress event of iter_simulation
+    
+    def __init__(
+        self,
+        engine: str = "vectorized",
+        dtype: str = "float64",
+        chunk_size: Optional[int] = None,
+        num_workers: int = 1,
+        parallel_backend: str = "thread",
+        cache_size: int = 128,
+        cache_ttl: Optional[float] = MARKET_DATA_TTL_SECONDS,
+        scale_invariant: bool = True,
+        cost_bps: float = 0.0
+    ):
+        """
+        Args:
+            engine: Path engine - "vectorized" builds every path in one
+                cumulative sum of log increments, "loop" is the step-by-step
+                reference implementation
+            dtype: Precision of the path buffer ("float64" or "float32")
+            chunk_size: If set, stream the simulation in chunks of this many
+                paths instead of materializing every path at once, so peak
+                memory is bounded by days * chunk_size
+            num_workers: Number of shards to split num_simulations into and
+                run concurrently. Each shard draws from its own child of a
+                SeedSequence, so a given (seed, num_workers) is reproducible
+            parallel_backend: "thread" (NumPy releases the GIL while
+                generating and reducing paths) or "process"
+            cache_size: Maximum number of results kept in the LRU result
+                cache (0 disables it)
+            cache_ttl: Seconds a cached result stays valid; defaults to the
+                market data refresh interval the inputs are fitted from
+            scale_invariant: Simulate a unit of notional once and derive the
+                result for any initial_investment by rescaling, so results
+                are shared across starting capitals
+            cost_bps: Transaction cost of strategy trades, in basis points
+                of the traded value
+        """
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {self.ENGINES}")
+        
+        self.engine = engine
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float32, np.float64):
+            raise ValueError(f"Unsupported dtype '{dtype}', use float32 or float64")
+        
+        if chunk_size is not None and chunk_size < 1:
+            raise ValueError("chunk_size must be a positive number of paths")
+        self.chunk_size = chunk_size
+        
+        if num_workers < 1:
+            raise ValueError("num_workers must be at least 1")
+        if parallel_backend not in self.PARALLEL_BACKENDS:
+            raise ValueError(
+                f"Unknown parallel_backend '{parallel_backend}', expected one of {self.PARALLEL_BACKENDS}"
+            )
+        self.num_workers = num_workers
+        self.parallel_backend = parallel_backend
+        self._executor = None
+        
+        self.results_cache = LRUCache(max_size=cache_size, ttl=cache_ttl)
+        self.scale_invariant = scale_invariant
+        self.cost_bps = cost_bps
+    
+    def close(self):
+        """Shut down the worker pool used by parallel runs, if any"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+    
+    def cache_info(self) -> Dict:
+        """Size and hit/miss counters of the result cache"""
+        return self.results_cache.info()
     
     def run_simulation(
         self,
@@ -20,7 +311,15 @@ class MonteCarloSimulator:
         initial_investment: float = 10000,
         num_simulations: int = 1000,
         years: int = 5,
-        strategy: str = "buy_hold"
+        strategy: str = "buy_hold",
+        model: str = "gbm",
+        seed: Optional[int] = None,
+        risk_metrics: bool = False,
+        sampling: str = "standard",
+        control_variate: bool = False,
+        path_format: str = "records",
+        max_points: Optional[int] = None,
+        cancel_event: Optional[threading.Event] = None
     ) -> Dict:
         """
         Run Monte Carlo simulation based on historical data
@@ -30,12 +329,207 @@ class MonteCarloSimulator:
             initial_investment: Starting capital
             num_simulations: Number of simulation paths
             years: Projection period in years
-            strategy: Strategy type (buy_hold, dca, etc.)
+            strategy: Strategy template traded on every path (one of
+                services.backtest.STRATEGIES); the reported values are the
+                strategy's equity, not the asset's
+            model: Daily return model - "gbm" (fitted drift and volatility),
+                "bootstrap" (IID draws of historical returns),
+                "block_bootstrap" (stationary block bootstrap) or "garch"
+                (fitted GARCH(1, 1)); see services.return_models
+            seed: Random seed - the same seed reproduces the same paths
+            risk_metrics: Also report time under water, Calmar ratio and
+                CVaR of the final values
+            sampling: Shock sampling - "standard", "antithetic", or
+                scrambled quasi-random "sobol" / "halton" (needs SciPy)
+            control_variate: Correct the mean with the asset's terminal
+                value, whose expectation is known in closed form (gbm and
+                bootstrap models only)
+            path_format: Shape of "sample_paths" - "records" (one dict per
+                point with path_0..path_N keys), "columnar" ({"days": [...],
+                "paths": [[...], ...]}) or "arrays" (same, as a day index
+                array and a (num_paths, points) matrix; see format_paths)
+            max_points: Downsample the sample paths to this many points with
+                LTTB instead of the fixed monthly stride
+            cancel_event: When set, a streaming or parallel run stops at the
+                next chunk boundary by raising SimulationCancelled
         
         Returns:
             Dictionary with simulation results and statistics
         """
         
+        if path_format not in self.PATH_FORMATS:
+            raise ValueError(f"Unknown path_format '{path_format}', expected one of {self.PATH_FORMATS}")
+        
+        mu, sigma, days = self._fit_parameters(historical_data, years)
+        warmup = self._strategy_warmup(historical_data, strategy)
+        return_model = build_return_model(model, historical_data, mu, sigma)
+        
+        # Paths scale linearly with the starting capital, so simulate one unit
+        # of notional and rescale - every initial_investment then shares it
+        notional = 1.0 if self.scale_invariant else initial_investment
+        
+        # Same fitted model + same request = same answer, no need to re-simulate
+        # (mu and sigma already fingerprint the history the warm-up comes from)
+        cache_key = (
+            mu, sigma, days, notional, num_simulations,
+            strategy, model, seed, risk_metrics, sampling, control_variate,
+            self.engine, self.dtype.name, self.chunk_size, self.num_workers, self.cost_bps
+        )
+        result = self.results_cache.get(cache_key)
+        if result is None:
+            result = self._simulate(
+                mu=mu,
+                sigma=sigma,
+                days=days,
+                initial_investment=notional,
+                num_simulations=num_simulations,
+                seed=seed,
+                strategy=strategy,
+                warmup=warmup,
+                model=return_model,
+                risk_metrics=risk_metrics,
+                sampling=sampling,
+                control_variate=control_variate,
+                cancel_event=cancel_event
+            )
+            self.results_cache.set(cache_key, result)
+        
+        return self._package_result(result, initial_investment, path_format, max_points)
+    
+    def iter_simulation(
+        self,
+        historical_data: pd.DataFrame,
+        initial_investment: float = 10000,
+        num_simulations: int = 1000,
+        years: int = 5,
+        strategy: str = "buy_hold",
+        model: str = "gbm",
+        seed: Optional[int] = None,
+        risk_metrics: bool = False,
+        sampling: str = "standard",
+        control_variate: bool = False,
+        path_format: str = "records",
+        max_points: Optional[int] = None,
+        chunk_size: Optional[int] = None
+    ) -> Iterator[Dict]:
+        """
+        Run a simulation chunk by chunk, yielding progress as it goes
+        
+        Yields a "progress" event after every chunk of paths and a final
+        "result" event holding exactly what run_simulation returns for the
+        same arguments with this chunk size (the result is cached the same
+        way, so a finished stream also serves later identical requests).
+        Paths are generated sequentially, whatever num_workers is.
+        Closing the generator early stops the simulation.
+        
+        Progress events carry:
+            paths_done / num_simulations: Paths folded in so far
+            probability_of_profit: Running estimate, in percent, and
+                probability_of_profit_se, its standard error
+            bands: {"days": [...], "p5": [...], ..., "p95": [...]} -
+                running percentile bands every SAMPLE_STRIDE days
+            band_change: Largest relative move of any band point since
+                the previous event, for clients stopping once it settles
+        
+        Args:
+            chunk_size: Paths per progress event (default: the simulator's
+                chunk_size, else STREAM_CHUNK_SIZE)
+            Others: As for run_simulation
+        
+        Yields:
+            Dictionaries with a "type" of "progress" or "result"
+        """
+        
+        if path_format not in self.PATH_FORMATS:
+            raise ValueError(f"Unknown path_format '{path_format}', expected one of {self.PATH_FORMATS}")
+        
+        chunk_size = chunk_size or self.chunk_size or self.STREAM_CHUNK_SIZE
+        mu, sigma, days = self._fit_parameters(historical_data, years)
+        warmup = self._strategy_warmup(historical_data, strategy)
+        return_model = build_return_model(model, historical_data, mu, sigma)
+        notional = 1.0 if self.scale_invariant else initial_investment
+        scale = initial_investment / notional
+        
+        cache_key = (
+            mu, sigma, days, notional, num_simulations,
+            strategy, model, seed, risk_metrics, sampling, control_variate,
+            self.engine, self.dtype.name, chunk_size, 1, self.cost_bps
+        )
+        result = self.results_cache.get(cache_key)
+        
+        if result is None:
+            rng = np.random.default_rng(seed)
+            control_mean = self._control_mean(return_model, notional, days) if control_variate else None
+            
+            band_days = np.arange(0, days, SAMPLE_STRIDE)
+            bands = PercentileBands(band_days, notional)
+            previous = None
+            profitable = 0
+            
+            chunks = self._stream_chunks(
+                initial_value=notional,
+                mu=mu,
+                sigma=sigma,
+                days=days,
+                num_sims=num_simulations,
+                rng=rng,
+                strategy=strategy,
+                warmup=warmup,
+                model=return_model,
+                risk_metrics=risk_metrics,
+                sampling=sampling,
+                control_variate=control_variate,
+                chunk_size=chunk_size
+            )
+            for accumulator, paths in chunks:
+                bands.update(paths)
+                profitable += int(np.count_nonzero(paths[-1] > notional))
+                
+                current = bands.bands()
+                change = None
+                if previous is not None:
+                    change = float(max(
+                        np.max(np.abs(current[key] / previous[key] - 1)) for key in current
+                    ))
+                previous = current
+                
+                done = accumulator.count
+                prob_profit = profitable / done
+                yield {
+                    "type": "progress",
+                    "paths_done": done,
+                    "num_simulations": num_simulations,
+                    "probability_of_profit": prob_profit * 100,
+                    "probability_of_profit_se": float(np.sqrt(prob_profit * (1 - prob_profit) / done)) * 100,
+                    "bands": dict(
+                        {key: np.round(values * scale, 2).tolist() for key, values in current.items()},
+                        days=band_days.tolist()
+                    ),
+                    "band_change": change
+                }
+            
+            statistics = self._summarize_final_values(
+                accumulator.final_values(),
+                accumulator.path_metrics(),
+                notional,
+                days,
+                control_mean=control_mean
+            )
+            result = self._build_result(
+                statistics, accumulator.sample_values(), num_simulations,
+                mu, sigma, days, notional, sampling, control_variate, seed,
+                chunk_size=chunk_size, num_workers=1, strategy=strategy, model=return_model
+            )
+            self.results_cache.set(cache_key, result)
+        
+        yield dict(
+            self._package_result(result, initial_investment, path_format, max_points),
+            type="result"
+        )
+    
+    def _fit_parameters(self, historical_data: pd.DataFrame, years: int) -> Tuple[float, float, int]:
+        """Daily drift and volatility of the history, and the horizon in trading days"""
+        
         # Calculate historical statistics
         returns = historical_data['Returns'].dropna()
         mu = returns.mean()  # Daily expected return
@@ -46,23 +540,138 @@ class MonteCarloSimulator:
         # Number of trading days
         days = int(years * 252)
         
-        # Run simulations
-        all_simulations = self._geometric_brownian_motion(
-            initial_value=initial_investment,
-            mu=mu,
-            sigma=sigma,
-            days=days,
-            num_sims=num_simulations
-        )
+        return float(mu), float(sigma), days
+    
+    def _strategy_warmup(self, historical_data: pd.DataFrame, strategy: str) -> Optional[np.ndarray]:
+        """
+        Closes before the simulation start, relative to the last close
         
-        # Calculate statistics
-        statistics = self._calculate_simulation_statistics(
-            all_simulations,
-            initial_investment
-        )
+        Prepended to every path (scaled to its start) so the strategy's
+        indicators have history on day 0; None for buy_hold.
+        """
+        
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy '{strategy}', expected one of {tuple(STRATEGIES)}")
+        if strategy == "buy_hold":
+            return None
+        
+        closes = historical_data['Close'].to_numpy(dtype=np.float64)
+        closes = closes[~np.isnan(closes)][-(STRATEGY_WARMUP_DAYS + 1):]
+        return closes[:-1] / closes[-1]
+    
+    def _simulate(
+        self,
+        mu: float,
+        sigma: float,
+        days: int,
+        initial_investment: float,
+        num_simulations: int,
+        seed: Optional[int],
+        risk_metrics: bool,
+        sampling: str,
+        control_variate: bool,
+        strategy: str = "buy_hold",
+        warmup: Optional[np.ndarray] = None,
+        model: Optional[ReturnModel] = None,
+        cancel_event: Optional[threading.Event] = None
+    ) -> Dict:
+        """
+        Simulate and summarize one uncached run_simulation result
+        
+        Returns:
+            Dictionary with simulation results and statistics; sample_paths
+            holds the daily (days, num_samples) array of display paths
+        """
+        
+        rng = np.random.default_rng(seed)
+        model = model or GBMModel(mu, sigma)
         
-        # Get sample paths for visualization
-        sample_paths = self._get_sample_paths(all_simulations, num_samples=10)
+        # E[S(T)] of the asset's terminal value, the control variate's known mean
+        control_mean = self._control_mean(model, initial_investment, days) if control_variate else None
+        
+        if self.num_workers > 1 or self.chunk_size is not None:
+            path_args = dict(
+                initial_value=initial_investment,
+                mu=float(mu),
+                sigma=float(sigma),
+                days=days,
+                num_sims=num_simulations,
+                strategy=strategy,
+                warmup=warmup,
+                model=model,
+                risk_metrics=risk_metrics,
+                sampling=sampling,
+                control_variate=control_variate
+            )
+            if self.num_workers > 1:
+                # Shard across the worker pool and merge the summaries
+                accumulator = self._simulate_parallel(seed, cancel_event=cancel_event, **path_args)
+            else:
+                # Stream chunks of paths through a running accumulator
+                accumulator = self._simulate_streaming(rng=rng, cancel_event=cancel_event, **path_args)
+            
+            statistics = self._summarize_final_values(
+                accumulator.final_values(),
+                accumulator.path_metrics(),
+                initial_investment,
+                days,
+                control_mean=control_mean
+            )
+            sample_paths = accumulator.sample_values()
+        else:
+            sampler = ShockSampler(sampling, days - 1, num_simulations, rng, self.SE_REPLICATES)
+            
+            # Run simulations
+            all_simulations = self._simulate_paths(
+                initial_value=initial_investment,
+                mu=mu,
+                sigma=sigma,
+                days=days,
+                num_sims=num_simulations,
+                sampler=sampler,
+                model=model
+            )
+            
+            # Sampling inputs come from the asset paths, before the strategy replaces them
+            extra_metrics = self._sampling_metrics(all_simulations, sampler, 0, control_variate)
+            all_simulations = self._apply_strategy(all_simulations, strategy, warmup)
+            
+            # Calculate statistics
+            statistics = self._calculate_simulation_statistics(
+                all_simulations,
+                initial_investment,
+                risk_metrics=risk_metrics,
+                extra_metrics=extra_metrics,
+                control_mean=control_mean
+            )
+            
+            # Get sample paths for visualization
+            sample_paths = self._get_sample_paths(all_simulations, num_samples=10, rng=rng)
+        
+        return self._build_result(
+            statistics, sample_paths, num_simulations,
+            mu, sigma, days, initial_investment, sampling, control_variate, seed,
+            chunk_size=self.chunk_size, num_workers=self.num_workers, strategy=strategy, model=model
+        )
+    
+    def _build_result(
+        self,
+        statistics: Dict,
+        sample_paths: np.ndarray,
+        num_simulations: int,
+        mu: float,
+        sigma: float,
+        days: int,
+        initial_investment: float,
+        sampling: str,
+        control_variate: bool,
+        seed: Optional[int],
+        chunk_size: Optional[int],
+        num_workers: int,
+        strategy: str = "buy_hold",
+        model: Optional[ReturnModel] = None
+    ) -> Dict:
+        """Assemble the (cacheable) result dictionary of one simulation"""
         
         return {
             "statistics": statistics,
@@ -72,17 +681,398 @@ class MonteCarloSimulator:
                 "mu": float(mu),
                 "sigma": float(sigma),
                 "days": days,
-                "initial_investment": initial_investment
+                "initial_investment": initial_investment,
+                "engine": self.engine,
+                "dtype": self.dtype.name,
+                "chunk_size": chunk_size,
+                "num_workers": num_workers,
+                "sampling": sampling,
+                "control_variate": control_variate,
+                "seed": seed,
+                "strategy": strategy,
+                "cost_bps": self.cost_bps,
+                "model": model.name if model is not None else "gbm",
+                "model_parameters": model.describe() if model is not None else {}
             }
         }
     
+    def _package_result(
+        self,
+        result: Dict,
+        initial_investment: float,
+        path_format: str,
+        max_points: Optional[int]
+    ) -> Dict:
+        """
+        Build the returned result from a cached one
+        
+        Formats the sample paths and, if the cached result was simulated
+        with a different starting capital, rescales it: every path is
+        proportional to its starting value, so dollar amounts (values,
+        percentiles, VaR, sample paths, their standard errors) scale by the
+        ratio, while ROI, probability of profit, Sharpe and drawdowns are
+        unchanged. The cached result is not modified.
+        
+        Args:
+            result: Result from _simulate
+            initial_investment: Starting capital to express it in
+            path_format: One of PATH_FORMATS
+            max_points: Optional LTTB point budget for the sample paths
+        
+        Returns:
+            New result dictionary
+        """
+        
+        scale = initial_investment / result["parameters"]["initial_investment"]
+        statistics = result["statistics"]
+        if scale != 1:
+            statistics = self._rescale_statistics(statistics, scale, initial_investment)
+        
+        return dict(
+            result,
+            statistics=statistics,
+            sample_paths=self._format_sample_paths(
+                result["sample_paths"], path_format, max_points, scale
+            ),
+            parameters=dict(result["parameters"], initial_investment=initial_investment)
+        )
+    
+    def _rescale_statistics(self, statistics: Dict, scale: float, initial_investment: float) -> Dict:
+        """Copy of statistics with every dollar amount multiplied by scale"""
+        
+        statistics = dict(statistics)
+        
+        for key in ("mean", "median", "std", "min", "max"):
+            statistics[key] *= scale
+        statistics["percentiles"] = {
+            key: value * scale for key, value in statistics["percentiles"].items()
+        }
+        statistics["initial_investment"] = initial_investment
+        
+        if "risk_metrics" in statistics:
+            risk = dict(statistics["risk_metrics"])
+            risk["var_5"] *= scale
+            risk["cvar_5"] *= scale
+            statistics["risk_metrics"] = risk
+        
+        if "control_variate" in statistics:
+            control = dict(statistics["control_variate"])
+            control["raw_mean"] *= scale
+            control["control_mean"] *= scale
+            statistics["control_variate"] = control
+        
+        if statistics.get("standard_errors"):
+            errors = dict(statistics["standard_errors"])
+            errors["mean"] *= scale
+            errors["median"] *= scale
+            statistics["standard_errors"] = errors
+        
+        return statistics
+    
+    def _simulate_paths(
+        self,
+        initial_value: float,
+        mu: float,
+        sigma: float,
+        days: int,
+        num_sims: int,
+        sampler: ShockSampler,
+        out: Optional[np.ndarray] = None,
+        model: Optional[ReturnModel] = None
+    ) -> np.ndarray:
+        """Dispatch to the configured path engine (GBM) or the return model"""
+        
+        if model is not None and model.name != "gbm":
+            return self._model_paths(initial_value, days, num_sims, model, sampler, out=out)
+        if self.engine == "vectorized":
+            return self._geometric_brownian_motion_vectorized(
+                initial_value, mu, sigma, days, num_sims, sampler=sampler, out=out
+            )
+        return self._geometric_brownian_motion(
+            initial_value, mu, sigma, days, num_sims, sampler=sampler
+        )
+    
+    def _model_paths(
+        self,
+        initial_value: float,
+        days: int,
+        num_sims: int,
+        model: ReturnModel,
+        sampler: ShockSampler,
+        out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Price paths from a return model's daily log returns
+        
+        Same in-place pipeline as _geometric_brownian_motion_vectorized:
+        the model fills the log returns into rows 1.., which are summed
+        down the time axis and exponentiated.
+        """
+        
+        if out is None:
+            out = np.empty((days, num_sims), dtype=self.dtype)
+        
+        model.fill(out[1:], sampler)
+        np.cumsum(out[1:], axis=0, out=out[1:])
+        out[0] = 0.0
+        
+        np.exp(out, out=out)
+        out *= initial_value
+        return out
+    
+    def _control_mean(self, model: ReturnModel, initial_value: float, days: int) -> float:
+        """Known E[S(T)] of the asset paths, for the control variate"""
+        growth = model.expected_growth(days - 1)
+        if growth is None:
+            raise ValueError(f"control_variate needs a known expected terminal value, which model='{model.name}' lacks")
+        return initial_value * growth
+    
+    def _apply_strategy(
+        self,
+        paths: np.ndarray,
+        strategy: str,
+        warmup: Optional[np.ndarray]
+    ) -> np.ndarray:
+        """
+        Replace asset price paths with the equity of a strategy trading them
+        
+        The strategy's signal function runs on (warm-up + days, block)
+        slices of the price matrix - every path of a block at once - and
+        run_targets turns its target weights into equity curves starting
+        from the same initial value. Paths are overwritten in place.
+        
+        Args:
+            paths: (days, num_sims) asset prices, all starting at the same value
+            strategy: Template name (buy_hold without costs is the identity)
+            warmup: Closes before day 0 relative to the day-0 price, from
+                _strategy_warmup
+        
+        Returns:
+            The paths array, now holding strategy equity
+        """
+        
+        if strategy == "buy_hold" and self.cost_bps == 0:
+            return paths
+        
+        signal = STRATEGIES[strategy]
+        warmup = warmup if warmup is not None else np.empty(0)
+        initial_value = float(paths[0, 0])
+        cost = self.cost_bps / 10000
+        
+        for first in range(0, paths.shape[1], STRATEGY_BLOCK_PATHS):
+            block = np.asarray(paths[:, first:first + STRATEGY_BLOCK_PATHS], dtype=np.float64)
+            history = np.outer(warmup, block[0])
+            data = Features(np.vstack([history, block]), start=len(history))
+            
+            targets = signal(data)[len(history):]
+            paths[:, first:first + STRATEGY_BLOCK_PATHS] = run_targets(block, targets, cost, initial_value)["equity"]
+        
+        return paths
+    
+    def _sampling_metrics(
+        self,
+        paths: np.ndarray,
+        sampler: ShockSampler,
+        start: int,
+        control_variate: bool,
+        replicate_offset: int = 0
+    ) -> Dict[str, np.ndarray]:
+        """
+        Per-path inputs for the standard errors and the control variate
+        
+        Args:
+            paths: Chunk of paths starting at path number `start`
+            sampler: Sampler that generated the chunk
+            start: Index of the chunk's first path within the sampler
+            control_variate: Also record the GBM terminal value
+            replicate_offset: Added to the replicate ids (distinct per shard)
+        
+        Returns:
+            Dictionary with "replicate" and optionally "control" arrays
+        """
+        
+        metrics = {"replicate": sampler.replicate_ids(start, paths.shape[1]) + replicate_offset}
+        if control_variate:
+            metrics["control"] = np.array(paths[-1], dtype=np.float64)  # Paths may be overwritten by a strategy
+        return metrics
+    
+    def _simulate_streaming(
+        self,
+        initial_value: float,
+        mu: float,
+        sigma: float,
+        days: int,
+        num_sims: int,
+        rng: np.random.Generator,
+        num_samples: int = 10,
+        strategy: str = "buy_hold",
+        warmup: Optional[np.ndarray] = None,
+        model: Optional[ReturnModel] = None,
+        risk_metrics: bool = False,
+        sampling: str = "standard",
+        control_variate: bool = False,
+        replicate_offset: int = 0,
+        cancel_event: Optional[threading.Event] = None
+    ) -> PathAccumulator:
+        """
+        Simulate num_sims paths in chunks of self.chunk_size
+        
+        Without a chunk_size all paths form a single chunk.
+        
+        Returns:
+            PathAccumulator holding the summary of all paths
+        """
+        
+        if cancel_event is not None and cancel_event.is_set():
+            raise SimulationCancelled()
+        
+        accumulator = PathAccumulator(num_samples=num_samples, rng=rng)
+        chunks = self._stream_chunks(
+            initial_value, mu, sigma, days, num_sims, rng,
+            num_samples=num_samples,
+            strategy=strategy,
+            warmup=warmup,
+            model=model,
+            risk_metrics=risk_metrics,
+            sampling=sampling,
+            control_variate=control_variate,
+            replicate_offset=replicate_offset,
+            chunk_size=self.chunk_size
+        )
+        for accumulator, _ in chunks:
+            if cancel_event is not None and cancel_event.is_set():
+                raise SimulationCancelled()
+        
+        return accumulator
+    
+    def _stream_chunks(
+        self,
+        initial_value: float,
+        mu: float,
+        sigma: float,
+        days: int,
+        num_sims: int,
+        rng: np.random.Generator,
+        num_samples: int = 10,
+        strategy: str = "buy_hold",
+        warmup: Optional[np.ndarray] = None,
+        model: Optional[ReturnModel] = None,
+        risk_metrics: bool = False,
+        sampling: str = "standard",
+        control_variate: bool = False,
+        replicate_offset: int = 0,
+        chunk_size: Optional[int] = None
+    ) -> Iterator[Tuple[PathAccumulator, np.ndarray]]:
+        """
+        Generate num_sims paths chunk by chunk
+        
+        One (days, chunk_size) buffer is allocated up front and every chunk
+        is generated into it, turned into the strategy's equity and folded
+        into the accumulator. After each chunk this yields (accumulator,
+        paths); the paths are a view onto the buffer and are overwritten by
+        the next chunk.
+        
+        Yields:
+            The running PathAccumulator and the chunk's (days, width) paths
+        """
+        
+        chunk_size = min(chunk_size or num_sims, num_sims)
+        buffer = np.empty(days * chunk_size, dtype=self.dtype)
+        accumulator = PathAccumulator(num_samples=num_samples, rng=rng)
+        sampler = ShockSampler(sampling, days - 1, num_sims, rng, self.SE_REPLICATES)
+        
+        for start in range(0, num_sims, chunk_size):
+            width = min(chunk_size, num_sims - start)
+            # Contiguous (days, width) view onto the front of the buffer
+            out = buffer[:days * width].reshape(days, width)
+            
+            paths = self._simulate_paths(initial_value, mu, sigma, days, width, sampler, out=out, model=model)
+            sampling_metrics = self._sampling_metrics(
+                paths, sampler, start, control_variate, replicate_offset
+            )
+            paths = self._apply_strategy(paths, strategy, warmup)
+            
+            metrics = self._path_metrics(paths, risk_metrics)
+            metrics.update(sampling_metrics)
+            accumulator.update(paths, metrics)
+            
+            yield accumulator, paths
+    
+    def _simulate_parallel(
+        self,
+        seed: Optional[int],
+        num_sims: int,
+        cancel_event: Optional[threading.Event] = None,
+        **kwargs
+    ) -> PathAccumulator:
+        """
+        Split num_sims into num_workers shards and run them on the pool
+        
+        Shard i simulates with a generator seeded from the i-th child of
+        SeedSequence(seed), and the shard summaries are merged in shard
+        order, so the result only depends on (seed, num_workers).
+        
+        Args:
+            seed: Root seed (fresh OS entropy if None)
+            num_sims: Total number of paths
+            cancel_event: Stops the run between chunks (thread backend) or
+                between shards (process backend) when set
+            **kwargs: Remaining _simulate_streaming arguments
+        
+        Returns:
+            PathAccumulator holding the summary of all shards
+        """
+        
+        num_shards = min(self.num_workers, num_sims)
+        base, extra = divmod(num_sims, num_shards)
+        shard_sizes = [base + (1 if i < extra else 0) for i in range(num_shards)]
+        children = np.random.SeedSequence(seed).spawn(num_shards)
+        
+        config = dict(engine=self.engine, dtype=self.dtype.name, chunk_size=self.chunk_size, cost_bps=self.cost_bps)
+        if self.parallel_backend == "thread":
+            kwargs["cancel_event"] = cancel_event  # Events don't cross process boundaries
+        executor = self._get_executor()
+        futures = [
+            executor.submit(
+                _simulate_shard, config, child,
+                dict(kwargs, num_sims=size, replicate_offset=i * self.SE_REPLICATES)
+            )
+            for i, (child, size) in enumerate(zip(children, shard_sizes))
+        ]
+        
+        accumulator = None
+        for future in futures:
+            if cancel_event is not None and cancel_event.is_set():
+                for pending in futures:
+                    pending.cancel()
+                raise SimulationCancelled()
+            
+            shard = future.result()
+            if accumulator is None:
+                accumulator = shard
+            else:
+                accumulator.merge(shard)
+        
+        return accumulator
+    
+    def _get_executor(self) -> Executor:
+        """Lazily start the worker pool for parallel runs"""
+        if self._executor is None:
+            if self.parallel_backend == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.num_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.num_workers)
+        return self._executor
+    
     def _geometric_brownian_motion(
         self,
         initial_value: float,
         mu: float,
         sigma: float,
         days: int,
-        num_sims: int
+        num_sims: int,
+        rng: Optional[np.random.Generator] = None,
+        sampler: Optional[ShockSampler] = None
     ) -> np.ndarray:
         """
         Simulate asset price paths using Geometric Brownian Motion
@@ -96,11 +1086,16 @@ class MonteCarloSimulator:
             sigma: Daily volatility
             days: Number of days to simulate
             num_sims: Number of simulation paths
+            rng: Random generator (a fresh unseeded one if omitted)
+            sampler: Shock sampler; standard normals from rng if omitted
         
         Returns:
             Array of shape (days, num_sims) with simulated paths
         """
         
+        if sampler is None:
+            sampler = ShockSampler("standard", days - 1, num_sims, rng)
+        
         dt = 1  # Daily time step
         
         # Pre-allocate results array
@@ -108,7 +1103,7 @@ class MonteCarloSimulator:
         simulations[0] = initial_value
         
         # Generate all random numbers at once (more efficient)
-        random_shocks = np.random.normal(0, 1, size=(days-1, num_sims))
+        random_shocks = sampler.fill(np.empty((days-1, num_sims)))
         
         # Calculate drift and diffusion components
         drift = (mu - 0.5 * sigma**2) * dt
@@ -122,10 +1117,77 @@ class MonteCarloSimulator:
         
         return simulations
     
+    def _geometric_brownian_motion_vectorized(
+        self,
+        initial_value: float,
+        mu: float,
+        sigma: float,
+        days: int,
+        num_sims: int,
+        rng: Optional[np.random.Generator] = None,
+        out: Optional[np.ndarray] = None,
+        sampler: Optional[ShockSampler] = None
+    ) -> np.ndarray:
+        """
+        Closed-form Geometric Brownian Motion without a time loop
+        
+        Formula: S(t) = S(0) * exp(sum_{k<=t} ((mu - 0.5*sigma^2)*dt + sigma*sqrt(dt)*Z_k))
+        
+        The shocks are drawn straight into the output buffer, turned into
+        log increments, cumulatively summed down the time axis and
+        exponentiated - all in place, so the only allocation is the
+        (days, num_sims) buffer itself. With a float64 buffer it consumes the
+        generator exactly like _geometric_brownian_motion, so both engines
+        give the same paths (to rounding) for the same seed.
+        
+        Args:
+            initial_value: Starting price/value
+            mu: Expected daily return (drift)
+            sigma: Daily volatility
+            days: Number of days to simulate
+            num_sims: Number of simulation paths
+            rng: Random generator (a fresh unseeded one if omitted)
+            out: Optional preallocated C-contiguous (days, num_sims) buffer;
+                its dtype overrides the simulator's dtype
+            sampler: Shock sampler; standard normals from rng if omitted
+        
+        Returns:
+            Array of shape (days, num_sims) with simulated paths
+        """
+        
+        if sampler is None:
+            sampler = ShockSampler("standard", days - 1, num_sims, rng)
+        
+        if out is None:
+            out = np.empty((days, num_sims), dtype=self.dtype)
+        elif out.shape != (days, num_sims) or not out.flags.c_contiguous:
+            raise ValueError(f"out must be a C-contiguous array of shape {(days, num_sims)}")
+        
+        dt = 1  # Daily time step
+        drift = float((mu - 0.5 * sigma**2) * dt)
+        diffusion = float(sigma * np.sqrt(dt))
+        
+        # Row 0 stays at log-value 0, rows 1.. hold the log increments
+        increments = out[1:]
+        sampler.fill(increments)
+        increments *= diffusion
+        increments += drift
+        
+        np.cumsum(increments, axis=0, out=increments)
+        out[0] = 0.0
+        
+        np.exp(out, out=out)
+        out *= initial_value
+        
+        return out
+    
     def _calculate_simulation_statistics(
         self,
         simulations: np.ndarray,
-        initial_investment: float
+        initial_investment: float,
+        risk_metrics: bool = False,
+        extra_metrics: Optional[Dict[str, np.ndarray]] = None,
+        control_mean: Optional[float] = None
     ) -> Dict:
         """
         Calculate statistics from simulation results
@@ -133,6 +1195,10 @@ class MonteCarloSimulator:
         Args:
             simulations: Array of simulation paths
             initial_investment: Starting value
+            risk_metrics: Also compute the extra per-path risk metrics
+            extra_metrics: Additional per-path arrays (replicate ids,
+                control values) for _summarize_final_values
+            control_mean: Known mean of the "control" metric, if any
         
         Returns:
             Dictionary of statistics
@@ -141,6 +1207,72 @@ class MonteCarloSimulator:
         # Final values from all simulations
         final_values = simulations[-1, :]
         
+        path_metrics = self._path_metrics(simulations, risk_metrics)
+        path_metrics.update(extra_metrics or {})
+        
+        return self._summarize_final_values(
+            final_values,
+            path_metrics,
+            initial_investment,
+            simulations.shape[0],
+            control_mean=control_mean
+        )
+    
+    def _path_metrics(self, simulations: np.ndarray, risk_metrics: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Per-path drawdown metrics, computed for all paths at once
+        
+        The running peak is accumulated down the time axis for the whole
+        (days, num_sims) block, then reused in place as the drawdown array,
+        so one extra buffer serves every metric.
+        
+        Args:
+            simulations: Array of shape (days, num_sims)
+            risk_metrics: Also compute time under water
+        
+        Returns:
+            Dictionary of num_sims-long arrays: "max_drawdown" (negative
+            fraction) and, with risk_metrics, "time_under_water" (fraction
+            of days spent below the running peak)
+        """
+        
+        drawdown = np.maximum.accumulate(simulations, axis=0)
+        np.divide(simulations, drawdown, out=drawdown)
+        drawdown -= 1.0
+        
+        metrics = {"max_drawdown": drawdown.min(axis=0)}
+        
+        if risk_metrics:
+            metrics["time_under_water"] = (
+                np.count_nonzero(drawdown < 0, axis=0) / simulations.shape[0]
+            )
+        
+        return metrics
+    
+    def _summarize_final_values(
+        self,
+        final_values: np.ndarray,
+        path_metrics: Dict[str, np.ndarray],
+        initial_investment: float,
+        days: int,
+        control_mean: Optional[float] = None
+    ) -> Dict:
+        """
+        Statistics from per-path final values and drawdown metrics
+        
+        Args:
+            final_values: Final value of every path
+            path_metrics: Per-path metrics from _path_metrics, plus
+                "replicate" ids and "control" values when available
+            initial_investment: Starting value
+            days: Length of the simulated paths in trading days
+            control_mean: Known expectation of path_metrics["control"]; if
+                given, the mean is reported with the control variate applied
+        
+        Returns:
+            Dictionary of statistics
+        """
+        
         # Calculate percentiles
         percentiles = {
             "p5": float(np.percentile(final_values, 5)),
@@ -165,21 +1297,17 @@ class MonteCarloSimulator:
         prob_profit = float(np.sum(final_values > initial_investment) / len(final_values) * 100)
         
         # Risk metrics
-        # Sharpe ratio approximation (annualized)
+        # Sharpe ratio approximation (annualized); undefined (None) when
+        # every path ends at the same value
         returns = (final_values - initial_investment) / initial_investment
-        sharpe = float(np.mean(returns) / np.std(returns) * np.sqrt(252))
+        returns_std = float(np.std(returns))
+        sharpe = float(np.mean(returns) / returns_std * np.sqrt(252)) if returns_std > 0 else None
         
         # Maximum drawdown (average across simulations)
-        max_drawdowns = []
-        for i in range(simulations.shape[1]):
-            path = simulations[:, i]
-            running_max = np.maximum.accumulate(path)
-            drawdown = (path - running_max) / running_max
-            max_drawdowns.append(np.min(drawdown))
-        
+        max_drawdowns = path_metrics["max_drawdown"]
         avg_max_drawdown = float(np.mean(max_drawdowns))
         
-        return {
+        statistics = {
             "mean": mean,
             "median": percentiles["p50"],
             "std": std,
@@ -193,39 +1321,231 @@ class MonteCarloSimulator:
             "avg_max_drawdown": avg_max_drawdown,
             "initial_investment": initial_investment
         }
+        
+        if "time_under_water" in path_metrics:
+            statistics["risk_metrics"] = self._risk_metrics(
+                final_values, path_metrics, initial_investment, days, percentiles["p5"]
+            )
+        
+        # Control variate: X - beta * (C - E[C]) has the mean of X, less variance
+        mean_values = final_values
+        if control_mean is not None and "control" in path_metrics:
+            control = path_metrics["control"]
+            covariance = np.cov(final_values, control)
+            beta = float(covariance[0, 1] / covariance[1, 1]) if covariance[1, 1] > 0 else 0.0
+            mean_values = final_values - beta * (control - control_mean)
+            
+            statistics["mean"] = float(np.mean(mean_values))
+            statistics["mean_roi"] = (statistics["mean"] - initial_investment) / initial_investment * 100
+            statistics["control_variate"] = {
+                "beta": beta,
+                "raw_mean": mean,
+                "control_mean": float(control_mean)
+            }
+        
+        if "replicate" in path_metrics:
+            statistics["standard_errors"] = self._standard_errors(
+                final_values, mean_values, path_metrics["replicate"], initial_investment
+            )
+        
+        return statistics
+    
+    def _standard_errors(
+        self,
+        final_values: np.ndarray,
+        mean_values: np.ndarray,
+        replicates: np.ndarray,
+        initial_investment: float
+    ) -> Optional[Dict]:
+        """
+        Batch-means standard errors of the headline statistics
+        
+        Each replicate group of paths is an independent estimate (for QMC,
+        an independent scramble), so the spread of the per-group estimates
+        measures the error of the pooled one whatever the sampling mode.
+        
+        Args:
+            final_values: Final value of every path
+            mean_values: Values whose average is reported as the mean
+                (final values, or control-variate adjusted values)
+            replicates: Replicate group of every path
+            initial_investment: Starting value
+        
+        Returns:
+            Dictionary of standard errors, or None with fewer than 2 groups
+        """
+        
+        _, groups = np.unique(replicates, return_inverse=True)
+        counts = np.bincount(groups)
+        num_groups = len(counts)
+        if num_groups < 2:
+            return None
+        
+        means = np.bincount(groups, weights=mean_values) / counts
+        profits = np.bincount(groups, weights=final_values > initial_investment) / counts * 100
+        
+        order = np.argsort(groups, kind="stable")
+        medians = np.array([
+            np.median(group) for group in np.split(final_values[order], np.cumsum(counts)[:-1])
+        ])
+        
+        def standard_error(estimates):
+            return float(np.std(estimates, ddof=1) / np.sqrt(num_groups))
+        
+        se_mean = standard_error(means)
+        se_median = standard_error(medians)
+        
+        return {
+            "mean": se_mean,
+            "median": se_median,
+            "mean_roi": se_mean / initial_investment * 100,
+            "median_roi": se_median / initial_investment * 100,
+            "probability_of_profit": standard_error(profits),
+            "num_replicates": num_groups
+        }
+    
+    def _risk_metrics(
+        self,
+        final_values: np.ndarray,
+        path_metrics: Dict[str, np.ndarray],
+        initial_investment: float,
+        days: int,
+        var_5: float
+    ) -> Dict:
+        """
+        Extra risk metrics from per-path values
+        
+        Args:
+            final_values: Final value of every path
+            path_metrics: Per-path metrics including time_under_water
+            initial_investment: Starting value
+            days: Length of the simulated paths in trading days
+            var_5: 5th percentile of the final values (value at risk)
+        
+        Returns:
+            Dictionary of risk metrics
+        """
+        
+        # Calmar ratio per path: annualized return over |max drawdown|
+        annual_returns = (final_values / initial_investment) ** (252 / max(days - 1, 1)) - 1
+        depth = np.abs(path_metrics["max_drawdown"])
+        calmar = np.divide(
+            annual_returns, depth,
+            out=np.full_like(annual_returns, np.nan),
+            where=depth > 0
+        )
+        
+        # CVaR: mean of the worst 5% of outcomes
+        tail = final_values[final_values <= var_5]
+        cvar_5 = float(np.mean(tail)) if len(tail) else var_5
+        
+        return {
+            "avg_time_under_water": float(np.mean(path_metrics["time_under_water"])),
+            "median_calmar_ratio": float(np.nanmedian(calmar)) if np.any(depth > 0) else None,
+            "var_5": var_5,
+            "cvar_5": cvar_5,
+            "cvar_5_roi": (cvar_5 - initial_investment) / initial_investment * 100
+        }
     
     def _get_sample_paths(
         self,
         simulations: np.ndarray,
-        num_samples: int = 10
-    ) -> List[Dict]:
+        num_samples: int = 10,
+        rng: Optional[np.random.Generator] = None
+    ) -> np.ndarray:
         """
         Extract sample paths for visualization
         
         Args:
             simulations: Full simulation array
             num_samples: Number of paths to extract
+            rng: Random generator used to pick the paths
         
         Returns:
-            List of dictionaries with path data
+            Array of shape (days, num_samples) with the selected paths
         """
         
+        if rng is None:
+            rng = np.random.default_rng()
+        
         # Randomly select sample paths
         total_sims = simulations.shape[1]
         if num_samples > total_sims:
             num_samples = total_sims
         
-        sample_indices = np.random.choice(total_sims, num_samples, replace=False)
+        sample_indices = rng.choice(total_sims, num_samples, replace=False)
+        
+        return simulations[:, sample_indices]
+    
+    def _format_sample_paths(
+        self,
+        sampled: np.ndarray,
+        path_format: str = "records",
+        max_points: Optional[int] = None,
+        scale: float = 1.0
+    ):
+        """
+        Pick the plotted points of the sample paths and format them
+        
+        Args:
+            sampled: Array of shape (days, num_samples) with daily values
+            path_format: One of PATH_FORMATS
+            max_points: If set, choose this many points by LTTB on the
+                average sample path; otherwise every SAMPLE_STRIDE-th day
+            scale: Multiplier applied to every value
+        
+        Returns:
+            List of dictionaries with path data ("records"), or a
+            dictionary of day indices and per-path values
+        """
+        
+        if sampled.size == 0:
+            days = np.arange(0)
+        elif max_points:
+            days = lttb_indices(sampled.mean(axis=1), max_points)
+        else:
+            days = np.arange(0, sampled.shape[0], SAMPLE_STRIDE)  # Monthly sampling
+        
+        points = sampled[days] * scale
+        if path_format == "arrays":
+            return {"days": days, "values": np.ascontiguousarray(points.T)}
+        return self.format_paths(days, points.T, path_format)
+    
+    @staticmethod
+    def format_paths(days: np.ndarray, values: np.ndarray, path_format: str = "records"):
+        """
+        Sample paths in "arrays" form as one of the JSON PATH_FORMATS
+        
+        Args:
+            days: Day index of every point
+            values: Array of shape (num_paths, num_points)
+            path_format: "records" or "columnar"
+        
+        Returns:
+            List of dictionaries with path data ("records"), or a
+            dictionary of day indices and per-path values
+        """
+        
+        days = np.asarray(days, dtype=np.int64)
+        points = np.asarray(values, dtype=np.float64).reshape(len(values), len(days)).T
+        
+        if path_format == "columnar":
+            return {
+                "days": days.tolist(),
+                "paths": np.round(points.T, 2).tolist()
+            }
         
-        # Extract paths (sample every 21 days for monthly data)
         paths = []
-        days = simulations.shape[0]
         
-        for day in range(0, days, 21):  # Monthly sampling
-            path_dict = {"day": day, "month": day // 21}
+        for row, day in enumerate(days.tolist()):
+            if day % SAMPLE_STRIDE == 0:
+                month = day // SAMPLE_STRIDE
+            else:
+                month = round(day / SAMPLE_STRIDE, 2)
+            path_dict = {"day": day, "month": month}
             
-            for idx, sim_idx in enumerate(sample_indices):
-                path_dict[f"path_{idx}"] = float(simulations[day, sim_idx])
+            for idx in range(points.shape[1]):
+                path_dict[f"path_{idx}"] = float(points[row, idx])
             
             paths.append(path_dict)
         
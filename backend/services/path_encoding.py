@@ -0,0 +1,121 @@
+"""
+Path Encoding
+Downsampling and compact binary encoding of simulated sample paths
+"""
+
+import json
+import struct
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+
+BINARY_MIMETYPE = "application/vnd.quanta.paths"
+
+# magic, version, reserved, metadata bytes, num_paths, num_points
+_HEADER = struct.Struct("<4sHHIII")
+_MAGIC = b"QPTH"
+_VERSION = 1
+
+
+def lttb_indices(values: np.ndarray, num_points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling
+    
+    Keeps the first and last point and, from each of num_points - 2 equal
+    buckets in between, the point forming the largest triangle with the
+    previously kept point and the average of the next bucket - which keeps
+    the visual peaks and troughs a fixed stride would drop.
+    
+    Args:
+        values: 1-D series to downsample (x is the index)
+        num_points: Number of points to keep
+    
+    Returns:
+        Sorted array of kept indices
+    """
+    
+    length = len(values)
+    if num_points >= length:
+        return np.arange(length)
+    if num_points < 3:
+        return np.unique(np.linspace(0, length - 1, max(num_points, 1)).astype(int))
+    
+    values = np.asarray(values, dtype=np.float64)
+    edges = np.linspace(1, length - 1, num_points - 1).astype(int)
+    
+    selected = np.empty(num_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = length - 1
+    anchor = 0
+    
+    for bucket in range(num_points - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        next_hi = edges[bucket + 2] if bucket + 2 < len(edges) else length
+        avg_x = (hi + next_hi - 1) / 2
+        avg_y = values[hi:next_hi].mean()
+        
+        xs = np.arange(lo, hi)
+        area = np.abs(
+            (anchor - avg_x) * (values[lo:hi] - values[anchor])
+            - (anchor - xs) * (avg_y - values[anchor])
+        )
+        anchor = lo + int(np.argmax(area))
+        selected[bucket + 1] = anchor
+    
+    return selected
+
+
+def encode_paths(days: np.ndarray, values: np.ndarray, metadata: Optional[Dict] = None) -> bytes:
+    """
+    Encode sample paths as a little-endian binary payload
+    
+    Layout (all little-endian, every section 4-byte aligned):
+        header      20 bytes: b"QPTH", uint16 version, uint16 reserved,
+                    uint32 metadata length, uint32 num_paths, uint32 num_points
+        metadata    UTF-8 JSON (statistics etc.), zero-padded to 4 bytes
+        days        uint32[num_points]
+        values      float32[num_paths][num_points], one path after another
+    
+    Args:
+        days: Day index of every point
+        values: Array of shape (num_paths, num_points)
+        metadata: JSON-serializable dictionary sent along with the paths
+    
+    Returns:
+        Encoded payload
+    """
+    
+    values = np.ascontiguousarray(values, dtype="<f4")
+    days = np.ascontiguousarray(days, dtype="<u4")
+    if values.ndim != 2 or values.shape[1] != len(days):
+        raise ValueError("values must have shape (num_paths, len(days))")
+    
+    meta = json.dumps(metadata or {}, separators=(",", ":")).encode("utf-8")
+    padding = b"\0" * (-len(meta) % 4)
+    
+    header = _HEADER.pack(_MAGIC, _VERSION, 0, len(meta), values.shape[0], values.shape[1])
+    return b"".join([header, meta, padding, days.tobytes(), values.tobytes()])
+
+
+def decode_paths(payload: bytes) -> Tuple[Dict, np.ndarray, np.ndarray]:
+    """
+    Decode a payload produced by encode_paths
+    
+    Returns:
+        Tuple of (metadata, days, values); the arrays are read-only views
+        onto the payload
+    """
+    
+    magic, version, _, meta_length, num_paths, num_points = _HEADER.unpack_from(payload)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError("Not a Quanta paths payload")
+    
+    offset = _HEADER.size
+    metadata = json.loads(payload[offset:offset + meta_length].decode("utf-8"))
+    offset += meta_length + (-meta_length % 4)
+    
+    days = np.frombuffer(payload, dtype="<u4", count=num_points, offset=offset)
+    offset += 4 * num_points
+    values = np.frombuffer(payload, dtype="<f4", count=num_paths * num_points, offset=offset)
+    
+    return metadata, days, values.reshape(num_paths, num_points)
@@ -0,0 +1,106 @@
+"""
+Price Fetchers
+Pluggable sources of raw OHLCV bars for MarketDataService
+"""
+
+import yfinance as yf
+import pandas as pd
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+class PriceFetcher:
+    """
+    Source of raw OHLCV bars (Open, High, Low, Close, Volume columns,
+    DatetimeIndex in naive UTC)
+    
+    Subclasses implement fetch(); fetch_many() defaults to one fetch()
+    per ticker and should be overridden by sources with a bulk endpoint.
+    A stub subclass serving canned frames lets MarketDataService run
+    offline.
+    """
+    
+    def fetch(
+        self,
+        ticker: str,
+        start_date: datetime,
+        end_date: datetime,
+        interval: str = "1d"
+    ) -> Optional[pd.DataFrame]:
+        """Bars of one ticker between start_date and end_date, or None"""
+        raise NotImplementedError
+    
+    def fetch_many(
+        self,
+        tickers: List[str],
+        start_date: datetime,
+        end_date: datetime,
+        interval: str = "1d"
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Bars of several tickers over the same date range
+        
+        Returns:
+            Dictionary of ticker -> frame; tickers without data are left out
+        """
+        frames = {}
+        for ticker in tickers:
+            df = self.fetch(ticker, start_date, end_date, interval)
+            if df is not None and not df.empty:
+                frames[ticker] = df
+        return frames
+
+
+class YahooFetcher(PriceFetcher):
+    """Yahoo Finance via yfinance; fetch_many is a single bulk download"""
+    
+    def __init__(self, timeout: int = 10):
+        self.timeout = timeout
+    
+    def fetch(
+        self,
+        ticker: str,
+        start_date: datetime,
+        end_date: datetime,
+        interval: str = "1d"
+    ) -> Optional[pd.DataFrame]:
+        return self.fetch_many([ticker], start_date, end_date, interval).get(ticker)
+    
+    def fetch_many(
+        self,
+        tickers: List[str],
+        start_date: datetime,
+        end_date: datetime,
+        interval: str = "1d"
+    ) -> Dict[str, pd.DataFrame]:
+        # Try yfinance download (more reliable than .history())
+        df = yf.download(
+            tickers,
+            start=start_date,
+            end=end_date,
+            interval=interval,
+            progress=False,
+            auto_adjust=True,
+            group_by="ticker",
+            timeout=self.timeout
+        )
+        
+        if df is None or df.empty:
+            return {}
+        
+        # Intraday bars come tz-aware; the store keeps naive UTC
+        if df.index.tz is not None:
+            df.index = df.index.tz_convert("UTC").tz_localize(None)
+        
+        if not isinstance(df.columns, pd.MultiIndex):
+            # Older yfinance versions return flat columns for a single ticker
+            return {tickers[0]: df} if len(tickers) == 1 else {}
+        
+        frames = {}
+        available = set(df.columns.get_level_values(0))
+        for ticker in tickers:
+            if ticker in available:
+                frame = df[ticker].dropna(how="all")
+                if not frame.empty:
+                    frames[ticker] = frame
+        return frames
@@ -0,0 +1,259 @@
+"""
+Price Store
+Persistent on-disk OHLCV history, shared between processes through
+memory-mapped column files
+"""
+
+import fcntl
+import json
+import os
+import re
+import time
+import uuid
+import numpy as np
+import pandas as pd
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+from services.cache import LRUCache
+
+
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "instance", "prices")
+
+# Stored columns, in order; Returns / Log_Returns are derived from Close
+COLUMNS = ("Open", "High", "Low", "Close", "Volume", "Returns", "Log_Returns")
+
+
+def _safe_name(name: str) -> str:
+    """Path-safe form of a ticker or interval (e.g. ^GSPC -> _GSPC)"""
+    return re.sub(r"[^A-Za-z0-9._-]", "_", name)
+
+
+class PriceStore:
+    """
+    One price series per (ticker, interval), stored as .npy files
+    
+    Layout of <root>/<TICKER>/<interval>/:
+        meta.json               generation, file names, row count, fetch times
+        .lock                   flock()ed by writers of the series
+        index.<token>.npy       int64 nanosecond timestamps, ascending
+        columns.<token>.npy     float64 array of shape (len(COLUMNS), rows),
+                                so every column is contiguous on disk
+    
+    Reads memory-map the files with np.load(mmap_mode="r") and wrap them
+    in a DataFrame without copying, so every process reading a series shares one copy of
+    it in the OS page cache and a lookback is an O(1) slice. Writes go to
+    new files under a fresh token and are published by atomically
+    replacing meta.json; readers holding the previous generation keep a
+    valid mapping until they let it go. append() publishes a generation
+    with rows added at the end, for incremental refreshes. Writers of a
+    series (in any process) take turns on its lock file, so every
+    generation number is published once and builds on the one before.
+    """
+    
+    def __init__(self, root: Optional[str] = None, max_open: int = 64):
+        """
+        Args:
+            root: Store directory (default: $PRICE_STORE_DIR or
+                backend/instance/prices)
+            max_open: Number of memory-mapped series kept open per process
+        """
+        self.root = root or os.environ.get("PRICE_STORE_DIR", DEFAULT_STORE_DIR)
+        self._open = LRUCache(max_size=max_open)  # (ticker, interval, generation) -> frame
+    
+    def load(self, ticker: str, interval: str = "1d") -> Optional[Tuple[pd.DataFrame, Dict]]:
+        """
+        Memory-map the stored series
+        
+        Returns:
+            Tuple of (read-only DataFrame, metadata), or None if not stored
+        """
+        
+        meta = self.read_meta(ticker, interval)
+        if meta is None:
+            return None
+        
+        key = (ticker.upper(), interval, meta["generation"])
+        df = self._open.get(key)
+        if df is None:
+            directory = self._directory(ticker, interval)
+            try:
+                index = np.load(os.path.join(directory, meta["index_file"]), mmap_mode="r")
+                columns = np.load(os.path.join(directory, meta["columns_file"]), mmap_mode="r")
+            except (OSError, ValueError) as e:
+                # Superseded and cleaned up between reading meta and opening
+                print(f"Price store read failed for {ticker}: {e}")
+                return None
+            
+            # (rows, columns) view of the column-major file: one float block, no copy
+            df = pd.DataFrame(columns.T, index=pd.DatetimeIndex(index.view("datetime64[ns]")), columns=list(COLUMNS), copy=False)
+            # Lets consumers key caches by series (slices inherit attrs)
+            df.attrs.update(ticker=ticker.upper(), interval=interval, generation=meta["generation"])
+            self._open.set(key, df)
+        
+        return df, meta
+    
+    def save(self, ticker: str, interval: str, df: pd.DataFrame, **meta_fields) -> Dict:
+        """
+        Replace the stored series with df
+        
+        Args:
+            ticker: Ticker symbol
+            interval: Bar interval, e.g. "1d"
+            df: Frame with every column in COLUMNS and a DatetimeIndex
+            **meta_fields: Extra JSON-serializable metadata to store
+        
+        Returns:
+            The new metadata
+        """
+        
+        index, columns = self._to_arrays(df)
+        with self._locked(ticker, interval):
+            return self._publish(ticker, interval, self.read_meta(ticker, interval), index, columns, meta_fields)
+    
+    def append(self, ticker: str, interval: str, df: pd.DataFrame, **meta_fields) -> Dict:
+        """
+        Add rows after the end of the stored series
+        
+        Args:
+            ticker: Ticker symbol
+            interval: Bar interval, e.g. "1d"
+            df: New rows (every column in COLUMNS), all later than the
+                stored series' last timestamp
+            **meta_fields: Metadata to update; other fields are kept
+        
+        Returns:
+            The new metadata
+        """
+        
+        new_index, new_columns = self._to_arrays(df)
+        with self._locked(ticker, interval):
+            previous = self.read_meta(ticker, interval)
+            if previous is None:
+                return self._publish(ticker, interval, None, new_index, new_columns, meta_fields)
+            
+            if len(new_index) and previous["last"] is not None and new_index[0] <= previous["last"]:
+                raise ValueError("Appended rows must come after the stored series")
+            
+            directory = self._directory(ticker, interval)
+            index = np.load(os.path.join(directory, previous["index_file"]), mmap_mode="r")
+            columns = np.load(os.path.join(directory, previous["columns_file"]), mmap_mode="r")
+            
+            kept = {key: value for key, value in previous.items() if key not in self._FILE_FIELDS}
+            return self._publish(
+                ticker, interval, previous,
+                np.concatenate([index, new_index]),
+                np.concatenate([columns, new_columns], axis=1),
+                dict(kept, **meta_fields)
+            )
+    
+    def update_meta(self, ticker: str, interval: str, **meta_fields) -> Optional[Dict]:
+        """Update metadata fields (e.g. fetched_at) without touching the data"""
+        with self._locked(ticker, interval):
+            meta = self.read_meta(ticker, interval)
+            if meta is None:
+                return None
+            
+            meta.update(meta_fields)
+            self._write_meta(self._directory(ticker, interval), meta)
+            return meta
+    
+    def read_meta(self, ticker: str, interval: str = "1d") -> Optional[Dict]:
+        """Metadata of the stored series, or None"""
+        path = os.path.join(self._directory(ticker, interval), "meta.json")
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    # Metadata fields describing the stored files, rewritten by every publish
+    _FILE_FIELDS = (
+        "ticker", "interval", "generation", "rows", "index_file", "columns_file",
+        "first", "last", "updated_at"
+    )
+    
+    def _to_arrays(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """Nanosecond UTC timestamps and the (len(COLUMNS), rows) value array of df"""
+        index = pd.DatetimeIndex(df.index)
+        if index.tz is not None:
+            index = index.tz_convert("UTC").tz_localize(None)
+        
+        columns = np.ascontiguousarray(df[list(COLUMNS)].to_numpy(dtype=np.float64).T)
+        return index.as_unit("ns").asi8, columns
+    
+    def _publish(
+        self,
+        ticker: str,
+        interval: str,
+        previous: Optional[Dict],
+        index: np.ndarray,
+        columns: np.ndarray,
+        meta_fields: Dict
+    ) -> Dict:
+        """
+        Write a new generation's files, switch meta.json to them, drop the old
+        ones (series lock held; previous is the current meta.json)
+        """
+        
+        directory = self._directory(ticker, interval)
+        
+        token = uuid.uuid4().hex
+        index_file = f"index.{token}.npy"
+        columns_file = f"columns.{token}.npy"
+        np.save(os.path.join(directory, index_file), index)
+        np.save(os.path.join(directory, columns_file), columns)
+        
+        meta = dict(
+            meta_fields,
+            ticker=ticker.upper(),
+            interval=interval,
+            generation=(previous["generation"] + 1) if previous else 1,
+            rows=len(index),
+            index_file=index_file,
+            columns_file=columns_file,
+            first=int(index[0]) if len(index) else None,
+            last=int(index[-1]) if len(index) else None,
+            updated_at=time.time()
+        )
+        self._write_meta(directory, meta)
+        
+        # Open mappings of superseded files stay valid; the files just lose
+        # their names. Also clears files a crashed writer left behind.
+        self._remove_unused(directory, meta)
+        
+        return meta
+    
+    def _directory(self, ticker: str, interval: str) -> str:
+        """Directory of one series"""
+        return os.path.join(self.root, _safe_name(ticker.upper()), _safe_name(interval))
+    
+    @contextmanager
+    def _locked(self, ticker: str, interval: str) -> Iterator[None]:
+        """Exclusive lock on one series, across threads and processes"""
+        directory = self._directory(ticker, interval)
+        os.makedirs(directory, exist_ok=True)
+        # flock() locks belong to the open file, so each holder opens its own
+        with open(os.path.join(directory, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _write_meta(self, directory: str, meta: Dict):
+        """Atomically publish a new meta.json"""
+        tmp_path = os.path.join(directory, f"meta.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(directory, "meta.json"))
+    
+    def _remove_unused(self, directory: str, meta: Dict):
+        """Delete data files meta doesn't name, ignoring ones already gone (lock held)"""
+        keep = {meta["index_file"], meta["columns_file"]}
+        for name in os.listdir(directory):
+            if name.endswith(".npy") and name not in keep:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
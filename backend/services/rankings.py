@@ -0,0 +1,286 @@
+"""
+Rankings
+Strategy leaderboards and trending hashtags, served from memory
+"""
+
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, event, func, inspect, insert
+
+from models import Post, Strategy, TagCount, db
+from services.likes import dialect_insert
+from services.social import serialize_strategy, strategy_query
+
+
+# Leaderboard metrics: strategy columns, ranked descending (ties by id)
+LEADERBOARD_METRICS = ("roi", "sharpe_ratio", "likes")
+LEADERBOARD_SIZE = 100  # Strategies kept per leaderboard
+
+TRENDING_SIZE = 50  # Tags kept per trending window
+MAX_TRENDING_HOURS = 7 * 24  # Longest window; older tag counts are pruned
+
+TAG_PATTERN = re.compile(r"#(\w{1,50})\b")
+
+
+def extract_tags(content: Optional[str]) -> List[str]:
+    """Distinct lowercase hashtags of a post"""
+    return sorted({tag.lower() for tag in TAG_PATTERN.findall(content or "")})
+
+
+def tag_bucket(at: datetime) -> datetime:
+    """Hour bucket of a timestamp"""
+    return at.replace(minute=0, second=0, microsecond=0)
+
+
+def _post_tag_changes(session) -> Counter:
+    """(bucket, tag) count changes of the posts a flush wrote"""
+    changes = Counter()
+    for post in session.new:
+        if isinstance(post, Post):
+            for tag in extract_tags(post.content):
+                changes[(tag_bucket(post.created_at), tag)] += 1
+    for post in session.deleted:
+        if isinstance(post, Post):
+            for tag in extract_tags(post.content):
+                changes[(tag_bucket(post.created_at), tag)] -= 1
+    for post in session.dirty:
+        if isinstance(post, Post) and session.is_modified(post):
+            history = inspect(post).attrs.content.history
+            if history.has_changes():
+                bucket = tag_bucket(post.created_at)
+                for tag in extract_tags(history.deleted[0] if history.deleted else None):
+                    changes[(bucket, tag)] -= 1
+                for tag in extract_tags(post.content):
+                    changes[(bucket, tag)] += 1
+    return Counter({key: delta for key, delta in changes.items() if delta})
+
+
+def apply_tag_changes(connection, changes: Counter):
+    """Atomically add count changes to tag_counts (upsert)"""
+    table = TagCount.__table__
+    statement = dialect_insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.bucket, table.c.tag],
+        set_={"count": table.c.count + statement.excluded.count}
+    )
+    connection.execute(statement, [
+        {"bucket": bucket, "tag": tag, "count": delta}
+        for (bucket, tag), delta in sorted(changes.items())
+    ])
+
+
+def rebuild_tag_counts(now: Optional[datetime] = None) -> int:
+    """
+    Recompute tag_counts from the posts of the last MAX_TRENDING_HOURS
+    
+    For recovery (e.g. posts written around the ORM); posts written while
+    it runs may be missed until the next rebuild.
+    
+    Returns:
+        Number of (hour, tag) rows written
+    """
+    
+    since = tag_bucket(now or datetime.utcnow()) - timedelta(hours=MAX_TRENDING_HOURS)
+    counts = Counter()
+    posts = db.session.query(Post.content, Post.created_at).filter(Post.created_at >= since)
+    for content, created_at in posts.yield_per(1000):
+        for tag in extract_tags(content):
+            counts[(tag_bucket(created_at), tag)] += 1
+    
+    with db.engine.begin() as conn:
+        conn.execute(delete(TagCount.__table__))
+        if counts:
+            conn.execute(insert(TagCount.__table__), [
+                {"bucket": bucket, "tag": tag, "count": count}
+                for (bucket, tag), count in counts.items()
+            ])
+    return len(counts)
+
+
+class Rankings:
+    """
+    Leaderboards (top strategies by LEADERBOARD_METRICS) and trending tags
+    (post counts per hashtag over the last N hours), served from memory
+    
+    - Leaderboards are the top LEADERBOARD_SIZE rows of a (metric, id)
+      index; trending tags sum the small tag_counts table, which post
+      writes keep up to date in their own transaction. Neither scans
+      strategies or posts.
+    - Strategy and post writes in this process mark the lists they can
+      change dirty (a strategy only if it is on a board or now qualifies),
+      as do like flushes; dirty lists are reloaded on their next read.
+    - Writes by other processes show up within `max_staleness` seconds,
+      the age at which a list is reloaded anyway.
+    """
+    
+    def __init__(self, max_staleness: float = 30.0):
+        """
+        Args:
+            max_staleness: Seconds a leaderboard or trending list is served
+                before it is reloaded
+        """
+        self.max_staleness = max_staleness
+        
+        # metric / ("trending", hours) -> (loaded_at, items)
+        self._lists: Dict[object, Tuple[float, List[Dict]]] = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+    
+    def install(self, session):
+        """Track strategy and post writes of a (scoped) session"""
+        event.listen(session, "after_flush", self._after_flush)
+        event.listen(session, "after_commit", self._after_commit)
+        event.listen(session, "after_soft_rollback", self._after_rollback)
+    
+    def leaderboard(self, metric: str, limit: int = 10) -> Dict:
+        """
+        Top strategies by a metric
+        
+        Returns:
+            Dictionary with "metric", "items" and "updated_at" (unix time)
+        """
+        
+        if metric not in LEADERBOARD_METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {LEADERBOARD_METRICS}")
+        if not 1 <= limit <= LEADERBOARD_SIZE:
+            raise ValueError(f"limit must be between 1 and {LEADERBOARD_SIZE}")
+        
+        loaded_at, items = self._get(metric, lambda: self._load_leaderboard(metric))
+        return {"metric": metric, "items": items[:limit], "updated_at": loaded_at}
+    
+    def trending(self, limit: int = 10, hours: int = 24) -> Dict:
+        """
+        Most used hashtags of the last `hours` hours
+        
+        Returns:
+            Dictionary with "tags" ([{"tag", "posts"}]), "hours" and
+            "updated_at" (unix time)
+        """
+        
+        if not 1 <= hours <= MAX_TRENDING_HOURS:
+            raise ValueError(f"hours must be between 1 and {MAX_TRENDING_HOURS}")
+        if not 1 <= limit <= TRENDING_SIZE:
+            raise ValueError(f"limit must be between 1 and {TRENDING_SIZE}")
+        
+        loaded_at, items = self._get(("trending", hours), lambda: self._load_trending(hours))
+        return {"tags": items[:limit], "hours": hours, "updated_at": loaded_at}
+    
+    def invalidate(self):
+        """Reload every list on its next read"""
+        with self._lock:
+            self._dirty.update(self._lists)
+    
+    def likes_changed(self, deltas: Dict[Tuple[str, int], int]):
+        """LikeBuffer.on_flush hook: strategy likes moved"""
+        if any(kind == "strategy" for kind, _ in deltas):
+            with self._lock:
+                self._dirty.add("likes")
+    
+    def _get(self, key, load) -> Tuple[float, List[Dict]]:
+        """Cached list, reloaded if dirty or older than max_staleness"""
+        with self._lock:
+            cached = self._lists.get(key)
+            fresh = (
+                cached is not None and key not in self._dirty
+                and time.time() - cached[0] < self.max_staleness
+            )
+            if fresh:
+                return cached
+            self._dirty.discard(key)
+        
+        # Loaded outside the lock; concurrent reloads of one list are harmless
+        cached = (time.time(), load())
+        with self._lock:
+            self._lists[key] = cached
+        return cached
+    
+    def _load_leaderboard(self, metric: str) -> List[Dict]:
+        column = getattr(Strategy, metric)
+        rows = (
+            strategy_query()
+            .filter(column.isnot(None))
+            .order_by(column.desc(), Strategy.id.desc())
+            .limit(LEADERBOARD_SIZE)
+            .all()
+        )
+        return [serialize_strategy(strategy) for strategy in rows]
+    
+    def _load_trending(self, hours: int) -> List[Dict]:
+        now = datetime.utcnow()
+        self._prune(now)
+        
+        since = tag_bucket(now) - timedelta(hours=hours - 1)
+        posts = func.sum(TagCount.count)
+        rows = (
+            db.session.query(TagCount.tag, posts)
+            .filter(TagCount.bucket >= since)
+            .group_by(TagCount.tag)
+            .having(posts > 0)
+            .order_by(posts.desc(), TagCount.tag)
+            .limit(TRENDING_SIZE)
+            .all()
+        )
+        return [{"tag": tag, "posts": int(count)} for tag, count in rows]
+    
+    def _prune(self, now: datetime):
+        """Drop tag counts older than the longest window (hourly)"""
+        if time.time() - self._last_prune < 3600:
+            return
+        self._last_prune = time.time()
+        cutoff = tag_bucket(now) - timedelta(hours=MAX_TRENDING_HOURS)
+        with db.engine.begin() as conn:
+            conn.execute(delete(TagCount.__table__).where(TagCount.__table__.c.bucket < cutoff))
+    
+    # ========== SESSION EVENTS ==========
+    
+    def _after_flush(self, session, flush_context):
+        """Write tag count changes in the flush's transaction, note affected lists"""
+        changes = _post_tag_changes(session)
+        if changes:
+            apply_tag_changes(session.connection(), changes)
+            with self._lock:
+                trending = {key for key in self._lists if isinstance(key, tuple)}
+            session.info.setdefault("rankings_dirty", set()).update(trending)
+        
+        strategies = [
+            (strategy, strategy in session.deleted)
+            for strategy in (*session.new, *session.dirty, *session.deleted)
+            if isinstance(strategy, Strategy)
+        ]
+        if strategies:
+            session.info.setdefault("rankings_dirty", set()).update(self._affected(strategies))
+    
+    def _affected(self, strategies: List[Tuple[Strategy, bool]]) -> set:
+        """Leaderboards a set of written strategies can change"""
+        affected = set()
+        with self._lock:
+            for metric in LEADERBOARD_METRICS:
+                cached = self._lists.get(metric)
+                if cached is None:
+                    continue
+                items = cached[1]
+                members = {item["id"] for item in items}
+                cutoff = items[-1][metric] if len(items) >= LEADERBOARD_SIZE else None
+                for strategy, deleted in strategies:
+                    value = getattr(strategy, metric)
+                    if strategy.id in members or (
+                        not deleted and value is not None and (cutoff is None or value >= cutoff)
+                    ):
+                        affected.add(metric)
+                        break
+        return affected
+    
+    def _after_commit(self, session):
+        dirty = session.info.pop("rankings_dirty", None)
+        if dirty:
+            with self._lock:
+                self._dirty.update(dirty)
+    
+    def _after_rollback(self, session, previous_transaction):
+        session.info.pop("rankings_dirty", None)
@@ -0,0 +1,300 @@
+"""
+Return Models
+Daily log-return generators for the Monte Carlo path engines
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+
+from services.indicators import ema
+from services.sampling import ShockSampler
+
+
+RETURN_MODELS = ("gbm", "bootstrap", "block_bootstrap", "garch")
+
+MEAN_BLOCK_LENGTH = 20  # Trading days per block of the stationary bootstrap
+GATHER_COLUMNS = 2048  # Paths per index draw of the IID bootstrap, bounding the int64 temporary
+
+
+class ReturnModel:
+    """
+    Fills (steps, n) blocks of daily log returns, one column per path
+    
+    The simulator cumulatively sums the filled block and exponentiates it,
+    so every model shares the GBM engine's path buffer, statistics and
+    sample paths. Models hold only small arrays and pickle to process
+    workers.
+    """
+    
+    name = "gbm"
+    
+    def fill(self, out: np.ndarray, sampler: ShockSampler) -> np.ndarray:
+        """Fill the next out.shape[1] paths' log returns into out"""
+        raise NotImplementedError
+    
+    def expected_growth(self, steps: int) -> Optional[float]:
+        """E[S(steps) / S(0)] if known in closed form (used by the control variate)"""
+        return None
+    
+    def describe(self) -> Dict:
+        """Fitted parameters, for the result's "parameters" entry"""
+        return {}
+
+
+class GBMModel(ReturnModel):
+    """Normal log returns with constant drift and volatility"""
+    
+    name = "gbm"
+    
+    def __init__(self, mu: float, sigma: float):
+        """
+        Args:
+            mu: Expected daily (simple) return
+            sigma: Daily volatility
+        """
+        self.mu = float(mu)
+        self.sigma = float(sigma)
+    
+    def fill(self, out: np.ndarray, sampler: ShockSampler) -> np.ndarray:
+        sampler.fill(out)
+        out *= self.sigma
+        out += self.mu - 0.5 * self.sigma ** 2
+        return out
+    
+    def expected_growth(self, steps: int) -> Optional[float]:
+        return float(np.exp(self.mu * steps))
+    
+    def describe(self) -> Dict:
+        return {"mu": self.mu, "sigma": self.sigma}
+
+
+class BootstrapModel(ReturnModel):
+    """IID draws from the historical log returns (keeps fat tails and skew)"""
+    
+    name = "bootstrap"
+    
+    def __init__(self, log_returns: np.ndarray):
+        """
+        Args:
+            log_returns: Historical daily log returns, without NaNs
+        """
+        if len(log_returns) < 2:
+            raise ValueError("Bootstrapping needs at least two historical returns")
+        self.log_returns = np.asarray(log_returns, dtype=np.float64)
+    
+    def fill(self, out: np.ndarray, sampler: ShockSampler) -> np.ndarray:
+        _require_standard(sampler, self.name)
+        for first in range(0, out.shape[1], GATHER_COLUMNS):
+            block = out[:, first:first + GATHER_COLUMNS]
+            index = sampler.rng.integers(0, len(self.log_returns), size=block.shape)
+            block[...] = self.log_returns[index]
+        sampler.position += out.shape[1]
+        return out
+    
+    def expected_growth(self, steps: int) -> Optional[float]:
+        # IID draws: E[prod exp(r)] = E[exp(r)] ** steps
+        return float(np.mean(np.exp(self.log_returns)) ** steps)
+    
+    def describe(self) -> Dict:
+        return {"observations": len(self.log_returns)}
+
+
+class BlockBootstrapModel(BootstrapModel):
+    """
+    Stationary block bootstrap (Politis & Romano)
+    
+    Paths are stitched from runs of consecutive historical returns that
+    start at random days and last a geometric number of days (mean
+    `block_length`), wrapping around the end of the history, so
+    volatility clustering and short-term autocorrelation survive.
+    """
+    
+    name = "block_bootstrap"
+    
+    def __init__(self, log_returns: np.ndarray, block_length: float = MEAN_BLOCK_LENGTH):
+        """
+        Args:
+            log_returns: Historical daily log returns, without NaNs
+            block_length: Mean block length in days (1 = IID bootstrap)
+        """
+        super().__init__(log_returns)
+        if block_length < 1:
+            raise ValueError("block_length must be at least 1 day")
+        self.block_length = float(block_length)
+    
+    def fill(self, out: np.ndarray, sampler: ShockSampler) -> np.ndarray:
+        _require_standard(sampler, self.name)
+        rng = sampler.rng
+        num_obs = len(self.log_returns)
+        steps, num_paths = out.shape
+        
+        # A block starts on day 0 and then with probability 1 / block_length
+        # each day; only the block starts draw a random day of the history
+        new_block = rng.random(out.shape, dtype=np.float32) < 1 / self.block_length
+        starts = rng.integers(0, num_obs, size=num_paths + int(np.count_nonzero(new_block[1:])))
+        
+        # Day by day over contiguous rows: within a block the index advances one day
+        index = starts[:num_paths].copy()
+        used = num_paths
+        np.take(self.log_returns, index, out=out[0])
+        for t in range(1, steps):
+            index += 1
+            index[index == num_obs] = 0
+            fresh = new_block[t]
+            count = int(np.count_nonzero(fresh))
+            index[fresh] = starts[used:used + count]
+            used += count
+            np.take(self.log_returns, index, out=out[t])
+        
+        sampler.position += num_paths
+        return out
+    
+    def expected_growth(self, steps: int) -> Optional[float]:
+        return None  # Returns within a block are dependent
+    
+    def describe(self) -> Dict:
+        return {"observations": len(self.log_returns), "block_length": self.block_length}
+
+
+class GarchModel(ReturnModel):
+    """
+    GARCH(1, 1) volatility clustering fitted to the history
+    
+    r[t] = mu + sqrt(h[t]) * z[t],  h[t] = omega + alpha * (r[t-1] - mu)^2 + beta * h[t-1]
+    
+    Fitted by Gaussian quasi-maximum likelihood with variance targeting
+    (omega = var * (1 - alpha - beta)) over an (alpha, beta) grid. Paths
+    start from the conditional variance forecast for the day after the
+    history, so a turbulent present gives a turbulent start. The shocks
+    come from the sampler, so every sampling mode applies.
+    """
+    
+    name = "garch"
+    
+    ALPHAS = np.arange(0.01, 0.31, 0.01)
+    BETAS = np.arange(0.60, 0.995, 0.01)
+    
+    def __init__(self, mu: float, omega: float, alpha: float, beta: float, initial_variance: float):
+        self.mu = float(mu)
+        self.omega = float(omega)
+        self.alpha = float(alpha)
+        self.beta = float(beta)
+        self.initial_variance = float(initial_variance)
+    
+    @classmethod
+    def fit(cls, log_returns: np.ndarray) -> "GarchModel":
+        """
+        Fit to historical daily log returns
+        
+        For a fixed beta, h[t] - var = alpha * D[t] with
+        D[t] = beta * D[t-1] + (e[t-1]^2 - var), so one EMA per beta gives
+        the variance of every alpha at once.
+        """
+        
+        if len(log_returns) < 30:
+            raise ValueError("Fitting GARCH needs at least 30 historical returns")
+        
+        mu = float(np.mean(log_returns))
+        squared = (np.asarray(log_returns, dtype=np.float64) - mu) ** 2
+        variance = float(np.mean(squared))
+        
+        # Shocks lagged one day, with a leading 0 so D[0] = 0
+        lagged = np.concatenate([[0.0], squared[:-1] - variance])
+        alphas = cls.ALPHAS[:, None]
+        
+        best = (-np.inf, 0.05, 0.90, 0.0)
+        for beta in cls.BETAS:
+            valid = cls.ALPHAS + beta < 0.999
+            if not valid.any():
+                continue
+            # The EMA with weight 1 - beta is (1 - beta) * D
+            deviation = ema(lagged, 1 - beta) / (1 - beta)
+            h = variance + alphas[valid] * deviation  # > 0 since alpha + beta < 1
+            likelihood = -0.5 * np.sum(np.log(h) + squared / h, axis=1)
+            
+            i = int(np.argmax(likelihood))
+            if likelihood[i] > best[0]:
+                # Next day's variance, from the last return and last variance
+                forecast = variance + cls.ALPHAS[valid][i] * (beta * deviation[-1] + squared[-1] - variance)
+                best = (likelihood[i], cls.ALPHAS[valid][i], beta, forecast)
+        
+        _, alpha, beta, forecast = best
+        omega = variance * (1 - alpha - beta)
+        return cls(mu, omega, alpha, beta, forecast)
+    
+    def fill(self, out: np.ndarray, sampler: ShockSampler) -> np.ndarray:
+        # A day-by-day recursion on (n,) rows: each row is contiguous, and no
+        # (steps, n) temporaries are needed
+        sampler.fill(out)
+        h = np.full(out.shape[1], self.initial_variance, dtype=out.dtype)
+        shock = np.empty_like(h)
+        
+        for t in range(out.shape[0]):
+            if t:
+                # out[t-1] holds the previous return; its shock is (r - mu)
+                np.subtract(out[t - 1], self.mu, out=shock)
+                shock *= shock
+                h *= self.beta
+                h += self.alpha * shock
+                h += self.omega
+            out[t] *= np.sqrt(h)
+            out[t] += self.mu
+        
+        return out
+    
+    def long_run_volatility(self) -> float:
+        return float(np.sqrt(self.omega / (1 - self.alpha - self.beta)))
+    
+    def describe(self) -> Dict:
+        return {
+            "mu": self.mu,
+            "omega": self.omega,
+            "alpha": self.alpha,
+            "beta": self.beta,
+            "initial_volatility": float(np.sqrt(self.initial_variance)),
+            "long_run_volatility": self.long_run_volatility()
+        }
+
+
+def _require_standard(sampler: ShockSampler, model: str):
+    """Variance-reduction modes transform normal shocks; resampling has none"""
+    if sampler.mode != "standard":
+        raise ValueError(f"sampling='{sampler.mode}' needs normal shocks, which model='{model}' doesn't use")
+
+
+def build_return_model(
+    model: str,
+    historical_data: pd.DataFrame,
+    mu: float,
+    sigma: float,
+    block_length: float = MEAN_BLOCK_LENGTH
+) -> ReturnModel:
+    """
+    Return model fitted to a price history
+    
+    Args:
+        model: One of RETURN_MODELS
+        historical_data: Frame with a Log_Returns column (e.g. from
+            MarketDataService)
+        mu: Daily drift fitted for GBM
+        sigma: Daily volatility fitted for GBM
+        block_length: Mean block length of the block bootstrap
+    
+    Returns:
+        ReturnModel instance
+    """
+    
+    if model not in RETURN_MODELS:
+        raise ValueError(f"Unknown model '{model}', expected one of {RETURN_MODELS}")
+    if model == "gbm":
+        return GBMModel(mu, sigma)
+    
+    log_returns = historical_data['Log_Returns'].to_numpy(dtype=np.float64)
+    log_returns = log_returns[~np.isnan(log_returns)]
+    
+    if model == "bootstrap":
+        return BootstrapModel(log_returns)
+    if model == "block_bootstrap":
+        return BlockBootstrapModel(log_returns, block_length)
+    return GarchModel.fit(log_returns)
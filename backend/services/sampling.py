@@ -0,0 +1,163 @@
+"""
+Shock Sampling
+Standard normal shock generators for the Monte Carlo path engines,
+including variance-reduction modes
+"""
+
+import warnings
+import numpy as np
+from typing import Optional
+
+
+SAMPLING_MODES = ("standard", "antithetic", "sobol", "halton")
+
+
+class ShockSampler:
+    """
+    Fills (steps, n) blocks of N(0, 1) shocks, one column per path
+    
+    Paths are split into `num_replicates` contiguous groups. Every group is
+    an independent estimate of the same statistics, which is what the
+    batch-means standard errors in MonteCarloSimulator are computed from.
+    
+    Modes:
+        standard: IID pseudo-random normals
+        antithetic: paths (2k, 2k+1) get shocks Z and -Z
+        sobol / halton: a scrambled low-discrepancy sequence over `steps`
+            dimensions, mapped through the inverse normal CDF. Every group
+            restarts the sequence under its own random shift modulo 1
+            (randomized QMC, requires SciPy). Halton gets slow in the
+            thousands of dimensions a multi-year daily path needs
+    
+    Fills have to cover the paths in order, as the path engines do.
+    """
+    
+    def __init__(
+        self,
+        mode: str,
+        steps: int,
+        num_paths: int,
+        rng: Optional[np.random.Generator] = None,
+        num_replicates: int = 16
+    ):
+        """
+        Args:
+            mode: One of SAMPLING_MODES
+            steps: Number of time steps (rows) per path
+            num_paths: Total number of paths this sampler will fill
+            rng: Random generator driving every mode
+            num_replicates: Number of independent path groups
+        """
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode '{mode}', expected one of {SAMPLING_MODES}")
+        
+        if mode in ("sobol", "halton"):
+            try:
+                from scipy.special import ndtri
+                from scipy.stats import qmc
+            except ImportError as e:
+                raise ImportError(f"sampling='{mode}' requires SciPy (pip install scipy)") from e
+            self._ndtri = ndtri
+            self._qmc_factory = qmc.Sobol if mode == "sobol" else qmc.Halton
+        
+        self.mode = mode
+        self.steps = steps
+        self.rng = rng if rng is not None else np.random.default_rng()
+        
+        # At least two paths per group, and antithetic pairs never straddle groups
+        self.num_replicates = max(1, min(num_replicates, num_paths // 2))
+        group_size = max(1, -(-num_paths // self.num_replicates))
+        if mode == "antithetic" and group_size % 2:
+            group_size += 1
+        self.group_size = group_size
+        
+        self.position = 0
+        self._pending = None  # Unpaired antithetic shock from the previous fill
+        self._engine = None
+        self._engine_group = None
+        self._shift = None
+    
+    def replicate_ids(self, start: int, count: int) -> np.ndarray:
+        """Replicate group of paths start .. start + count - 1"""
+        return np.arange(start, start + count) // self.group_size
+    
+    def fill(self, out: np.ndarray) -> np.ndarray:
+        """
+        Fill the next out.shape[1] paths' shocks into out
+        
+        Args:
+            out: Array of shape (steps, n); float32 or float64
+        
+        Returns:
+            out
+        """
+        
+        if self.mode == "standard":
+            self.rng.standard_normal(dtype=out.dtype, out=out)
+        elif self.mode == "antithetic":
+            self._fill_antithetic(out)
+        else:
+            self._fill_qmc(out)
+        
+        self.position += out.shape[1]
+        return out
+    
+    def _fill_antithetic(self, out: np.ndarray):
+        """Interleave Z / -Z columns, carrying an unpaired column over to the next fill"""
+        
+        count = out.shape[1]
+        col = 0
+        if self._pending is not None and count:
+            np.negative(self._pending, out=out[:, 0])
+            self._pending = None
+            col = 1
+        
+        remaining = count - col
+        if remaining == 0:
+            return
+        
+        base = self.rng.standard_normal((self.steps, -(-remaining // 2)), dtype=out.dtype)
+        out[:, col::2] = base
+        np.negative(base[:, :remaining // 2], out=out[:, col + 1::2])
+        
+        if remaining % 2:
+            self._pending = base[:, -1].copy()
+    
+    def _fill_qmc(self, out: np.ndarray):
+        """Fill from the shifted sequence of each replicate group the columns fall in"""
+        
+        count = out.shape[1]
+        eps = np.finfo(np.float64).eps
+        col = 0
+        
+        while col < count:
+            index = self.position + col
+            group = index // self.group_size
+            take = min(count - col, (group + 1) * self.group_size - index)
+            
+            if self._engine is None:
+                # Scrambling thousands of dimensions is the slow part - do it once
+                self._engine = self._new_qmc_engine()
+            if self._engine_group != group:
+                self._engine.reset()
+                self._shift = self.rng.random(self.steps)
+                self._engine_group = group
+            
+            with warnings.catch_warnings():
+                # Sobol balance is only exact for powers of two; chunks rarely are
+                warnings.simplefilter("ignore", UserWarning)
+                uniforms = self._engine.random(take)
+            
+            uniforms += self._shift
+            np.mod(uniforms, 1.0, out=uniforms)
+            np.clip(uniforms, eps, 1 - eps, out=uniforms)
+            out[:, col:col + take] = self._ndtri(uniforms).T
+            col += take
+    
+    def _new_qmc_engine(self):
+        """Scrambled sequence seeded from the sampler's generator"""
+        seed = int(self.rng.integers(2**32))
+        try:
+            return self._qmc_factory(d=self.steps, scramble=True, rng=seed)
+        except TypeError:  # SciPy < 1.15 names the argument `seed`
+            return self._qmc_factory(d=self.steps, scramble=True, seed=seed)
@@ -0,0 +1,913 @@
+"""
+Strategy Sandbox
+Runs user-submitted strategy code in a pool of warm, resource-limited
+worker processes
+"""
+
+import ast
+import ctypes
+import errno
+import hashlib
+import json
+import marshal
+import math
+import mmap
+import os
+import pwd
+import queue
+import resource
+import signal
+import subprocess
+import sys
+import threading
+import time
+import types
+import zoneinfo
+import numpy as np
+import pandas as pd
+from multiprocessing import Pipe
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, List, Optional
+
+from services.backtest import performance_metrics, run_targets
+from services.cache import LRUCache
+
+
+# Modules strategy code may import. Workers import them before the first
+# job: jobs can't open files, so nothing new loads
+ALLOWED_MODULES = ("math", "numpy", "numpy.linalg", "numpy.random", "pandas")
+
+# Builtins visible to strategy code - no I/O, introspection or code execution
+SAFE_BUILTINS = (
+    "abs", "all", "any", "bool", "dict", "divmod", "enumerate", "filter", "float",
+    "frozenset", "int", "isinstance", "len", "list", "map", "max", "min", "pow",
+    "range", "reversed", "round", "set", "slice", "sorted", "str", "sum", "tuple", "zip",
+    "ArithmeticError", "Exception", "IndexError", "KeyError", "TypeError", "ValueError",
+    "ZeroDivisionError"
+)
+
+# Price columns shared with the workers (missing ones are NaN)
+PRICE_COLUMNS = ("Open", "High", "Low", "Close", "Volume")
+
+# Attributes strategy code may read, of each allowed module and of any
+# other object (frames, series, arrays, windows, generators, ...).
+# Everything else is out of reach, notably file and pickle I/O (read_*,
+# to_csv, to_pickle, load, save, tofile), numpy / pandas internals
+# (compat, lib, ctypeslib) and eval / query / format, which do their own
+# attribute lookups
+MODULE_ATTRIBUTES = {
+    "math": frozenset(name for name in dir(math) if not name.startswith("_")),
+    "numpy": frozenset((
+        "abs", "absolute", "add", "all", "allclose", "any", "append", "arange", "arccos", "arcsin",
+        "arctan", "arctan2", "argmax", "argmin", "argsort", "around", "array", "array_equal", "asarray",
+        "average", "bool_", "cbrt", "ceil", "clip", "column_stack", "concatenate", "convolve",
+        "corrcoef", "cos", "cosh", "count_nonzero", "cov", "cumprod", "cumsum", "diag", "diff",
+        "digitize", "divide", "dot", "e", "empty", "empty_like", "equal", "exp", "exp2", "expm1",
+        "eye", "fabs", "flatnonzero", "float32", "float64", "floor", "floor_divide", "fmax", "fmin",
+        "full", "full_like", "greater", "greater_equal", "histogram", "hstack", "identity", "inf",
+        "int32", "int64", "interp", "isclose", "isfinite", "isinf", "isnan", "less", "less_equal",
+        "linalg", "linspace", "log", "log10", "log1p", "log2", "logical_and", "logical_not",
+        "logical_or", "logical_xor", "max", "maximum", "mean", "median", "min", "minimum", "mod",
+        "multiply", "nan", "nan_to_num", "nanargmax", "nanargmin", "nancumprod", "nancumsum",
+        "nanmax", "nanmean", "nanmedian", "nanmin", "nanpercentile", "nanprod", "nanquantile",
+        "nanstd", "nansum", "nanvar", "negative", "newaxis", "nonzero", "not_equal", "ones",
+        "ones_like", "outer", "percentile", "pi", "polyfit", "polyval", "power", "prod", "quantile",
+        "random", "ravel", "reciprocal", "remainder", "repeat", "reshape", "roll", "round", "searchsorted",
+        "select", "sign", "sin", "sinh", "sort", "sqrt", "square", "stack", "std", "subtract", "sum",
+        "take", "tan", "tanh", "tile", "transpose", "tril", "triu", "unique", "var", "vstack", "where",
+        "zeros", "zeros_like"
+    )),
+    "numpy.linalg": frozenset((
+        "cholesky", "det", "eig", "eigh", "eigvals", "eigvalsh", "inv", "lstsq", "matrix_rank",
+        "norm", "pinv", "qr", "slogdet", "solve", "svd"
+    )),
+    "numpy.random": frozenset((
+        "choice", "default_rng", "normal", "permutation", "rand", "randint", "randn", "random",
+        "seed", "shuffle", "standard_normal", "uniform"
+    )),
+    "pandas": frozenset((
+        "DataFrame", "DateOffset", "DatetimeIndex", "Index", "NA", "NaT", "Series", "Timedelta",
+        "Timestamp", "bdate_range", "concat", "cut", "date_range", "factorize", "isna", "isnull",
+        "merge", "notna", "notnull", "qcut", "to_datetime", "to_numeric", "to_timedelta", "unique"
+    ))
+}
+
+OBJECT_ATTRIBUTES = frozenset((
+    # Frames, series and indexes
+    "T", "abs", "add", "agg", "aggregate", "align", "all", "any", "append", "apply", "argmax",
+    "argmin", "argsort", "asfreq", "assign", "astype", "at", "between", "bfill", "clip", "columns",
+    "combine", "copy", "corr", "count", "cov", "cummax", "cummin", "cumprod", "cumsum", "describe",
+    "diff", "difference", "div", "divide", "dot", "drop", "drop_duplicates", "dropna", "dt", "dtype",
+    "dtypes", "duplicated", "empty", "eq", "ewm", "expanding", "ffill", "fillna", "first",
+    "first_valid_index", "floordiv", "ge", "get", "get_loc", "groupby", "gt", "hasnans", "head",
+    "iat", "idxmax", "idxmin", "iloc", "index", "insert", "interpolate", "intersection", "is_monotonic_decreasing",
+    "is_monotonic_increasing", "is_unique", "isin", "isna", "isnull", "items", "iterrows", "itertuples",
+    "join", "keys", "kurt", "last", "last_valid_index", "le", "loc", "lt", "mask", "max", "mean",
+    "median", "merge", "min", "mod", "mul", "multiply", "name", "ndim", "ne", "nlargest", "notna",
+    "notnull", "nsmallest", "nunique", "ohlc", "pct_change", "pop", "pow", "prod", "quantile",
+    "rank", "reindex", "rename", "replace", "resample", "reset_index", "rolling", "round", "searchsorted",
+    "sem", "set_index", "shape", "shift", "size", "skew", "sort_index", "sort_values", "squeeze",
+    "std", "str", "sub", "subtract", "sum", "tail", "to_dict", "to_frame", "to_list", "to_numpy",
+    "to_series", "transform", "truediv", "tz", "tz_convert", "union", "unique", "unstack", "stack",
+    "update", "value_counts", "values", "var", "where",
+    # Dates and times (Timestamp, DatetimeIndex, .dt)
+    "date", "day", "day_of_week", "day_of_year", "dayofweek", "dayofyear", "days", "hour",
+    "is_month_end", "is_month_start", "is_quarter_end", "is_quarter_start", "is_year_end",
+    "is_year_start", "isoformat", "minute", "month", "normalize", "quarter", "second",
+    "total_seconds", "week", "weekday", "year",
+    # Arrays, ufuncs and random generators
+    "accumulate", "clip", "conj", "cumsum", "diagonal", "fill", "flatten", "imag", "item",
+    "nonzero", "outer", "ravel", "real", "reduce", "repeat", "reshape", "sort", "take", "tolist",
+    "trace", "transpose", "binomial", "choice", "exponential", "integers", "lognormal",
+    "multivariate_normal", "normal", "permutation", "poisson", "random", "shuffle",
+    "standard_normal", "standard_t", "uniform",
+    # Builtin containers and strings
+    "clear", "endswith", "extend", "index", "is_integer", "lower", "remove", "reverse",
+    "setdefault", "split", "startswith", "strip", "upper",
+    # Price columns as attributes (df.Close)
+    *PRICE_COLUMNS
+))
+
+# Methods that look up method names given as strings (df.agg("mean"));
+# the names must be OBJECT_ATTRIBUTES too
+DISPATCH_METHODS = ("agg", "aggregate", "apply", "transform")
+
+_KNOWN_ATTRIBUTES = OBJECT_ATTRIBUTES.union(*MODULE_ATTRIBUTES.values())
+
+# System calls a locked-down worker may make, all others fail with EPERM:
+# memory, signals, clocks, limits and the descriptors it already has - no
+# files, sockets, processes or changes of user
+ALLOWED_SYSCALLS = (
+    "read", "write", "readv", "writev", "lseek", "fstat", "close", "poll", "ppoll", "select", "pselect6",
+    "brk", "mmap", "munmap", "mremap", "mprotect", "madvise", "futex", "sched_yield", "getrandom",
+    "rt_sigaction", "rt_sigprocmask", "rt_sigreturn", "sigaltstack", "restart_syscall",
+    "clock_gettime", "clock_getres", "clock_nanosleep", "gettimeofday", "nanosleep",
+    "getrusage", "getrlimit", "setrlimit", "prlimit64",
+    "getpid", "gettid", "getuid", "geteuid", "getgid", "getegid", "exit", "exit_group"
+)
+
+# Functions a job may call: strategy(df) returns target weights that the
+# backtest engine trades, backtest(df) returns its own results
+ENTRY_POINTS = ("strategy", "backtest")
+
+MAX_SOURCE_LENGTH = 100000  # Characters of strategy code
+MAX_REPLY_BYTES = 16 * 2**20  # JSON reply of one job
+STARTUP_TIMEOUT = 60  # Seconds a new worker may take to import and warm up
+RESTART_DELAY = 1.0  # Seconds before retrying a failed worker start, doubled per failure
+MAX_RESTART_DELAY = 60.0
+MAX_PRICE_ROWS = 250000  # Rows of price history per job
+PRICE_SEGMENT_BYTES = (len(PRICE_COLUMNS) + 1) * MAX_PRICE_ROWS * 8  # Each worker's shared memory
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Exercises the pandas / numpy paths strategies use, so lazily imported
+# modules are loaded while the worker can still open files
+WARMUP_SOURCE = '''
+import math
+import numpy as np
+import pandas as pd
+
+def strategy(df):
+    close = df["Close"]
+    trend = close.rolling(20).mean() > close.ewm(span=50).mean()
+    volatility = close.pct_change().rolling(20).std() * math.sqrt(252)
+    return pd.Series(np.where(trend & (volatility < 1), 1.0, 0.0), index=df.index).shift(1)
+
+def backtest(df):
+    returns = df["Close"].pct_change().fillna(0)
+    equity = (1 + returns).cumprod()
+    return {
+        "start": df.index[0], "final": equity.iloc[-1], "drawdown": (equity / equity.cummax() - 1).min(),
+        "equity": equity.tail(5), "summary": df.describe().to_dict()
+    }
+'''
+
+
+class StrategyCodeError(ValueError):
+    """Strategy code was rejected, failed, or returned something unusable"""
+
+
+class StrategyLimitError(StrategyCodeError):
+    """A job ran out of time, CPU or memory (or its worker died)"""
+
+
+class SandboxBusyError(Exception):
+    """No worker became free in time"""
+
+
+# ========== CODE VALIDATION ==========
+
+class _StrategyGuard(ast.NodeTransformer):
+    """
+    Rejects imports, names and attributes that lead out of the sandbox,
+    and rewrites attribute reads into _sandbox_getattr(obj, "name") so
+    they are checked at run time as well
+    """
+    
+    def visit_Import(self, node: ast.Import) -> ast.AST:
+        for alias in node.names:
+            _check_import(alias.name)
+        return node
+    
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> ast.AST:
+        if node.level or not node.module:
+            raise StrategyCodeError("Relative imports are not allowed")
+        _check_import(node.module)
+        for alias in node.names:
+            if alias.name not in MODULE_ATTRIBUTES[node.module]:
+                raise StrategyCodeError(f"Importing '{alias.name}' from {node.module} is not allowed")
+        return node
+    
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        if node.id.startswith("__") or node.id.startswith("_sandbox"):
+            raise StrategyCodeError(f"Name '{node.id}' is not allowed")
+        return node
+    
+    def visit_Attribute(self, node: ast.Attribute) -> ast.AST:
+        if node.attr not in _KNOWN_ATTRIBUTES:
+            raise StrategyCodeError(f"Attribute '{node.attr}' is not allowed")
+        if not isinstance(node.ctx, ast.Load):
+            raise StrategyCodeError(f"Assigning or deleting attributes ('{node.attr}') is not allowed")
+        
+        call = ast.Call(
+            func=ast.Name("_sandbox_getattr", ast.Load()),
+            args=[self.visit(node.value), ast.Constant(node.attr)],
+            keywords=[]
+        )
+        return ast.copy_location(call, node)
+    
+    def visit_ClassDef(self, node: ast.ClassDef) -> ast.AST:
+        raise StrategyCodeError("Class definitions are not supported, use functions")
+    
+    def visit_MatchClass(self, node: ast.AST) -> ast.AST:
+        raise StrategyCodeError("Class patterns are not allowed")
+
+
+def _allowed_module(name: str) -> bool:
+    return name in ALLOWED_MODULES
+
+
+def _check_import(name: str):
+    if not _allowed_module(name):
+        raise StrategyCodeError(f"Module '{name}' is not allowed, expected one of {ALLOWED_MODULES}")
+
+
+def compile_strategy(source: str) -> bytes:
+    """
+    Validate and compile strategy code
+    
+    Args:
+        source: Python module source defining strategy(df) and/or backtest(df)
+    
+    Returns:
+        Marshalled code object, ready to send to a worker
+    
+    Raises:
+        StrategyCodeError: Syntax errors or disallowed constructs
+    """
+    
+    if len(source) > MAX_SOURCE_LENGTH:
+        raise StrategyCodeError(f"Strategy code is limited to {MAX_SOURCE_LENGTH} characters")
+    
+    try:
+        tree = ast.parse(source, filename="<strategy>")
+        tree = ast.fix_missing_locations(_StrategyGuard().visit(tree))
+        code = compile(tree, "<strategy>", "exec")
+    except SyntaxError as e:
+        raise StrategyCodeError(f"Syntax error on line {e.lineno}: {e.msg}")
+    except (RecursionError, MemoryError):
+        raise StrategyCodeError("Strategy code is nested too deeply")
+    
+    return marshal.dumps(code)
+
+
+# ========== WORKER PROCESS ==========
+# Runs as `python -m services.sandbox <fd> <segment fd> <memory_mb> <user>`:
+# a fresh interpreter with a minimal environment, so no server state or
+# secrets are inherited. Jobs arrive as pickles from the (trusted) server;
+# replies go back as JSON, so a compromised worker can't run code in the
+# server.
+
+# libseccomp constants (seccomp.h)
+SCMP_ACT_ALLOW = 0x7FFF0000
+SCMP_ACT_ERRNO = 0x00050000
+SCMP_CMP_EQ = 4
+
+
+class _ArgCompare(ctypes.Structure):
+    """struct scmp_arg_cmp"""
+    _fields_ = [
+        ("arg", ctypes.c_uint), ("op", ctypes.c_int),
+        ("datum_a", ctypes.c_uint64), ("datum_b", ctypes.c_uint64)
+    ]
+
+
+def _checked(value: Any, name: str) -> Any:
+    """Refuse values that lead to other modules or interpreter internals"""
+    if isinstance(value, types.ModuleType) and not _allowed_module(getattr(value, "__name__", "")):
+        raise StrategyCodeError(f"Access to '{name}' is not allowed")
+    if isinstance(value, (types.FrameType, types.CodeType, types.TracebackType)):
+        raise StrategyCodeError(f"Access to '{name}' is not allowed")
+    return value
+
+
+def _sandbox_getattr(obj: Any, name: str) -> Any:
+    if isinstance(obj, types.ModuleType):
+        allowed = MODULE_ATTRIBUTES.get(obj.__name__, ())
+    else:
+        allowed = OBJECT_ATTRIBUTES
+    if name not in allowed:
+        raise StrategyCodeError(f"Attribute '{name}' is not allowed")
+    
+    value = _checked(getattr(obj, name), name)
+    if name in DISPATCH_METHODS and callable(value):
+        return _checked_dispatch(value, name)
+    return value
+
+
+def _check_method_names(func: Any, name: str):
+    """Refuse method names (in lists / dict values too) that aren't OBJECT_ATTRIBUTES"""
+    if isinstance(func, str):
+        if func not in OBJECT_ATTRIBUTES:
+            raise StrategyCodeError(f"{name}('{func}') is not allowed")
+    elif isinstance(func, (list, tuple)):
+        for item in func:
+            _check_method_names(item, name)
+    elif isinstance(func, dict):
+        for item in func.values():
+            _check_method_names(item, name)
+
+
+def _checked_dispatch(method: Callable, name: str) -> Callable:
+    """Wrap a DISPATCH_METHODS method so it only looks up allowed names"""
+    
+    def dispatch(*args, **kwargs):
+        # Any position (unbound calls pass the object first), the func
+        # keyword and named aggregations like total=("Close", "sum")
+        _check_method_names(args, name)
+        _check_method_names(kwargs.get("func"), name)
+        for value in kwargs.values():
+            if isinstance(value, tuple):
+                _check_method_names(value[1:], name)
+        return method(*args, **kwargs)
+    
+    return dispatch
+
+
+def _sandbox_import(name: str, globals=None, locals=None, fromlist=(), level=0):
+    if level or not _allowed_module(name):
+        raise ImportError(f"Module '{name}' is not allowed")
+    module = __import__(name, globals, locals, fromlist, level)
+    for item in fromlist or ():
+        if item not in MODULE_ATTRIBUTES[name]:
+            raise ImportError(f"Importing '{item}' from {name} is not allowed")
+    return module
+
+
+def _sandbox_builtins() -> Dict:
+    import builtins
+    names = {name: getattr(builtins, name) for name in SAFE_BUILTINS}
+    names["__import__"] = _sandbox_import
+    return names
+
+
+def _cpu_exceeded(signum, frame):
+    raise StrategyLimitError("Strategy exceeded its CPU time limit")
+
+
+def _limit_cpu(seconds: Optional[float]):
+    """Soft CPU limit `seconds` from now (SIGXCPU), or none"""
+    hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+    soft = hard
+    if seconds is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = math.ceil(usage.ru_utime + usage.ru_stime + seconds)
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _load_syscall_filter(libseccomp: ctypes.CDLL):
+    """Install a seccomp filter allowing only ALLOWED_SYSCALLS"""
+    
+    libseccomp.seccomp_init.restype = ctypes.c_void_p
+    libseccomp.seccomp_init.argtypes = (ctypes.c_uint32,)
+    libseccomp.seccomp_syscall_resolve_name.argtypes = (ctypes.c_char_p,)
+    libseccomp.seccomp_rule_add_array.argtypes = (
+        ctypes.c_void_p, ctypes.c_uint32, ctypes.c_int, ctypes.c_uint, ctypes.POINTER(_ArgCompare)
+    )
+    libseccomp.seccomp_load.argtypes = (ctypes.c_void_p,)
+    libseccomp.seccomp_release.argtypes = (ctypes.c_void_p,)
+    
+    context = libseccomp.seccomp_init(SCMP_ACT_ERRNO | errno.EPERM)
+    if not context:
+        raise OSError("seccomp_init failed")
+    try:
+        for name in ALLOWED_SYSCALLS:
+            number = libseccomp.seccomp_syscall_resolve_name(name.encode())
+            if number < 0:
+                continue  # Not a system call on this architecture
+            # prlimit64 only for this process (pid 0)
+            conditions = (_ArgCompare * 1)(_ArgCompare(0, SCMP_CMP_EQ, 0, 0)) if name == "prlimit64" else None
+            result = libseccomp.seccomp_rule_add_array(context, SCMP_ACT_ALLOW, number, 1 if conditions else 0, conditions)
+            if result < 0:
+                raise OSError(-result, f"Can't allow system call {name}")
+        
+        # Also sets no_new_privs, so the filter can't be shed by exec
+        result = libseccomp.seccomp_load(context)
+        if result < 0:
+            raise OSError(-result, "seccomp_load failed")
+    finally:
+        libseccomp.seccomp_release(context)
+
+
+def _lock_down(memory_mb: int, user: str):
+    """
+    Permanent confinement of a warm worker
+    
+    - Root switches to `user` (without supplementary groups), which
+      can't raise limits or undo the filter below
+    - Hard limits: the address space may grow `memory_mb` beyond the warm
+      baseline (MemoryError past it); no file descriptors can be opened,
+      no files written, no processes started and no core dumps made
+    - A seccomp filter makes every system call outside ALLOWED_SYSCALLS
+      fail, whatever a job manages to call
+    
+    Raises OSError if any step fails (e.g. libseccomp is missing): the
+    worker then never runs jobs.
+    """
+    
+    with open("/proc/self/statm") as f:
+        baseline = int(f.read().split()[0]) * mmap.PAGESIZE
+    libseccomp = ctypes.CDLL("libseccomp.so.2")
+    
+    if os.geteuid() == 0:
+        account = pwd.getpwnam(user)
+        if account.pw_uid == 0:
+            raise OSError(f"Strategy workers can't run as {user}")
+        os.setgroups([])
+        os.setgid(account.pw_gid)
+        os.setuid(account.pw_uid)
+    
+    limits = {
+        resource.RLIMIT_AS: baseline + memory_mb * 2**20,
+        resource.RLIMIT_NOFILE: 0,
+        resource.RLIMIT_FSIZE: 0,
+        resource.RLIMIT_NPROC: 0,
+        resource.RLIMIT_CORE: 0
+    }
+    for limit, value in limits.items():
+        hard = resource.getrlimit(limit)[1]
+        if hard != resource.RLIM_INFINITY:
+            value = min(value, hard)
+        resource.setrlimit(limit, (value, value))
+    
+    _load_syscall_filter(libseccomp)
+
+
+def _load_time_zones() -> List[zoneinfo.ZoneInfo]:
+    """
+    Every time zone, loaded while files can still be opened
+    
+    While these stay referenced, lookups by name (tz="Asia/Tokyo") are
+    served from zoneinfo's cache, for its C and pure Python classes alike
+    (pandas uses both).
+    """
+    from zoneinfo import _zoneinfo
+    names = zoneinfo.available_timezones()
+    return [cls(name) for cls in (zoneinfo.ZoneInfo, _zoneinfo.ZoneInfo) for name in names]
+
+
+def _read_prices(job: Dict, segment: mmap.mmap) -> pd.DataFrame:
+    """Copy the job's prices out of the worker's shared memory into a DataFrame"""
+    rows = job["rows"]
+    
+    # Copies, so the job can modify its frame and the segment can take the next job
+    block = np.frombuffer(segment, dtype=np.float64, count=len(PRICE_COLUMNS) * rows).reshape(len(PRICE_COLUMNS), rows).copy()
+    index = np.frombuffer(segment, dtype=np.int64, count=rows, offset=block.nbytes).copy()
+    
+    if job["tz"] is not None:
+        index = pd.to_datetime(index, unit="ns", utc=True).tz_convert(job["tz"])
+    elif job["datetime"]:
+        index = pd.to_datetime(index, unit="ns")
+    return pd.DataFrame(dict(zip(PRICE_COLUMNS, block)), index=index)
+
+
+def _to_json(value: Any, depth: int = 0) -> Any:
+    """JSON-friendly copy of a backtest result (NaN / inf become None)"""
+    
+    if depth > 8:
+        raise StrategyCodeError("backtest() returned a result nested too deeply")
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating, np.bool_)):
+        value = value.item() if isinstance(value, np.generic) else value
+        return value if not isinstance(value, float) or math.isfinite(value) else None
+    if isinstance(value, (pd.Timestamp, pd.Timedelta)):
+        return value.isoformat()
+    if isinstance(value, pd.DataFrame):
+        return {str(column): _to_json(value[column], depth + 1) for column in value.columns}
+    if isinstance(value, (pd.Series, pd.Index, np.ndarray)):
+        return [_to_json(item, depth + 1) for item in value.tolist()]
+    if isinstance(value, dict):
+        return {str(key): _to_json(item, depth + 1) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item, depth + 1) for item in value]
+    raise StrategyCodeError(f"backtest() returned an unsupported {type(value).__name__}")
+
+
+def _trade_signals(signals: Any, df: pd.DataFrame, initial_capital: float, cost: float) -> Dict:
+    """Backtest strategy(df)'s target weights with the shared engine"""
+    
+    if isinstance(signals, pd.Series):
+        signals = signals.reindex(df.index)
+    try:
+        targets = np.asarray(signals, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise StrategyCodeError("strategy() must return numeric signals (1 = long, 0 = cash, -1 = short)")
+    if targets.shape != (len(df),):
+        raise StrategyCodeError(f"strategy() returned {targets.shape} signals for {len(df)} days")
+    if np.isinf(targets).any():
+        raise StrategyCodeError("strategy() returned infinite signals")
+    
+    close = df["Close"].to_numpy(dtype=np.float64)[:, None]
+    result = run_targets(close, targets[:, None], cost, initial_capital)
+    metrics = performance_metrics(result["equity"], result["weights"], result["turnover"], initial_capital)
+    return {name: _to_json(values[0]) for name, values in metrics.items()}
+
+
+def _execute(code: bytes, entry: str, df: pd.DataFrame, builtins: Dict, job: Dict) -> Any:
+    """Run one job's code in a fresh namespace"""
+    
+    namespace = {"__builtins__": builtins, "__name__": "strategy", "_sandbox_getattr": _sandbox_getattr}
+    exec(marshal.loads(code), namespace)
+    
+    function = namespace.get(entry)
+    if not callable(function):
+        raise StrategyCodeError(f"Strategy code must define {entry}(df)")
+    
+    if entry == "strategy":
+        return _trade_signals(function(df), df, job["initial_capital"], job["cost"])
+    return _to_json(function(df))
+
+
+def _warm_up(builtins: Dict):
+    """Run WARMUP_SOURCE once through both entry points"""
+    index = pd.bdate_range("2020-01-01", periods=300, tz="America/New_York")
+    close = 100 * np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.01, len(index))))
+    df = pd.DataFrame({column: close for column in PRICE_COLUMNS}, index=index)
+    
+    code = compile_strategy(WARMUP_SOURCE)
+    job = {"initial_capital": 10000.0, "cost": 0.0005}
+    for entry in ENTRY_POINTS:
+        json.dumps(_execute(code, entry, df, builtins, job))
+
+
+def _serve(fd: int, segment_fd: int, memory_mb: int, user: str):
+    """Worker main loop: warm up, lock down, then run jobs until the pipe closes"""
+    
+    conn = Connection(fd)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The server handles Ctrl+C
+    signal.signal(signal.SIGXCPU, _cpu_exceeded)
+    signal.signal(signal.SIGXFSZ, signal.SIG_IGN)  # Writes fail with EFBIG instead
+    
+    builtins = _sandbox_builtins()
+    _warm_up(builtins)
+    segment = mmap.mmap(segment_fd, PRICE_SEGMENT_BYTES, prot=mmap.PROT_READ)
+    os.close(segment_fd)
+    zones = _load_time_zones()  # Referenced for the worker's lifetime
+    _lock_down(memory_mb, user)
+    conn.send_bytes(b'{"ok": true}')
+    
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        
+        df = None
+        try:
+            df = _read_prices(job, segment)
+            _limit_cpu(job["cpu_seconds"])
+            try:
+                reply = {"ok": True, "result": _execute(job["code"], job["entry"], df, builtins, job)}
+            finally:
+                _limit_cpu(None)
+        except StrategyLimitError as e:
+            reply = {"ok": False, "limit": True, "error": str(e)}
+        except MemoryError:
+            reply = {"ok": False, "limit": True, "error": "Strategy exceeded its memory limit"}
+        except Exception as e:
+            reply = {"ok": False, "limit": False, "error": f"{type(e).__name__}: {e}"[:1000]}
+        
+        del df
+        conn.send_bytes(json.dumps(reply, allow_nan=False).encode())
+
+
+# ========== POOL ==========
+
+def _check_prices(df: pd.DataFrame):
+    if "Close" not in df:
+        raise ValueError("Price history needs a Close column")
+    if len(df) < 2:
+        raise ValueError("Price history needs at least two rows")
+    if len(df) > MAX_PRICE_ROWS:
+        raise ValueError(f"Price history is limited to {MAX_PRICE_ROWS} rows")
+
+
+def _write_prices(df: pd.DataFrame, segment: mmap.mmap) -> Dict:
+    """
+    Put a price history into a worker's shared memory
+    
+    Layout: float64 rows of PRICE_COLUMNS, then the int64 nanosecond
+    index. Returns the job fields describing it.
+    """
+    
+    rows = len(df)
+    block = np.ndarray((len(PRICE_COLUMNS), rows), dtype=np.float64, buffer=segment)
+    for i, column in enumerate(PRICE_COLUMNS):
+        block[i] = df[column].to_numpy(dtype=np.float64) if column in df else np.nan
+    
+    index = np.ndarray(rows, dtype=np.int64, buffer=segment, offset=block.nbytes)
+    is_datetime = isinstance(df.index, pd.DatetimeIndex)
+    index[:] = df.index.as_unit("ns").asi8 if is_datetime else np.arange(rows)
+    del block, index  # Release the buffer so the segment can be closed
+    
+    return {
+        "rows": rows,
+        "datetime": is_datetime,
+        "tz": str(df.index.tz) if is_datetime and df.index.tz is not None else None
+    }
+
+
+def _worker_environment() -> Dict[str, str]:
+    """Minimal environment for workers: no secrets, single-threaded math"""
+    env = {"OMP_NUM_THREADS": "1", "OPENBLAS_NUM_THREADS": "1", "MKL_NUM_THREADS": "1"}
+    for name in ("PATH", "PYTHONPATH", "LANG"):
+        if name in os.environ:
+            env[name] = os.environ[name]
+    return env
+
+
+class _Worker:
+    """A worker process, the server's end of its pipe and shared memory, and its job count"""
+    
+    def __init__(self, process: subprocess.Popen, conn: Connection, segment: mmap.mmap):
+        self.process = process
+        self.conn = conn
+        self.segment = segment
+        self.jobs = 0
+    
+    def stop(self):
+        self.process.kill()
+        self.process.wait()
+        self.conn.close()
+        self.segment.close()
+
+
+class StrategySandbox:
+    """
+    Runs user strategy code in a pool of warm worker processes
+    
+    - Workers are fresh interpreters that import numpy / pandas and run a
+      warm-up strategy once, then lock themselves down for good (see
+      _lock_down): an unprivileged user, hard limits and a seccomp
+      filter; a job only pays for a pipe round trip, exec of the cached
+      code object and the strategy itself
+    - Code is validated and compiled once per source hash (LRU cache);
+      imports and attributes outside the allowlists are rejected, and
+      attribute reads are checked at run time
+    - Prices pass through shared memory each worker maps at startup
+      instead of being pickled through the pipe
+    - Each job gets `timeout` seconds of wall time (the worker is killed
+      past it) and `cpu_seconds` of CPU; workers are replaced after a
+      limit is hit and after `max_jobs` jobs
+    - The pool is kept at `num_workers`: a worker that fails to start is
+      retried with exponential backoff, and stats() reports live workers
+    
+    The Python-level checks are defence in depth; the hard boundary is
+    the worker process, its user, OS limits and system call filter.
+    Workers need Linux and libseccomp; where either is missing they fail
+    to start and jobs are refused as busy.
+    """
+    
+    def __init__(
+        self,
+        num_workers: int = 2,
+        timeout: float = 10.0,
+        cpu_seconds: float = 5.0,
+        memory_mb: int = 512,
+        max_jobs: int = 500,
+        cost_bps: float = 5.0,
+        initial_capital: float = 10000.0,
+        acquire_timeout: float = 5.0,
+        user: str = "nobody"
+    ):
+        """
+        Args:
+            num_workers: Number of warm worker processes
+            timeout: Wall-clock seconds per job
+            cpu_seconds: CPU seconds per job
+            memory_mb: Memory a job may allocate beyond the warm worker's baseline
+            max_jobs: Jobs per worker before it is replaced
+            cost_bps: Transaction cost for strategy(df) signals, in basis points
+            initial_capital: Starting equity of every backtest
+            acquire_timeout: Seconds to wait for a free worker
+            user: Unprivileged account workers switch to when the server runs as root
+        """
+        self.num_workers = num_workers
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.max_jobs = max_jobs
+        self.cost_bps = cost_bps
+        self.initial_capital = initial_capital
+        self.acquire_timeout = acquire_timeout
+        self.user = user
+        
+        self._compiled = LRUCache(max_size=256)  # sha256 of source -> marshalled code
+        self._idle = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._live = 0  # Warm workers, idle or busy
+        self._starting = 0
+        self.start_failures = 0
+        
+        # Start in the background: importing pandas takes a while
+        for _ in range(num_workers):
+            self._replace()
+    
+    def compile(self, source: str) -> bytes:
+        """Validated, marshalled code for a source, cached by its hash"""
+        digest = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        code = self._compiled.get(digest)
+        if code is None:
+            code = compile_strategy(source)
+            self._compiled.set(digest, code)
+        return code
+    
+    def run(self, source: str, df: pd.DataFrame, entry: str = "strategy") -> Dict:
+        """
+        Run strategy code on a price history
+        
+        Args:
+            source: Python source defining strategy(df) and/or backtest(df);
+                df has Open, High, Low, Close and Volume columns
+            df: Price history (e.g. from MarketDataService)
+            entry: "strategy" backtests the target weights strategy(df)
+                returns (1 = long, 0 = cash, -1 = short, NaN = no trade)
+                with the shared engine and returns its metrics; "backtest"
+                returns backtest(df)'s own result, converted to JSON types
+        
+        Returns:
+            Metrics or backtest(df) result
+        
+        Raises:
+            StrategyCodeError: Rejected code, or an error in it
+            StrategyLimitError: The job hit its time, CPU or memory limit
+            SandboxBusyError: No worker became free within acquire_timeout
+        """
+        
+        if entry not in ENTRY_POINTS:
+            raise ValueError(f"Unknown entry '{entry}', expected one of {ENTRY_POINTS}")
+        code = self.compile(source)
+        _check_prices(df)
+        
+        job = {
+            "code": code,
+            "entry": entry,
+            "cpu_seconds": self.cpu_seconds,
+            "initial_capital": self.initial_capital,
+            "cost": self.cost_bps / 10000
+        }
+        reply = self._submit(job, df)
+        
+        if not reply["ok"]:
+            error = StrategyLimitError if reply["limit"] else StrategyCodeError
+            raise error(reply["error"])
+        return reply["result"]
+    
+    def stats(self) -> Dict:
+        """Worker counts; `workers` below `target` means starts are failing"""
+        with self._lock:
+            return {
+                "target": self.num_workers,
+                "workers": self._live,
+                "idle": self._idle.qsize(),
+                "starting": self._starting,
+                "start_failures": self.start_failures
+            }
+    
+    def close(self):
+        """Stop all idle workers (busy ones stop when their job returns)"""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                return
+            with self._lock:
+                self._live -= 1
+    
+    def _submit(self, job: Dict, df: pd.DataFrame) -> Dict:
+        """Run a job on an idle worker, replacing the worker if it fails"""
+        
+        try:
+            worker = self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise SandboxBusyError("All strategy workers are busy, try again shortly")
+        
+        reply = None
+        try:
+            job.update(_write_prices(df, worker.segment))
+            worker.conn.send(job)
+            if worker.conn.poll(self.timeout):
+                reply = json.loads(worker.conn.recv_bytes(MAX_REPLY_BYTES))
+        except (OSError, EOFError, ValueError) as e:
+            print(f"Strategy worker failed: {e}")
+        
+        if reply is None or reply.get("limit") or worker.jobs + 1 >= self.max_jobs:
+            worker.stop()
+            with self._lock:
+                self._live -= 1
+            self._replace()
+        else:
+            worker.jobs += 1
+            self._idle.put(worker)
+        
+        if reply is None:
+            raise StrategyLimitError(
+                f"Strategy didn't finish within {self.timeout:g} seconds or exceeded its memory limit"
+            )
+        return reply
+    
+    def _replace(self):
+        """Start a worker in the background; it joins the idle queue once warm"""
+        if not self._closed:
+            with self._lock:
+                self._starting += 1
+            threading.Thread(target=self._start_worker, name="sandbox-start", daemon=True).start()
+    
+    def _start_worker(self):
+        """Start thread: retry with backoff until a worker is warm or the pool closes"""
+        delay = RESTART_DELAY
+        worker = None
+        while not self._closed:
+            try:
+                worker = self._spawn()
+            except OSError as e:
+                print(f"Strategy worker failed to start: {e}")
+            if worker is not None:
+                break
+            with self._lock:
+                self.start_failures += 1
+            time.sleep(delay)
+            delay = min(delay * 2, MAX_RESTART_DELAY)
+        
+        with self._lock:
+            self._starting -= 1
+            if worker is not None and not self._closed:
+                self._live += 1
+                self._idle.put(worker)
+                return
+        if worker is not None:
+            worker.stop()
+    
+    def _spawn(self) -> Optional[_Worker]:
+        """Start one worker process and wait until it is warm; None if it fails"""
+        conn, child = Pipe()
+        segment_fd = os.memfd_create("strategy-prices")
+        try:
+            os.ftruncate(segment_fd, PRICE_SEGMENT_BYTES)  # Sparse: pages appear as prices are written
+            segment = mmap.mmap(segment_fd, PRICE_SEGMENT_BYTES)
+            process = subprocess.Popen(
+                [
+                    sys.executable, "-m", "services.sandbox",
+                    str(child.fileno()), str(segment_fd), str(self.memory_mb), self.user
+                ],
+                cwd=BACKEND_DIR,
+                env=_worker_environment(),
+                pass_fds=(child.fileno(), segment_fd),
+                stdin=subprocess.DEVNULL
+            )
+        finally:
+            os.close(segment_fd)
+            child.close()
+        worker = _Worker(process, conn, segment)
+        
+        try:
+            ready = conn.poll(STARTUP_TIMEOUT) and json.loads(conn.recv_bytes(MAX_REPLY_BYTES))["ok"]
+        except (OSError, EOFError, ValueError):
+            ready = False
+        
+        if not ready:
+            print("Strategy worker failed to start")
+            worker.stop()
+            return None
+        return worker
+
+
+if __name__ == "__main__":
+    _serve(int(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3]), sys.argv[4])
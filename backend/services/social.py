@@ -0,0 +1,190 @@
+"""
+Social Feed
+Keyset-paginated reads of the post feed and the strategy explorer
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime, tuple_
+from sqlalchemy.orm import joinedload, load_only
+
+from models import Post, Strategy, User
+
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Explorer orderings: sort name -> column, descending with ties broken by
+# id; each has a composite (column, id) index (see models.py)
+EXPLORER_SORTS = {
+    "roi": Strategy.roi,
+    "recent": Strategy.created_at
+}
+
+
+def encode_cursor(value: Any, row_id: int) -> str:
+    """Opaque, URL-safe cursor for the position after a row"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, parse: Callable[[Any], Any]) -> Tuple[Any, int]:
+    """
+    Sort value and id of a cursor from encode_cursor
+    
+    Raises:
+        ValueError: Malformed cursor
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, row_id = json.loads(raw)
+        return parse(value), int(row_id)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+
+def page_size(limit: Optional[Any]) -> int:
+    """Validated page size (default DEFAULT_PAGE_SIZE)"""
+    limit = int(limit) if limit else DEFAULT_PAGE_SIZE
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return limit
+
+
+def _parse_value(column) -> Callable[[Any], Any]:
+    """Parser of a cursor's sort value for a column"""
+    return datetime.fromisoformat if isinstance(column.type, DateTime) else float
+
+
+def _keyset_page(query, column, id_column, limit: int, cursor: Optional[str]) -> Tuple[List, Optional[str]]:
+    """
+    One page of `query` ordered by (column, id) descending
+    
+    Seeks past the cursor with a row-value comparison, which the composite
+    (column, id) index answers directly, so every page costs the same no
+    matter how deep it is - unlike OFFSET, which reads and discards all
+    earlier rows. One extra row tells whether a next page exists.
+    
+    The column must not be NULL, as row values never compare to NULL:
+    roi is NOT NULL and upgrade() backfills created_at (see database.py).
+    """
+    
+    if cursor:
+        value, last_id = decode_cursor(cursor, _parse_value(column))
+        query = query.filter(tuple_(column, id_column) < tuple_(value, last_id))
+    
+    rows = query.order_by(column.desc(), id_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    
+    last = rows[limit - 1]
+    return rows[:limit], encode_cursor(getattr(last, column.key), last.id)
+
+
+def _author(user: User) -> Dict:
+    return {"id": user.id, "username": user.username}
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def serialize_strategy(strategy: Strategy, summary: bool = False) -> Dict:
+    """JSON form of a strategy (summary: just what a feed card shows)"""
+    data = {
+        "id": strategy.id,
+        "name": strategy.name,
+        "ticker": strategy.ticker,
+        "roi": strategy.roi,
+        "win_rate": strategy.win_rate,
+        "timeframe": strategy.timeframe
+    }
+    if not summary:
+        data.update(
+            strategy_type=strategy.strategy_type,
+            sharpe_ratio=strategy.sharpe_ratio,
+            description=strategy.description,
+            likes=strategy.likes or 0,
+            created_at=_timestamp(strategy.created_at),
+            author=_author(strategy.author)
+        )
+    return data
+
+
+def serialize_post(post: Post) -> Dict:
+    """JSON form of a feed post, with its author and strategy summary"""
+    return {
+        "id": post.id,
+        "content": post.content,
+        "likes": post.likes or 0,
+        "created_at": _timestamp(post.created_at),
+        "author": _author(post.author),
+        "strategy": serialize_strategy(post.strategy, summary=True) if post.strategy else None
+    }
+
+
+def strategy_query():
+    """
+    Strategies with what serialize_strategy() needs: authors joined in,
+    and without the code column, which can be large and isn't shown when
+    browsing
+    """
+    return Strategy.query.options(
+        load_only(
+            Strategy.id, Strategy.name, Strategy.ticker, Strategy.strategy_type, Strategy.roi,
+            Strategy.win_rate, Strategy.sharpe_ratio, Strategy.timeframe, Strategy.description,
+            Strategy.likes, Strategy.created_at
+        ),
+        joinedload(Strategy.author, innerjoin=True).load_only(User.id, User.username)
+    )
+
+
+def feed_page(limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Dict:
+    """
+    Newest posts first
+    
+    Authors and attached strategies are joined into the same query
+    (many-to-one, so the LIMIT still counts posts) instead of being
+    lazy-loaded per post.
+    
+    Returns:
+        Dictionary with "items" and "next_cursor" (None on the last page)
+    """
+    
+    query = Post.query.options(
+        joinedload(Post.author, innerjoin=True).load_only(User.id, User.username),
+        joinedload(Post.strategy).load_only(
+            Strategy.id, Strategy.name, Strategy.ticker, Strategy.roi, Strategy.win_rate, Strategy.timeframe
+        )
+    )
+    posts, next_cursor = _keyset_page(query, Post.created_at, Post.id, limit, cursor)
+    return {"items": [serialize_post(post) for post in posts], "next_cursor": next_cursor}
+
+
+def explore_page(sort: str = "roi", limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Dict:
+    """
+    Strategies, best ROI or newest first
+    
+    Args:
+        sort: One of EXPLORER_SORTS
+        limit: Page size
+        cursor: next_cursor of the previous page (with the same sort)
+    
+    Returns:
+        Dictionary with "items", "sort" and "next_cursor"
+    """
+    
+    if sort not in EXPLORER_SORTS:
+        raise ValueError(f"Unknown sort '{sort}', expected one of {tuple(EXPLORER_SORTS)}")
+    
+    strategies, next_cursor = _keyset_page(strategy_query(), EXPLORER_SORTS[sort], Strategy.id, limit, cursor)
+    return {
+        "items": [serialize_strategy(strategy) for strategy in strategies],
+        "sort": sort,
+        "next_cursor": next_cursor
+    }
@@ -0,0 +1,245 @@
+"""
+Synthetic Market Data
+Fast, reproducible OHLCV series for fallbacks, fixtures and benchmarks
+"""
+
+import zlib
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from services.cache import LRUCache
+from services.price_fetcher import PriceFetcher
+
+
+VOLATILITY_MODELS = ("constant", "garch", "regime")
+
+# Starting price, daily drift and daily volatility by kind of ticker
+CRYPTO_TICKERS = ("BTC-USD", "BTCUSD", "BTC")
+TECH_TICKERS = ("AAPL", "MSFT", "GOOGL", "TSLA", "AMZN")
+ETF_TICKERS = ("SPY", "QQQ", "VOO", "VTI")
+
+
+def ticker_profile(ticker: str) -> Dict[str, float]:
+    """Starting price, drift and volatility used for a ticker"""
+    ticker = ticker.upper()
+    if ticker in CRYPTO_TICKERS:
+        return {"initial_price": 30000.0, "mu": 0.0005, "sigma": 0.03}  # Higher growth and volatility
+    if ticker in TECH_TICKERS:
+        return {"initial_price": 150.0, "mu": 0.0004, "sigma": 0.02}
+    if ticker in ETF_TICKERS:
+        return {"initial_price": 400.0, "mu": 0.0003, "sigma": 0.015}
+    return {"initial_price": 100.0, "mu": 0.0003, "sigma": 0.018}
+
+
+def ticker_seed(ticker: str, seed: int = 0) -> int:
+    """Deterministic per-ticker seed (stable across processes, unlike hash())"""
+    return zlib.crc32(ticker.upper().encode("utf-8")) ^ (seed & 0xFFFFFFFF)
+
+
+def business_days(start: pd.Timestamp, end: pd.Timestamp) -> pd.DatetimeIndex:
+    """Weekdays from start to end inclusive (pd.bdate_range loops in Python per date)"""
+    days = np.arange(start.to_datetime64().astype("datetime64[D]"),
+                     end.to_datetime64().astype("datetime64[D]") + 1)
+    return pd.DatetimeIndex(days[np.is_busday(days)].astype("datetime64[ns]"))
+
+
+class SyntheticMarketData:
+    """
+    Generator of realistic-looking daily OHLCV data
+    
+    Every series is a function of (ticker, dates, seed, volatility model):
+    the generator is seeded from the ticker, so the same request always
+    returns the same data, in any process. Everything is vectorized, and
+    generated frames are memoized in an LRU cache (callers get copies).
+    
+    Volatility models:
+        constant: GBM-style returns with the ticker's volatility
+        garch: GARCH(1, 1) volatility clustering around the same
+            long-run volatility
+        regime: Markov switching between a calm and a turbulent regime
+    """
+    
+    def __init__(
+        self,
+        volatility: str = "constant",
+        seed: int = 0,
+        cache_size: int = 64,
+        garch_params: tuple = (0.08, 0.9),
+        regime_params: tuple = (0.6, 2.0, 1 / 60, 1 / 15)
+    ):
+        """
+        Args:
+            volatility: Default model, one of VOLATILITY_MODELS
+            seed: Global seed mixed into every ticker's seed
+            cache_size: Number of generated frames kept (0 disables)
+            garch_params: (alpha, beta) of the GARCH(1, 1) model
+            regime_params: (calm volatility multiplier, turbulent
+                multiplier, daily probability of turning turbulent,
+                daily probability of calming down)
+        """
+        if volatility not in VOLATILITY_MODELS:
+            raise ValueError(f"Unknown volatility model '{volatility}', expected one of {VOLATILITY_MODELS}")
+        
+        self.volatility = volatility
+        self.seed = seed
+        self.garch_params = garch_params
+        self.regime_params = regime_params
+        self._cache = LRUCache(max_size=cache_size)
+    
+    def generate(
+        self,
+        ticker: str,
+        years: float = 5,
+        end_date: Optional[datetime] = None,
+        start_date: Optional[datetime] = None,
+        volatility: Optional[str] = None,
+        seed: Optional[int] = None
+    ) -> pd.DataFrame:
+        """
+        Daily OHLCV bars with Returns and Log_Returns
+        
+        Args:
+            ticker: Ticker symbol (picks the price profile and the seed)
+            years: Lookback, used when start_date is not given
+            end_date: Last day (default: today)
+            start_date: First day (default: end_date - years * 365 days)
+            volatility: Override the default volatility model
+            seed: Override the global seed
+        
+        Returns:
+            DataFrame indexed by business day (the first day is dropped,
+            as it has no return)
+        """
+        
+        volatility = volatility or self.volatility
+        if volatility not in VOLATILITY_MODELS:
+            raise ValueError(f"Unknown volatility model '{volatility}', expected one of {VOLATILITY_MODELS}")
+        
+        end = pd.Timestamp(end_date if end_date is not None else datetime.now()).normalize()
+        if start_date is not None:
+            start = pd.Timestamp(start_date).normalize()
+        else:
+            start = end - pd.Timedelta(days=int(years * 365))
+        
+        seed = ticker_seed(ticker, self.seed if seed is None else seed)
+        key = (ticker.upper(), start, end, volatility, seed)
+        df = self._cache.get(key)
+        if df is None:
+            df = self._build(ticker, business_days(start, end), volatility, seed)
+            self._cache.set(key, df)
+        
+        return df.copy()
+    
+    def generate_many(self, tickers: List[str], **kwargs) -> Dict[str, pd.DataFrame]:
+        """generate() for several tickers"""
+        return {ticker: self.generate(ticker, **kwargs) for ticker in tickers}
+    
+    def _build(self, ticker: str, dates: pd.DatetimeIndex, volatility: str, seed: int) -> pd.DataFrame:
+        """Generate the frame for a calendar"""
+        
+        rng = np.random.default_rng(seed)
+        profile = ticker_profile(ticker)
+        mu, sigma = profile["mu"], profile["sigma"]
+        num_points = len(dates)
+        
+        # Daily volatility of every day under the chosen model
+        shocks = rng.standard_normal(num_points)
+        if volatility == "garch":
+            daily_sigma = self._garch_volatility(shocks, sigma)
+        elif volatility == "regime":
+            daily_sigma = sigma * self._regime_multipliers(rng, num_points)
+        else:
+            daily_sigma = sigma
+        
+        # Returns with a slowly rising drift, as a mild trend
+        returns = mu + daily_sigma * shocks + np.linspace(0, mu, num_points)
+        
+        # Calculate prices
+        prices = profile["initial_price"] * np.exp(np.cumsum(returns))
+        
+        # Add some realistic variation for OHLC
+        noise = rng.standard_normal((4, num_points))
+        opens = prices * (1 + 0.002 * noise[0])
+        highs = np.maximum(opens, prices) * (1 + np.abs(0.005 * noise[1]))
+        lows = np.minimum(opens, prices) * (1 - np.abs(0.005 * noise[2]))
+        
+        # Generate volume
+        base_volume = 50000000 if "BTC" in ticker.upper() else 5000000
+        volumes = np.abs(base_volume * (1 + 0.3 * noise[3])).astype(np.int64)
+        
+        # Returns from consecutive closes; the first day has none
+        log_returns = np.empty(num_points)
+        log_returns[0] = np.nan
+        np.log(prices[1:] / prices[:-1], out=log_returns[1:])
+        
+        df = pd.DataFrame({
+            "Open": opens,
+            "High": highs,
+            "Low": lows,
+            "Close": prices,
+            "Volume": volumes,
+            "Returns": np.expm1(log_returns),
+            "Log_Returns": log_returns
+        }, index=dates)
+        
+        return df.iloc[1:]
+    
+    def _garch_volatility(self, shocks: np.ndarray, sigma: float) -> np.ndarray:
+        """
+        GARCH(1, 1) conditional volatility driven by the given shocks
+        
+        h[t] = omega + (alpha * z[t-1]^2 + beta) * h[t-1] is a linear
+        recursion, solved in closed form with cumulative products:
+        h[t] = P[t] * (h[0] + omega * sum_{k<=t} 1 / P[k]), P[t] = prod c[1..t].
+        omega is set so the long-run variance is sigma^2.
+        """
+        alpha, beta = self.garch_params
+        omega = sigma ** 2 * (1 - alpha - beta)
+        
+        coefficients = np.empty(len(shocks))
+        coefficients[0] = 1.0
+        coefficients[1:] = alpha * shocks[:-1] ** 2 + beta
+        
+        log_products = np.cumsum(np.log(coefficients))
+        inverse_sums = np.cumsum(np.exp(-log_products))
+        inverse_sums -= inverse_sums[0]  # The sum starts at k = 1
+        
+        variance = np.exp(log_products) * (sigma ** 2 + omega * inverse_sums)
+        return np.sqrt(variance)
+    
+    def _regime_multipliers(self, rng: np.random.Generator, num_points: int) -> np.ndarray:
+        """Volatility multiplier of every day under a two-state Markov chain"""
+        calm, turbulent, p_turbulent, p_calm = self.regime_params
+        
+        # Alternate calm / turbulent spells of geometric length until the days are covered
+        mean_spell = (1 / p_turbulent + 1 / p_calm) / 2
+        num_spells = int(num_points / mean_spell * 2) + 4
+        lengths = np.empty(num_spells, dtype=np.int64)
+        lengths[0::2] = rng.geometric(p_turbulent, size=(num_spells + 1) // 2)
+        lengths[1::2] = rng.geometric(p_calm, size=num_spells // 2)
+        while lengths.sum() < num_points:
+            lengths = np.concatenate([lengths, rng.geometric([p_turbulent, p_calm])])
+        
+        states = np.repeat(np.resize([calm, turbulent], len(lengths)), lengths)
+        return states[:num_points]
+
+
+class SyntheticFetcher(PriceFetcher):
+    """PriceFetcher serving synthetic bars, e.g. to run MarketDataService offline"""
+    
+    def __init__(self, generator: Optional[SyntheticMarketData] = None):
+        self.generator = generator if generator is not None else SyntheticMarketData()
+    
+    def fetch(
+        self,
+        ticker: str,
+        start_date: datetime,
+        end_date: datetime,
+        interval: str = "1d"
+    ) -> Optional[pd.DataFrame]:
+        if interval != "1d":
+            return None
+        df = self.generator.generate(ticker, start_date=start_date, end_date=end_date)
+        return df[["Open", "High", "Low", "Close", "Volume"]]
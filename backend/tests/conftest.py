@@ -0,0 +1,16 @@
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+# Modules import each other as `services.x` / `models`, relative to backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.synthetic_data import SyntheticMarketData  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def history():
+    """Three years of deterministic daily bars (fixed end date)"""
+    return SyntheticMarketData().generate("SPY", years=3, end_date=datetime(2024, 1, 2))
@@ -0,0 +1,94 @@
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+from models import User, db
+from services.auth import MAX_PASSWORD_BYTES, PasswordHasher, UserCache
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'auth.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(id=1, username="a", email="a@example.com", password_hash="x"))
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def cache(app):
+    cache = UserCache(ttl=3600)
+    cache.install(db.session)
+    yield cache
+    event.remove(db.session, "after_flush", cache._after_flush)
+    event.remove(db.session, "after_commit", cache._after_commit)
+    event.remove(db.session, "after_soft_rollback", cache._after_rollback)
+
+
+def _request(cache, user_id):
+    """Load a user as a fresh request would; returns (username, queries run)"""
+    statements = []
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        user = cache.load(user_id)
+        username = None if user is None else user.username
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+        db.session.remove()
+    return username, len(statements)
+
+
+def test_cached_user_is_served_without_a_query(app, cache):
+    with app.app_context():
+        assert _request(cache, 1) == ("a", 1)
+        assert _request(cache, 1) == ("a", 0)
+        
+        # Columns kept out of the cache still lazy-load
+        assert cache.load(1).password_hash == "x"
+
+
+def test_committed_changes_invalidate_the_cached_user(app, cache):
+    with app.app_context():
+        _request(cache, 1)
+        
+        db.session.get(User, 1).username = "b"
+        db.session.commit()
+        db.session.remove()
+        assert _request(cache, 1) == ("b", 1)
+        
+        db.session.delete(db.session.get(User, 1))
+        db.session.commit()
+        db.session.remove()
+        assert _request(cache, 1) == (None, 1)
+
+
+def test_rolled_back_changes_keep_the_cached_user(app, cache):
+    with app.app_context():
+        _request(cache, 1)
+        
+        db.session.get(User, 1).username = "b"
+        db.session.flush()
+        db.session.rollback()
+        db.session.remove()
+        assert _request(cache, 1) == ("a", 0)
+
+
+def test_password_hashes_verify_and_upgrade_their_cost():
+    old = PasswordHasher(rounds=4)
+    hasher = PasswordHasher(rounds=5)
+    password_hash = old.hash("correct horse")
+    
+    assert hasher.verify("wrong horse", password_hash) == (False, None)
+    matches, new_hash = hasher.verify("correct horse", password_hash)
+    assert matches and PasswordHasher.cost(new_hash) == 5
+    assert hasher.verify("correct horse", new_hash) == (True, None)
+    
+    with pytest.raises(ValueError):
+        hasher.hash("x" * (MAX_PASSWORD_BYTES + 1))
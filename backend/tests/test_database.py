@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import pytest
+from flask import Flask
+
+import services.database
+from models import Post, SchemaMigration, Strategy, User, db
+from services.database import migration_lock, pending_changes, upgrade
+
+
+@pytest.fixture
+def app(tmp_path):
+    """A database from before posts.created_at and schema_migrations existed"""
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'legacy.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(id=1, username="a", email="a@example.com", password_hash="x"))
+        for i in (1, 2):
+            db.session.add(Post(id=i, user_id=1, content=str(i)))
+        db.session.add(Strategy(
+            id=1, user_id=1, name="s", ticker="SPY", strategy_type="custom", roi=1.0, win_rate=50,
+            created_at=datetime(2024, 1, 1)
+        ))
+        db.session.add(Strategy(id=2, user_id=1, name="t", ticker="SPY", strategy_type="custom", roi=1.0, win_rate=50))
+        db.session.commit()
+        db.session.execute(Strategy.__table__.update().where(Strategy.id == 2).values(created_at=None))
+        db.session.commit()
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("DROP INDEX ix_posts_created_at_id")
+            conn.exec_driver_sql("ALTER TABLE posts DROP COLUMN created_at")
+            conn.exec_driver_sql("DROP TABLE schema_migrations")
+    return app
+
+
+def test_upgrade_backfills_timestamps_once(app, monkeypatch):
+    with app.app_context():
+        with migration_lock(db.engine):
+            statements = upgrade(db.engine)
+        
+        assert any(statement.startswith("ALTER TABLE posts ADD COLUMN created_at") for statement in statements)
+        assert db.session.query(Post).filter(Post.created_at.is_(None)).count() == 0
+        assert db.session.get(Strategy, 2).created_at == datetime(2024, 1, 1)
+        assert "backfill posts.created_at" in set(db.session.scalars(db.select(SchemaMigration.name)))
+        
+        # Recorded backfills aren't checked again
+        def scan(engine, column):
+            raise AssertionError(f"{column} scanned again")
+        
+        monkeypatch.setattr(services.database, "_has_nulls", scan)
+        assert pending_changes(db.engine) == []
@@ -0,0 +1,106 @@
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from models import User, db
+from services.job_queue import Job, JobCancelled, JobQueue, UserLimitError
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'jobs.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(id=1, username="a", email="a@example.com", password_hash="x"))
+        db.session.commit()
+    return app
+
+
+def slow_runner(job):
+    """Counts to params["steps"], checking for cancellation like the simulator"""
+    for _ in range(job.params["steps"]):
+        if job.cancel_event.is_set():
+            raise JobCancelled()
+        time.sleep(0.01)
+    job.data = b"\x00\x01"
+    return {"steps": job.params["steps"]}
+
+
+def queue(app, **kwargs):
+    kwargs.setdefault("poll_interval", 0.05)
+    return JobQueue(app, slow_runner, **kwargs)
+
+
+def test_job_submitted_in_one_process_runs_in_another(app):
+    # Two queues on one database stand in for two server processes
+    front = queue(app, num_workers=0)
+    back = queue(app, num_workers=1)
+    back.stats()
+    
+    job = front.submit(1, {"steps": 3})
+    done = front.wait(job.id, timeout=5)
+    
+    assert done.status == Job.DONE
+    assert done.result == {"steps": 3}
+    assert done.data == b"\x00\x01"
+
+
+def test_cancel_reaches_the_running_process(app):
+    front = queue(app, num_workers=0)
+    back = queue(app, num_workers=1)
+    back.stats()
+    
+    job = front.submit(1, {"steps": 1000})
+    deadline = time.monotonic() + 5
+    while front.get(job.id).status != Job.RUNNING and time.monotonic() < deadline:
+        time.sleep(0.02)
+    front.cancel(job.id)
+    
+    assert front.wait(job.id, timeout=5).status == Job.CANCELLED
+
+
+def test_per_user_limit_counts_jobs_of_every_process(app):
+    first = queue(app, num_workers=0, max_per_user=2)
+    second = queue(app, num_workers=0, max_per_user=2)
+    
+    first.submit(1, {"steps": 1})
+    second.submit(1, {"steps": 1})
+    with pytest.raises(UserLimitError):
+        first.submit(1, {"steps": 1})
+
+
+def test_each_job_runs_once(app):
+    ran = []
+    lock = threading.Lock()
+    
+    def runner(job):
+        with lock:
+            ran.append(job.id)
+        return None
+    
+    workers = [JobQueue(app, runner, num_workers=2, max_per_user=50, poll_interval=0.01) for _ in range(3)]
+    jobs = [workers[0].submit(1, {}) for _ in range(30)]
+    for worker in workers[1:]:
+        worker.stats()
+    for job in jobs:
+        assert workers[0].wait(job.id, timeout=5).status == Job.DONE
+    
+    assert sorted(ran) == sorted(job.id for job in jobs)
+
+
+def test_jobs_of_a_dead_process_are_failed(app):
+    jobs = queue(app, num_workers=0, stale_after=0.1)
+    job = jobs.submit(1, {"steps": 1})
+    # Claimed by a process that then stops heartbeating
+    assert queue(app, num_workers=0)._claim().id == job.id
+    
+    time.sleep(0.2)
+    jobs.submit(1, {"steps": 1})  # Reaps on the way
+    
+    stale = jobs.get(job.id)
+    assert stale.status == Job.FAILED
+    assert stale.error
@@ -0,0 +1,92 @@
+import pytest
+from flask import Flask
+
+import services.likes
+from models import Like, Post, User, db
+from services.likes import LikeBuffer
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'likes.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        for i in (1, 2, 3):
+            db.session.add(User(id=i, username=str(i), email=f"{i}@example.com", password_hash="x"))
+        db.session.add(Post(id=1, user_id=1, content="a", likes=1))
+        db.session.add(Post(id=2, user_id=1, content="b", likes=0))
+        db.session.add(Like(target_type="post", target_id=1, user_id=3))
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def buffer(app):
+    # Flushed by hand; the background thread never wakes during a test
+    return LikeBuffer(app, interval=3600)
+
+
+def _likes(app, post_id):
+    with app.app_context():
+        return db.session.get(Post, post_id).likes
+
+
+def test_flush_changes_counters_by_the_net_delta(app, buffer):
+    buffer.like("post", 1, 1)
+    buffer.unlike("post", 1, 1)
+    buffer.like("post", 1, 1)  # Net: liked
+    buffer.like("post", 1, 2)
+    buffer.unlike("post", 1, 2)  # Net: nothing
+    buffer.unlike("post", 1, 3)
+    buffer.like("post", 1, 3)  # Already liked: nothing
+    buffer.like("post", 2, 2)
+    buffer.like("post", 2, 2)
+    
+    assert buffer.flush() == 4
+    assert _likes(app, 1) == 2
+    assert _likes(app, 2) == 1
+    
+    # Repeating an applied action changes nothing
+    buffer.like("post", 2, 2)
+    buffer.flush()
+    assert _likes(app, 2) == 1
+
+
+def test_failed_flush_requeues_without_clobbering_newer_actions(app, buffer, monkeypatch):
+    apply_likes = services.likes.apply_likes
+    
+    def failing_apply(batch):
+        buffer.unlike("post", 2, 1)  # Arrives while the batch is being written
+        raise RuntimeError("database is locked")
+    
+    buffer.like("post", 2, 1)
+    buffer.like("post", 2, 2)
+    monkeypatch.setattr(services.likes, "apply_likes", failing_apply)
+    
+    assert buffer.flush() == 0
+    assert buffer.stats()["failures"] == 1
+    assert buffer._pending == {("post", 2, 1): False, ("post", 2, 2): True}
+    
+    monkeypatch.setattr(services.likes, "apply_likes", apply_likes)
+    assert buffer.flush() == 2
+    assert _likes(app, 2) == 1
+
+
+def test_failing_flush_hook_keeps_the_flush_thread_alive(app):
+    calls = []
+    
+    def on_flush(deltas):
+        calls.append(deltas)
+        raise RuntimeError("rankings unavailable")
+    
+    buffer = LikeBuffer(app, interval=0.05, on_flush=on_flush)
+    buffer.like("post", 2, 1)  # Starts the flush thread
+    buffer._thread.join(0.5)
+    buffer.like("post", 2, 2)  # Flushed by the same thread after its hook failed
+    buffer._thread.join(0.5)
+    
+    assert buffer._thread.is_alive()
+    assert calls == [{("post", 2): 1}, {("post", 2): 1}]
+    assert _likes(app, 2) == 2
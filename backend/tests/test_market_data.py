@@ -0,0 +1,150 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.market_data import MarketDataService
+from services.price_fetcher import PriceFetcher
+from services.price_store import PriceStore
+from services.synthetic_data import SyntheticMarketData
+
+OHLCV = ["Open", "High", "Low", "Close", "Volume"]
+
+
+class CountingFetcher(PriceFetcher):
+    """Serves slices of one fixed history and records every download"""
+    
+    def __init__(self, history: pd.DataFrame, delay: float = 0.0):
+        self.history = history[OHLCV]
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+    
+    def fetch(self, ticker, start_date, end_date, interval="1d"):
+        with self._lock:
+            self.calls.append((ticker, pd.Timestamp(start_date)))
+        time.sleep(self.delay)
+        return self.history.loc[pd.Timestamp(start_date):pd.Timestamp(end_date)].copy()
+
+
+@pytest.fixture(scope="module")
+def full_history():
+    return SyntheticMarketData().generate("SPY", years=6)
+
+
+def service(tmp_path, fetcher):
+    return MarketDataService(store=PriceStore(str(tmp_path)), fetcher=fetcher)
+
+
+def expire(market_data, ticker="SPY"):
+    market_data.store.update_meta(ticker, "1d", fetched_at=0)
+
+
+def test_expired_series_refreshes_only_its_tail(tmp_path, full_history):
+    fetcher = CountingFetcher(full_history.iloc[:-10])
+    market_data = service(tmp_path, fetcher)
+    market_data.get_historical_data("SPY", years=5)
+    
+    # Ten more trading days pass and the stored copy expires
+    fetcher.history = full_history[OHLCV]
+    expire(market_data)
+    df = market_data.get_historical_data("SPY", years=5)
+    
+    assert len(fetcher.calls) == 2
+    stored_end = full_history.index[-11]
+    assert fetcher.calls[1][1] > stored_end - timedelta(days=14)  # Only the overlap and the new bars
+    assert df.index[-1] == full_history.index[-1]
+    np.testing.assert_allclose(df["Close"].to_numpy(), full_history["Close"].loc[df.index[0]:].to_numpy())
+    np.testing.assert_allclose(
+        df["Returns"].iloc[-10:].to_numpy(), full_history["Returns"].iloc[-10:].to_numpy(), rtol=1e-9
+    )
+
+
+def test_readjusted_overlap_falls_back_to_full_reload(tmp_path, full_history):
+    fetcher = CountingFetcher(full_history)
+    market_data = service(tmp_path, fetcher)
+    market_data.get_historical_data("SPY", years=5)
+    lookback_start = fetcher.calls[0][1]
+    
+    # A 2:1 split re-adjusts the whole history upstream
+    adjusted = full_history.copy()
+    adjusted[["Open", "High", "Low", "Close"]] /= 2
+    fetcher.history = adjusted[OHLCV]
+    expire(market_data)
+    df = market_data.get_historical_data("SPY", years=5)
+    
+    assert len(fetcher.calls) == 3  # Initial load, rejected tail, full reload
+    assert fetcher.calls[2][1] == lookback_start
+    np.testing.assert_allclose(df["Close"].to_numpy(), adjusted["Close"].loc[df.index[0]:].to_numpy())
+
+
+def test_shorter_lookback_is_served_from_the_store(tmp_path, full_history):
+    fetcher = CountingFetcher(full_history)
+    market_data = service(tmp_path, fetcher)
+    five_years = market_data.get_historical_data("SPY", years=5)
+    
+    two_years = market_data.get_historical_data("SPY", years=2)
+    
+    assert len(fetcher.calls) == 1
+    assert two_years.index[0] >= pd.Timestamp(datetime.now() - timedelta(days=2 * 365 + 1))
+    assert two_years.index[-1] == five_years.index[-1]
+    assert len(two_years) < len(five_years)
+
+
+def test_concurrent_misses_share_one_fetch(tmp_path, full_history):
+    fetcher = CountingFetcher(full_history, delay=0.2)
+    market_data = service(tmp_path, fetcher)
+    results = [None] * 8
+    
+    def load(i):
+        results[i] = market_data.get_historical_data("SPY", years=5)
+    
+    threads = [threading.Thread(target=load, args=(i,)) for i in range(len(results))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(fetcher.calls) == 1
+    for df in results:
+        pd.testing.assert_index_equal(df.index, results[0].index)
+
+
+class BrokenFetcher(CountingFetcher):
+    """Bulk downloads fail outright, or come back with prices in another schema"""
+    
+    def __init__(self, history, failure):
+        super().__init__(history)
+        self.failure = failure
+    
+    def fetch_many(self, tickers, start_date, end_date, interval="1d"):
+        if self.failure == "network":
+            raise ConnectionError("connection reset")
+        return {ticker: self.history.astype(str) for ticker in tickers}
+
+
+@pytest.mark.parametrize("failure", ["network", "schema"])
+def test_batch_failures_fall_back_to_stored_data(tmp_path, full_history, failure):
+    market_data = service(tmp_path, CountingFetcher(full_history))
+    stored = market_data.get_historical_data("SPY", years=5)
+    expire(market_data)
+    
+    market_data.fetcher = BrokenFetcher(full_history, failure)
+    results = market_data.get_historical_data_many(["SPY", "QQQ"], years=5)
+    
+    pd.testing.assert_frame_equal(results["SPY"], stored)
+    assert not results["QQQ"].empty  # Never stored: mock data
+
+
+def test_lowercase_tickers_reach_the_fetcher_upper_case(tmp_path, full_history):
+    fetcher = CountingFetcher(full_history)
+    market_data = service(tmp_path, fetcher)
+    
+    df = market_data.get_historical_data("spy", years=5)
+    
+    assert [ticker for ticker, _ in fetcher.calls] == ["SPY"]
+    pd.testing.assert_frame_equal(market_data.get_historical_data("SPY", years=5), df)
+    assert len(fetcher.calls) == 1  # Same stored series
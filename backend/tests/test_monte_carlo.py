@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from services.monte_carlo import MonteCarloSimulator
+
+
+def _stats(simulator, history, **kwargs):
+    kwargs.setdefault("num_simulations", 400)
+    kwargs.setdefault("years", 1)
+    kwargs.setdefault("seed", 7)
+    return simulator.run_simulation(history, **kwargs)["statistics"]
+
+
+def test_vectorized_paths_match_loop_engine():
+    simulator = MonteCarloSimulator()
+    args = (100.0, 0.0005, 0.015, 252, 300)
+    
+    loop = simulator._geometric_brownian_motion(*args, rng=np.random.default_rng(42))
+    vectorized = simulator._geometric_brownian_motion_vectorized(*args, rng=np.random.default_rng(42))
+    
+    np.testing.assert_allclose(vectorized, loop, rtol=1e-10)
+
+
+@pytest.mark.parametrize("strategy", ["buy_hold", "momentum"])
+def test_vectorized_statistics_match_loop_engine(history, strategy):
+    loop = _stats(MonteCarloSimulator(engine="loop", cache_size=0), history, strategy=strategy)
+    vectorized = _stats(MonteCarloSimulator(engine="vectorized", cache_size=0), history, strategy=strategy)
+    
+    for key in ("mean", "median", "std", "min", "max", "probability_of_profit", "avg_max_drawdown"):
+        assert vectorized[key] == pytest.approx(loop[key], rel=1e-9), key
+    for key, value in loop["percentiles"].items():
+        assert vectorized["percentiles"][key] == pytest.approx(value, rel=1e-9), key
+
+
+def test_same_seed_reproduces_result(history):
+    first = _stats(MonteCarloSimulator(cache_size=0), history, seed=11)
+    second = _stats(MonteCarloSimulator(cache_size=0), history, seed=11)
+    other = _stats(MonteCarloSimulator(cache_size=0), history, seed=12)
+    
+    assert first == second
+    assert first["mean"] != other["mean"]
+
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+def test_parallel_runs_are_reproducible(history, backend):
+    simulator = MonteCarloSimulator(num_workers=3, parallel_backend=backend, cache_size=0)
+    try:
+        first = _stats(simulator, history, num_simulations=1000)
+        second = _stats(simulator, history, num_simulations=1000)
+    finally:
+        simulator.close()
+    
+    assert first == second
+
+
+def test_thread_and_process_shards_agree(history):
+    thread = MonteCarloSimulator(num_workers=3, parallel_backend="thread", cache_size=0)
+    process = MonteCarloSimulator(num_workers=3, parallel_backend="process", cache_size=0)
+    try:
+        assert _stats(process, history, num_simulations=1000) == _stats(thread, history, num_simulations=1000)
+    finally:
+        thread.close()
+        process.close()
+
+
+def test_chunked_parallel_runs_are_reproducible(history):
+    simulator = MonteCarloSimulator(num_workers=3, chunk_size=128, cache_size=0)
+    try:
+        first = _stats(simulator, history, num_simulations=1000)
+        second = _stats(simulator, history, num_simulations=1000)
+    finally:
+        simulator.close()
+    
+    assert first == second
@@ -0,0 +1,104 @@
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+import services.rankings
+from models import Post, Strategy, TagCount, User, db
+from services.rankings import Rankings
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'rankings.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(id=1, username="a", email="a@example.com", password_hash="x"))
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def rankings(app):
+    # Lists are only reloaded when a write marks them dirty
+    rankings = Rankings(max_staleness=3600)
+    rankings.install(db.session)
+    yield rankings
+    event.remove(db.session, "after_flush", rankings._after_flush)
+    event.remove(db.session, "after_commit", rankings._after_commit)
+    event.remove(db.session, "after_soft_rollback", rankings._after_rollback)
+
+
+def _tag_counts():
+    rows = db.session.query(TagCount.tag, db.func.sum(TagCount.count)).group_by(TagCount.tag)
+    return {tag: count for tag, count in rows if count}
+
+
+def _strategy(strategy_id, roi):
+    return Strategy(
+        id=strategy_id, user_id=1, name=str(strategy_id), ticker="SPY", strategy_type="custom",
+        roi=roi, win_rate=50
+    )
+
+
+def test_post_writes_move_tag_counts(app, rankings):
+    with app.app_context():
+        post = Post(id=1, user_id=1, content="#SPY breakout, #spy and #btc")
+        db.session.add(post)
+        db.session.commit()
+        assert _tag_counts() == {"spy": 1, "btc": 1}
+        assert rankings.trending(hours=1)["tags"] == [{"tag": "btc", "posts": 1}, {"tag": "spy", "posts": 1}]
+        
+        post.content = "Rotating into #btc and #eth"
+        db.session.commit()
+        assert _tag_counts() == {"btc": 1, "eth": 1}
+        assert rankings.trending(hours=1)["tags"] == [{"tag": "btc", "posts": 1}, {"tag": "eth", "posts": 1}]
+        
+        db.session.delete(post)
+        db.session.commit()
+        assert _tag_counts() == {}
+        assert rankings.trending(hours=1)["tags"] == []
+
+
+def test_rolled_back_posts_leave_tag_counts_alone(app, rankings):
+    with app.app_context():
+        db.session.add(Post(id=1, user_id=1, content="#spy"))
+        db.session.flush()
+        db.session.rollback()
+        assert _tag_counts() == {}
+
+
+def test_leaderboard_reloads_after_qualifying_strategy_write(app, rankings, monkeypatch):
+    monkeypatch.setattr(services.rankings, "LEADERBOARD_SIZE", 2)
+    with app.app_context():
+        db.session.add_all([_strategy(1, 5.0), _strategy(2, 3.0)])
+        db.session.commit()
+        board = rankings.leaderboard("roi", limit=2)
+        assert [item["id"] for item in board["items"]] == [1, 2]
+        
+        # Below the full board's cutoff: served from memory
+        db.session.add(_strategy(3, 1.0))
+        db.session.commit()
+        assert rankings.leaderboard("roi", limit=2)["updated_at"] == board["updated_at"]
+        
+        db.session.add(_strategy(4, 10.0))
+        db.session.commit()
+        assert [item["id"] for item in rankings.leaderboard("roi", limit=2)["items"]] == [4, 1]
+        
+        # A member dropping off the board
+        db.session.get(Strategy, 4).roi = -1.0
+        db.session.commit()
+        assert [item["id"] for item in rankings.leaderboard("roi", limit=2)["items"]] == [1, 2]
+
+
+def test_strategy_like_flush_marks_likes_board_dirty(app, rankings):
+    with app.app_context():
+        db.session.add(_strategy(1, 5.0))
+        db.session.commit()
+        assert rankings.leaderboard("likes")["items"][0]["likes"] == 0
+        
+        db.session.execute(Strategy.__table__.update().values(likes=3))  # As a like flush writes it
+        db.session.commit()
+        rankings.likes_changed({("strategy", 1): 3})
+        assert rankings.leaderboard("likes")["items"][0]["likes"] == 3
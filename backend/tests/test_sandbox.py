@@ -0,0 +1,128 @@
+import ctypes.util
+import subprocess
+import sys
+import time
+
+import pytest
+
+from services.sandbox import (
+    BACKEND_DIR, StrategyCodeError, StrategyLimitError, StrategySandbox, _trade_signals
+)
+
+pytestmark = pytest.mark.skipif(
+    not sys.platform.startswith("linux") or ctypes.util.find_library("seccomp") is None,
+    reason="Strategy workers need Linux and libseccomp"
+)
+
+CROSSOVER = '''
+def strategy(df):
+    fast = df["Close"].rolling(10).mean()
+    slow = df["Close"].rolling(50).mean()
+    return (fast > slow).astype(float)
+'''
+
+# Locks a fresh interpreter down the way a worker does, then tries what
+# a job must never manage; exits non-zero naming the first that worked
+LOCKED_PROBE = '''
+import os
+import socket
+import sys
+from services.sandbox import _lock_down
+
+_lock_down(64, "nobody")
+attempts = {
+    "open": lambda: open("/etc/hostname"),
+    "socket": lambda: socket.socket(socket.AF_INET, socket.SOCK_STREAM),
+    "fork": os.fork
+}
+for name, attempt in attempts.items():
+    try:
+        attempt()
+    except OSError:
+        continue
+    sys.exit(f"{name} succeeded")
+'''
+
+
+def _wait_for_workers(sandbox, count, seconds=90):
+    deadline = time.monotonic() + seconds
+    while sandbox.stats()["workers"] < count:
+        if time.monotonic() > deadline:
+            pytest.fail(f"Strategy workers didn't start: {sandbox.stats()}")
+        time.sleep(0.2)
+
+
+@pytest.fixture(scope="module")
+def sandbox():
+    # CPU allowance above the wall timeout, so busy loops hit the timeout
+    sandbox = StrategySandbox(num_workers=1, timeout=3, cpu_seconds=30, memory_mb=256, acquire_timeout=90)
+    _wait_for_workers(sandbox, 1)
+    yield sandbox
+    sandbox.close()
+
+
+@pytest.mark.parametrize("source", [
+    "import os\ndef strategy(df):\n    return df['Close']",
+    "from pandas import read_csv\ndef strategy(df):\n    return df['Close']",
+    "def strategy(df):\n    df.to_pickle('x')\n    return df['Close']",
+    "def strategy(df):\n    return df.__class__",
+])
+def test_forbidden_imports_and_attributes_are_rejected(sandbox, source):
+    with pytest.raises(StrategyCodeError):
+        sandbox.compile(source)
+
+
+def test_forbidden_methods_are_rejected_at_run_time(sandbox, history):
+    source = "def strategy(df):\n    df.agg('to_pickle')\n    return df['Close']"
+    with pytest.raises(StrategyCodeError):
+        sandbox.run(source, history)
+
+
+def test_open_is_not_available_to_jobs(sandbox, history):
+    source = "def strategy(df):\n    open('/etc/hostname')\n    return df['Close']"
+    with pytest.raises(StrategyCodeError):
+        sandbox.run(source, history)
+
+
+def test_locked_down_process_cannot_open_connect_or_fork():
+    probe = subprocess.run(
+        [sys.executable, "-c", LOCKED_PROBE], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=60
+    )
+    assert probe.returncode == 0, probe.stderr
+
+
+def test_busy_loop_is_killed_at_timeout_and_worker_replaced(sandbox, history):
+    source = "def strategy(df):\n    while True:\n        pass"
+    
+    started = time.monotonic()
+    with pytest.raises(StrategyLimitError):
+        sandbox.run(source, history)
+    assert time.monotonic() - started < sandbox.timeout + 2
+    
+    _wait_for_workers(sandbox, 1)
+    assert sandbox.run(CROSSOVER, history)["final_value"] > 0
+
+
+def test_allocation_over_memory_limit_is_a_limit_error(sandbox, history):
+    source = "import numpy as np\ndef strategy(df):\n    block = np.ones(2**30)\n    return df['Close'] * 0"
+    with pytest.raises(StrategyLimitError, match="memory"):
+        sandbox.run(source, history)
+    _wait_for_workers(sandbox, 1)
+
+
+def test_strategy_round_trips_through_shared_memory(sandbox, history):
+    fast = history["Close"].rolling(10).mean()
+    slow = history["Close"].rolling(50).mean()
+    expected = _trade_signals(
+        (fast > slow).astype(float), history, sandbox.initial_capital, sandbox.cost_bps / 10000
+    )
+    
+    assert sandbox.run(CROSSOVER, history) == pytest.approx(expected)
+    
+    source = "def backtest(df):\n    return {'rows': len(df), 'last': df['Close'].iloc[-1], 'first': df.index[0].isoformat()}"
+    result = sandbox.run(source, history, entry="backtest")
+    assert result == {
+        "rows": len(history),
+        "last": pytest.approx(float(history["Close"].iloc[-1])),
+        "first": history.index[0].isoformat()
+    }
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+from models import Post, Strategy, User, db
+from services.social import explore_page, feed_page
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'social.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(id=1, username="a", email="a@example.com", password_hash="x"))
+        start = datetime(2024, 1, 1)
+        for i in range(1, 8):
+            # Pairs share a timestamp / roi, so ties are broken by id
+            db.session.add(Post(id=i, user_id=1, content=str(i), created_at=start + timedelta(days=i // 2)))
+            db.session.add(Strategy(
+                id=i, user_id=1, name=str(i), ticker="SPY", strategy_type="custom", roi=i // 2, win_rate=50
+            ))
+        db.session.commit()
+    return app
+
+
+def _all_pages(fetch):
+    ids, cursor = [], None
+    while True:
+        page = fetch(limit=2, cursor=cursor)
+        ids.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+def _query_plans(fetch, cursor):
+    """SQLite plan of every statement fetch(cursor=cursor) runs"""
+    statements = []
+    
+    def record(conn, cursor_, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+    
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        fetch(limit=2, cursor=cursor)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+    
+    with db.engine.connect() as conn:
+        return [
+            " / ".join(row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters))
+            for statement, parameters in statements
+        ]
+
+
+def test_pages_are_ordered_newest_first_with_ties_by_id(app):
+    with app.app_context():
+        assert _all_pages(feed_page) == [7, 6, 5, 4, 3, 2, 1]
+        assert _all_pages(explore_page) == [7, 6, 5, 4, 3, 2, 1]
+
+
+@pytest.mark.parametrize("fetch, table, index", [
+    (feed_page, "posts", "ix_posts_created_at_id"),
+    (explore_page, "strategies", "ix_strategies_roi_id")
+])
+def test_later_pages_seek_the_composite_index(app, fetch, table, index):
+    with app.app_context():
+        cursor = fetch(limit=2)["next_cursor"]
+        plans = _query_plans(fetch, cursor)
+    
+    assert len(plans) == 1
+    assert f"SEARCH {table} USING INDEX {index}" in plans[0]
+    assert "TEMP B-TREE" not in plans[0]
+    assert "MULTI-INDEX OR" not in plans[0]
@@ -69,6 +69,7 @@ const Free = () => {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
           description: STRATEGY_TEMPLATES[selectedStrategy].description,
+          strategy: selectedStrategy,
           ticker: ticker,
           years: years,
           initial_investment: 10000,
@@ -77,7 +78,18 @@ const Free = () => {
       });
 
       if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
-      const data = await response.json();
+      const job = await response.json();
+      
+      // Simulations run in a background queue; long-poll until the job finishes
+      let data = job;
+      while (data.status !== 'done') {
+        if (data.status === 'failed' || data.status === 'cancelled') {
+          throw new Error(data.error || `simulation ${data.status}`);
+        }
+        const poll = await fetch(`http://localhost:8000/api/simulate/${job.job_id}?wait=25`);
+        if (!poll.ok) throw new Error(`HTTP error! status: ${poll.status}`);
+        data = await poll.json();
+      }
       
       setResults({
         pathData: data.paths,